@@ -0,0 +1,31 @@
+"""
+Run analysis job workers outside the web process.
+
+Claims jobs from the analysis_jobs table (shared with the API and any other
+worker processes), so long bulk/tiled analyses don't compete with request
+threads. Combine with ANALYSIS_JOBS_IN_WEB=false on the web processes.
+"""
+import signal
+import threading
+
+from app import create_app
+from app.routes.analysis_jobs import get_job_workers
+from app.utils.model_loader import model_loader
+
+app = create_app()
+
+if __name__ == '__main__':
+    if not app.config.get('INFERENCE_POOL_ADDRESS'):
+        model_loader.start()
+
+    with app.app_context():
+        workers = get_job_workers()
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    workers.stop()
+    print("👋 Analysis workers stopped")
@@ -55,6 +55,66 @@ def create_app(config_name='development'):
     app.config['JWT_HEADER_NAME'] = 'Authorization'
     app.config['JWT_HEADER_TYPE'] = 'Bearer'
 
+    # AI inference configuration
+    app.config['INFERENCE_MAX_BATCH_SIZE'] = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 8))
+    app.config['INFERENCE_MAX_WAIT_MS'] = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 25))
+    app.config['INFERENCE_TIMEOUT'] = float(os.environ.get('INFERENCE_TIMEOUT', 30))
+    app.config['INFERENCE_MAX_QUEUE'] = int(os.environ.get('INFERENCE_MAX_QUEUE', 32))
+    app.config['INFERENCE_MAX_QUEUE_PER_MACHINE'] = int(os.environ.get('INFERENCE_MAX_QUEUE_PER_MACHINE', 4))
+    app.config['INFERENCE_MAX_QUEUE_AGE_MS'] = float(os.environ.get('INFERENCE_MAX_QUEUE_AGE_MS', 2000))
+    app.config['INFERENCE_IMGSZ'] = int(os.environ.get('INFERENCE_IMGSZ', 640))
+    app.config['INFERENCE_MIN_CONFIDENCE'] = float(os.environ.get('INFERENCE_MIN_CONFIDENCE', 0.0))
+    app.config['INFERENCE_TILE_SIZE'] = int(os.environ.get('INFERENCE_TILE_SIZE', 640))
+    app.config['INFERENCE_TILE_OVERLAP'] = float(os.environ.get('INFERENCE_TILE_OVERLAP', 0.2))
+    app.config['QUALITY_GATE_ENABLED'] = os.environ.get('QUALITY_GATE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    for key in ('QUALITY_MIN_SHARPNESS', 'QUALITY_MIN_BRIGHTNESS', 'QUALITY_MAX_BRIGHTNESS',
+                'QUALITY_MAX_HIGHLIGHTS', 'QUALITY_MAX_SHADOWS'):
+        # Unset -> frame_quality.DEFAULT_THRESHOLDS
+        app.config[key] = float(os.environ[key]) if os.environ.get(key) else None
+    app.config['MODEL_SHADOW_SAMPLE_RATE'] = float(os.environ.get('MODEL_SHADOW_SAMPLE_RATE', 0.1))
+    app.config['FRAME_CACHE_ENABLED'] = os.environ.get('FRAME_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['FRAME_CACHE_SIMILARITY'] = float(os.environ.get('FRAME_CACHE_SIMILARITY', 0.02))
+    app.config['FRAME_CACHE_TTL'] = float(os.environ.get('FRAME_CACHE_TTL', 5))
+    app.config['COUNTING_IOU_THRESHOLD'] = float(os.environ.get('COUNTING_IOU_THRESHOLD', 0.3))
+    app.config['COUNTING_MAX_MISSED'] = int(os.environ.get('COUNTING_MAX_MISSED', 3))
+    app.config['COUNTING_MIN_HITS'] = int(os.environ.get('COUNTING_MIN_HITS', 2))
+    app.config['TELEMETRY_MAX_READINGS'] = int(os.environ.get('TELEMETRY_MAX_READINGS', 5000))
+    app.config['MACHINE_LOG_ASYNC'] = os.environ.get('MACHINE_LOG_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+    app.config['MACHINE_LOG_FLUSH_SIZE'] = int(os.environ.get('MACHINE_LOG_FLUSH_SIZE', 200))
+    app.config['MACHINE_LOG_FLUSH_INTERVAL'] = float(os.environ.get('MACHINE_LOG_FLUSH_INTERVAL', 1.0))
+    app.config['MACHINE_LOG_MAX_BUFFERED'] = int(os.environ.get('MACHINE_LOG_MAX_BUFFERED', 10000))
+    app.config['PARTITION_PREMAKE'] = int(os.environ.get('PARTITION_PREMAKE', 3))
+    for table in ('MACHINE_LOGS', 'MACHINES_DATA', 'SORTING_RESULTS_HISTORY', 'PERFORMANCE_LOGS'):
+        # Days of history kept per table; 0 keeps everything
+        app.config[f'PARTITION_RETENTION_{table}'] = int(os.environ.get(f'PARTITION_RETENTION_{table}', 0))
+    app.config['PARTITION_RETENTION_ACTION'] = os.environ.get('PARTITION_RETENTION_ACTION', 'detach')
+    app.config['PARTITION_ARCHIVE_DIR'] = os.environ.get('PARTITION_ARCHIVE_DIR') or None
+    app.config['PARTITION_ARCHIVE_FORMAT'] = os.environ.get('PARTITION_ARCHIVE_FORMAT', 'parquet')
+    app.config['PARTITION_MAINTENANCE_HOURS'] = float(os.environ.get('PARTITION_MAINTENANCE_HOURS', 0))
+    app.config['EVENTS_HEARTBEAT'] = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+    app.config['EVENTS_MAX_QUEUE'] = int(os.environ.get('EVENTS_MAX_QUEUE', 256))
+    app.config['EVENTS_REPLAY'] = int(os.environ.get('EVENTS_REPLAY', 500))
+    app.config['BATCH_AUTO_GRADE'] = os.environ.get('BATCH_AUTO_GRADE', 'true').lower() in ('1', 'true', 'yes')
+    app.config['BATCH_GRADE_WORKERS'] = int(os.environ.get('BATCH_GRADE_WORKERS', 1))
+    app.config['BATCH_SAMPLE_SIZE'] = int(os.environ.get('BATCH_SAMPLE_SIZE', 256))
+    app.config['BATCH_IMAGE_HOSTS'] = tuple(
+        host.strip().lower() for host in os.environ.get('BATCH_IMAGE_HOSTS', '').split(',') if host.strip()
+    )
+    app.config['DETECTION_STORE_ENABLED'] = os.environ.get('DETECTION_STORE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['DETECTION_STORE_DIR'] = os.environ.get('DETECTION_STORE_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'detection_store')
+    app.config['DETECTION_STORE_WINDOW'] = int(os.environ.get('DETECTION_STORE_WINDOW', 3600))
+    app.config['DETECTION_STORE_FLUSH_INTERVAL'] = float(os.environ.get('DETECTION_STORE_FLUSH_INTERVAL', 5))
+    app.config['ANALYSIS_JOB_DIR'] = os.environ.get('ANALYSIS_JOB_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'analysis_jobs')
+    app.config['ANALYSIS_JOB_WORKERS'] = int(os.environ.get('ANALYSIS_JOB_WORKERS', 2))
+    app.config['ANALYSIS_JOB_POLL_INTERVAL'] = float(os.environ.get('ANALYSIS_JOB_POLL_INTERVAL', 2))
+    app.config['ANALYSIS_JOB_PROGRESS_EVERY'] = int(os.environ.get('ANALYSIS_JOB_PROGRESS_EVERY', 10))
+    app.config['ANALYSIS_JOBS_IN_WEB'] = os.environ.get('ANALYSIS_JOBS_IN_WEB', 'true').lower() in ('1', 'true', 'yes')
+    app.config['INFERENCE_POOL_ADDRESS'] = os.environ.get('INFERENCE_POOL_ADDRESS') or None
+    app.config['INFERENCE_POOL_PROCESSES'] = int(os.environ.get('INFERENCE_POOL_PROCESSES', 2))
+    app.config['INFERENCE_POOL_AUTHKEY'] = os.environ.get('INFERENCE_POOL_AUTHKEY') or 'pilahkopi-inference'
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -182,9 +242,21 @@ def create_app(config_name='development'):
     from app.routes.machine import machine_bp
     app.register_blueprint(machine_bp, url_prefix='/api')
 
+    # Live camera frame streaming (WebSocket + HTTP fallback)
+    from app.routes.machine_stream import machine_stream_bp
+    app.register_blueprint(machine_stream_bp, url_prefix='/api')
+
+    # Queued (asynchronous) image analysis jobs
+    from app.routes.analysis_jobs import analysis_jobs_bp
+    app.register_blueprint(analysis_jobs_bp, url_prefix='/api')
+
     # Machine Management Routes
     from app.routes.machine_routes import machine_routes_bp
     app.register_blueprint(machine_routes_bp, url_prefix='/api')
+
+    # Server-Sent Events push channel (machines, logs, telemetry, batches)
+    from app.routes.events import events_bp
+    app.register_blueprint(events_bp, url_prefix='/api')
     
     # ========================================
     # Serve uploaded files
@@ -0,0 +1,63 @@
+from app import db
+from datetime import datetime
+import pytz
+import uuid
+
+JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
+
+def jakarta_now():
+    return datetime.now(JAKARTA_TZ).replace(tzinfo=None)
+
+class AnalysisJob(db.Model):
+    """Queued image analysis, executed by background workers (see utils/job_queue)"""
+    __tablename__ = 'analysis_jobs'
+    __table_args__ = (
+        # Workers claim the next job by (priority, created_at) among queued ones
+        db.Index('ix_analysis_jobs_queue', 'status', 'priority', 'created_at'),
+    )
+
+    id = db.Column(db.String(50), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(50), nullable=True)
+    machine_id = db.Column(db.String(50), nullable=True)
+    batch_id = db.Column(db.String(50), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed, cancelled
+    priority = db.Column(db.Integer, nullable=False, default=5)  # lower runs first
+    tiled = db.Column(db.Boolean, nullable=False, default=False)
+
+    # Uploaded images are kept on disk until the job finishes
+    input_dir = db.Column(db.Text, nullable=False)
+    total_images = db.Column(db.Integer, nullable=False, default=0)
+    processed_images = db.Column(db.Integer, nullable=False, default=0)
+    failed_images = db.Column(db.Integer, nullable=False, default=0)
+
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=jakarta_now)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # refreshed at every progress update while running
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self, include_result=True):
+        data = {
+            'id': self.id,
+            'userId': self.user_id,
+            'machineId': self.machine_id,
+            'batchId': self.batch_id,
+            'status': self.status,
+            'priority': self.priority,
+            'tiled': self.tiled,
+            'progress': {
+                'total': self.total_images,
+                'processed': self.processed_images,
+                'failed': self.failed_images
+            },
+            'error': self.error,
+            'createdAt': JAKARTA_TZ.localize(self.created_at).isoformat() if self.created_at else None,
+            'startedAt': JAKARTA_TZ.localize(self.started_at).isoformat() if self.started_at else None,
+            'finishedAt': JAKARTA_TZ.localize(self.finished_at).isoformat() if self.finished_at else None
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
@@ -10,6 +10,10 @@ class Machine(db.Model):
     status_power = db.Column(db.Boolean, default=False)
     temperature = db.Column(db.Float, default=0.0)
     last_maintenance = db.Column(db.DateTime, default=datetime.utcnow)
+    # Per-machine overrides of the frame quality gate (see utils/frame_quality)
+    quality_thresholds = db.Column(db.JSON)
+    # Normalised belt region cropped before detection (see utils/frame_roi)
+    roi = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
@@ -21,5 +25,7 @@ class Machine(db.Model):
                 'power': self.status_power,
                 'temperature': self.temperature,
             },
-            'lastMaintenance': self.last_maintenance.isoformat() if self.last_maintenance else None
+            'lastMaintenance': self.last_maintenance.isoformat() if self.last_maintenance else None,
+            'qualityThresholds': self.quality_thresholds or {},
+            'roi': self.roi
         }
@@ -1,11 +1,17 @@
 from app import db
 from datetime import datetime
-import uuid
+from app.utils.telemetry import new_reading_id
 
 class MachineData(db.Model):
     __tablename__ = 'machines_data'
+    __table_args__ = (
+        # Latest telemetry per machine (GET /machines)
+        db.Index('ix_machines_data_machine_created', 'machine_id', 'created_at'),
+        # Append-only, arrives in time order: a BRIN index is tiny and serves range scans
+        db.Index('ix_machines_data_created_brin', 'created_at', postgresql_using='brin'),
+    )
 
-    id = db.Column(db.String(50), primary_key=True)
+    id = db.Column(db.String(50), primary_key=True, default=new_reading_id)
     machine_id = db.Column(db.String(50), db.ForeignKey('machines.id'), nullable=False)
     temperature = db.Column(db.Float, default=0.0)
     processed_today = db.Column(db.Integer, default=0)
@@ -16,21 +22,8 @@ class MachineData(db.Model):
 
     @staticmethod
     def generate_id():
-        try:
-            last = MachineData.query.order_by(MachineData.id.desc()).first()
-            if not last:
-                return "MD_001"
-            
-            # Extract number part (assuming format MD_XXX)
-            parts = last.id.split('_')
-            if len(parts) > 1 and parts[1].isdigit():
-                num = int(parts[1])
-                return f"MD_{str(num + 1).zfill(3)}"
-            
-            # Fallback if format is different
-            return f"MD_{uuid.uuid4().hex[:3].upper()}"
-        except Exception:
-            return f"MD_{uuid.uuid4().hex[:3].upper()}"
+        # Time-ordered random key: no scan for the last id, safe under concurrent writers
+        return new_reading_id()
 
     def to_dict(self):
         return {
@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
 import pytz
+from app.utils.log_writer import new_log_id
 
 JAKARTA_TZ = pytz.timezone('Asia/Jakarta')
 
@@ -9,8 +10,12 @@ def jakarta_now():
 
 class MachineLog(db.Model):
     __tablename__ = 'machine_logs'
+    __table_args__ = (
+        # Newest logs per machine (GET /machines)
+        db.Index('ix_machine_logs_machine_created', 'machine_id', 'created_at'),
+    )
 
-    id = db.Column(db.String(50), primary_key=True)
+    id = db.Column(db.String(50), primary_key=True, default=new_log_id)
     machine_id = db.Column(db.String(50), db.ForeignKey('machines.id'))
     message = db.Column(db.Text, nullable=False)
     type = db.Column(db.String(20), nullable=False) # 'success', 'info', 'warning', 'error'
@@ -18,17 +23,8 @@ class MachineLog(db.Model):
 
     @staticmethod
     def generate_id():
-        """Generate next M_LOG-### ID"""
-        last_log = MachineLog.query.order_by(MachineLog.created_at.desc()).first()
-        if not last_log or not last_log.id.startswith('M_LOG-'):
-            return 'M_LOG-001'
-        
-        try:
-            last_num = int(last_log.id.split('-')[1])
-            next_num = last_num + 1
-            return f'M_LOG-{next_num:03d}'
-        except (IndexError, ValueError):
-            return 'M_LOG-001'
+        # Time-ordered random key: no scan for the last id, safe under concurrent writers
+        return new_log_id()
 
     def to_dict(self):
         return {
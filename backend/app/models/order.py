@@ -3,7 +3,10 @@ from datetime import datetime
 
 class Order(db.Model):
     __tablename__ = 'orders'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_orders_machine_id', 'machine_id'),
+        {'extend_existing': True}
+    )
 
     id = db.Column(db.String(50), primary_key=True)
     user_id = db.Column(db.String(50), db.ForeignKey('users.id'), nullable=False)
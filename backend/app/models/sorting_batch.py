@@ -9,6 +9,12 @@ def jakarta_now():
 
 class SortingBatch(db.Model):
     __tablename__ = 'sorting_batches'
+    __table_args__ = (
+        # Pending batches per order/machine (queue counts in GET /machines)
+        db.Index('ix_sorting_batches_pending', 'order_id',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+    )
 
     id = db.Column(db.String(50), primary_key=True)
     order_id = db.Column(db.String(50), db.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
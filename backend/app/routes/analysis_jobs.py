@@ -0,0 +1,220 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+import json
+import os
+import threading
+import time
+import uuid
+from app import db
+from app.models.analysis_job import AnalysisJob, jakarta_now
+from app.models.sorting_batch import SortingBatch
+from app.routes.machine import (
+    ensure_inference_ready, model_not_ready_response, run_bulk_analysis, apply_totals_to_batch
+)
+from app.utils.bulk_analysis import BulkTotals
+from app.utils.inference import PRIORITIES, PRIORITY_LIVE, PRIORITY_NORMAL, PRIORITY_BULK
+from app.utils.model_loader import model_loader
+from app.utils.job_queue import (
+    JobWorkerPool, JobCancelled, JOB_FINISHED, save_job_inputs, open_job_inputs, remove_job_inputs
+)
+
+analysis_jobs_bp = Blueprint('analysis_jobs', __name__)
+
+_workers = None
+_workers_lock = threading.Lock()
+
+def _parse_priority(value):
+    """'live' / 'normal' / 'bulk' or a number, clamped to that range; lower runs first"""
+    if value is None or value == '':
+        return PRIORITY_NORMAL
+    if str(value).lower() in PRIORITIES:
+        return PRIORITIES[str(value).lower()]
+    return min(max(int(value), PRIORITY_LIVE), PRIORITY_BULK)
+
+def run_analysis_job(job):
+    """Worker handler: analyse the job's images, report progress, return the result"""
+    if not current_app.config.get('INFERENCE_POOL_ADDRESS') and not model_loader.wait(timeout=300):
+        raise RuntimeError(f"Model not ready: {model_loader.status().get('error')}")
+
+    progress_every = current_app.config.get('ANALYSIS_JOB_PROGRESS_EVERY', 10)
+    totals = BulkTotals()
+    images = []
+
+    results = run_bulk_analysis(open_job_inputs(job.input_dir), tiled=job.tiled, priority=job.priority)
+    for index, name, data, error in results:
+        if error is not None:
+            totals.failed += 1
+            images.append({'index': index, 'name': name, 'error': str(error)})
+        else:
+            totals.add(data)
+            images.append({'index': index, 'name': name, 'data': data})
+
+        if len(images) % progress_every == 0:
+            job.processed_images = len(images)
+            job.failed_images = totals.failed
+            job.heartbeat_at = jakarta_now()  # keeps requeue_stale_jobs away from a long job
+            db.session.commit()
+            # Reloaded after commit: picks up a cancel from another process
+            if job.status == 'cancelled':
+                results.close()
+                raise JobCancelled()
+
+    job.processed_images = len(images)
+    job.failed_images = totals.failed
+    summary = totals.to_dict()
+    if job.batch_id:
+        apply_totals_to_batch(job.batch_id, totals)
+        summary['batchUpdated'] = job.batch_id
+    return {'images': images, 'summary': summary}
+
+def get_job_workers():
+    """This process's job workers, started on first use"""
+    global _workers
+    if _workers is None:
+        with _workers_lock:
+            if _workers is None:
+                app = current_app._get_current_object()
+                _workers = JobWorkerPool(
+                    app,
+                    run_analysis_job,
+                    workers=app.config.get('ANALYSIS_JOB_WORKERS', 2),
+                    poll_interval=app.config.get('ANALYSIS_JOB_POLL_INTERVAL', 2.0)
+                ).start()
+    return _workers
+
+def _job_for_user(job_id):
+    job = AnalysisJob.query.get(job_id)
+    if not job or job.user_id != str(get_jwt_identity()):
+        return None
+    return job
+
+@analysis_jobs_bp.route('/analysis/jobs', methods=['POST'])
+@jwt_required()
+def create_analysis_job():
+    """
+    Queue images (`images` and/or a zip `archive`) for analysis and return at
+    once. Optional form fields: priority (live|normal|bulk), tiled, batchId,
+    machineId.
+    """
+    if not ensure_inference_ready():
+        return model_not_ready_response()
+
+    files = request.files.getlist('images') + request.files.getlist('archive')
+    if not files:
+        return jsonify({'success': False, 'message': 'No images uploaded'}), 400
+
+    try:
+        priority = _parse_priority(request.form.get('priority'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid priority'}), 400
+
+    batch_id = request.form.get('batchId')
+    if batch_id and not SortingBatch.query.get(batch_id):
+        return jsonify({'success': False, 'message': 'Batch not found'}), 404
+
+    job_id = str(uuid.uuid4())
+    input_dir = os.path.join(current_app.config['ANALYSIS_JOB_DIR'], job_id)
+    try:
+        total = save_job_inputs(input_dir, files)
+        job = AnalysisJob(
+            id=job_id,
+            user_id=str(get_jwt_identity()),
+            machine_id=request.form.get('machineId'),
+            batch_id=batch_id,
+            priority=priority,
+            tiled=request.form.get('tiled', 'false').lower() in ('1', 'true', 'yes'),
+            input_dir=input_dir,
+            total_images=total
+        )
+        db.session.add(job)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        remove_job_inputs(input_dir)
+        print(f"❌ Could not queue analysis job: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+    if current_app.config.get('ANALYSIS_JOBS_IN_WEB', True):
+        get_job_workers().notify()
+
+    return jsonify({
+        'success': True,
+        'data': {
+            **job.to_dict(include_result=False),
+            'statusUrl': f'/api/analysis/jobs/{job.id}',
+            'eventsUrl': f'/api/analysis/jobs/{job.id}/events'
+        }
+    }), 202
+
+@analysis_jobs_bp.route('/analysis/jobs', methods=['GET'])
+@jwt_required()
+def list_analysis_jobs():
+    jobs = AnalysisJob.query.filter_by(user_id=str(get_jwt_identity()))\
+        .order_by(AnalysisJob.created_at.desc())\
+        .limit(min(request.args.get('limit', 50, type=int), 200)).all()
+    return jsonify({
+        'success': True,
+        'data': [job.to_dict(include_result=False) for job in jobs]
+    }), 200
+
+@analysis_jobs_bp.route('/analysis/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_analysis_job(job_id):
+    """Poll status/progress; the result is included once completed"""
+    job = _job_for_user(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    include_result = request.args.get('results', 'true').lower() != 'false'
+    return jsonify({'success': True, 'data': job.to_dict(include_result=include_result)}), 200
+
+@analysis_jobs_bp.route('/analysis/jobs/<job_id>/events', methods=['GET'])
+@jwt_required()
+def analysis_job_events(job_id):
+    """NDJSON progress stream: a line whenever progress changes, the final job last"""
+    job = _job_for_user(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    interval = current_app.config.get('ANALYSIS_JOB_POLL_INTERVAL', 2.0)
+
+    def generate():
+        last = None
+        last_sent = time.monotonic()
+        while True:
+            db.session.expire_all()
+            current = AnalysisJob.query.get(job_id)
+            if current.status in JOB_FINISHED:
+                yield json.dumps({'type': 'done', 'job': current.to_dict()}) + '\n'
+                return
+            state = (current.status, current.processed_images)
+            if state != last or time.monotonic() - last_sent > 15:
+                last, last_sent = state, time.monotonic()
+                yield json.dumps({'type': 'progress', 'job': current.to_dict(include_result=False)}) + '\n'
+            db.session.rollback()
+            time.sleep(interval)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@analysis_jobs_bp.route('/analysis/jobs/<job_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_analysis_job(job_id):
+    """Cancel a queued job, or stop a running one at its next progress update"""
+    job = _job_for_user(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    if job.status in JOB_FINISHED:
+        return jsonify({'success': False, 'message': f'Job already {job.status}'}), 409
+
+    try:
+        was_queued = job.status == 'queued'
+        job.status = 'cancelled'
+        db.session.commit()
+        if was_queued:
+            remove_job_inputs(job.input_dir)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+    return jsonify({'success': True, 'data': job.to_dict(include_result=False)}), 200
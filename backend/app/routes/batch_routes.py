@@ -1,15 +1,146 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.models.sorting_batch import SortingBatch
 from app.models.order import Order
 from app.models.notification import Notification
+from app.models.user import User
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+import os
+import threading
+import time
 import uuid
 from app.utils.notifications import create_notification
+from app.routes.machine import counting_sessions, detect_full_resolution, apply_totals_to_batch
+from app.utils.batch_grading import BatchGrader, SAMPLE_DIR, load_image_bytes, pick_samples, crop_sample
+from app.utils.bulk_analysis import BulkTotals
+from app.utils.detections import summarize_detections, get_status_table
+from app.utils.frame_decode import decode_frame
+from app.utils.inference import PRIORITY_BULK
+from app.utils.model_loader import model_loader
+from app.routes.events import publish_event, EVENT_BATCH
+from app.routes.machine_routes import pending_batch_counts
 
 batch_bp = Blueprint('batch', __name__)
 
+# Same folder app.serve_upload serves /uploads/... from
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'uploads')
+
+SAMPLE_FIELDS = {
+    'healthy': ('sample_healthy_1_url', 'sample_healthy_2_url'),
+    'defective': ('sample_defective_1_url', 'sample_defective_2_url')
+}
+
+_grader = None
+_grader_lock = threading.Lock()
+
+def _save_sample(batch_id, kind, number, jpeg_bytes):
+    directory = os.path.join(UPLOADS_DIR, SAMPLE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{batch_id}_{kind}_{number}_{int(time.time())}.jpg"
+    with open(os.path.join(directory, filename), 'wb') as f:
+        f.write(jpeg_bytes)
+    return f"/uploads/{SAMPLE_DIR}/{filename}"
+
+def _remove_sample(url):
+    # Only crops the grader wrote itself; client-provided URLs are left alone
+    if url and url.startswith(f'/uploads/{SAMPLE_DIR}/'):
+        path = os.path.join(UPLOADS_DIR, SAMPLE_DIR, os.path.basename(url))
+        if os.path.exists(path):
+            os.remove(path)
+
+def publish_batches(batches):
+    """
+    One 'batch' event per changed batch, with its machine's new pending
+    count (what MachineControl shows as currentBatch) computed once here.
+    """
+    try:
+        machine_ids = {batch.order.machine_id for batch in batches if batch.order}
+        pending = {}
+        for machine_id in machine_ids - {None}:
+            pending.update(pending_batch_counts(machine_id))
+    except Exception as e:
+        print(f"⚠️  Failed to publish batch events: {e}")
+        return
+    for batch in batches:
+        machine_id = batch.order.machine_id if batch.order else None
+        # Same visibility as the batch listing: the order's owner (and admins)
+        owner = [batch.order.user_id] if batch.order else []
+        publish_event(EVENT_BATCH, {
+            'batch': batch.to_dict(),
+            'machineId': machine_id,
+            'pendingBatches': pending.get(machine_id, 0) if machine_id else None
+        }, audience=owner)
+
+def grade_batch(batch_id):
+    """
+    Grader handler: detect beans on the batch image, write the totals and
+    replace empty (or previously auto-generated) sample_* images with crops
+    of the most confident healthy / defective beans.
+    """
+    batch = SortingBatch.query.get(batch_id)
+    if not batch or not batch.image_url:
+        raise ValueError(f'Batch {batch_id} has no image to grade')
+    image_url = batch.image_url
+    # Don't keep a DB connection checked out while the image downloads / the model runs
+    db.session.rollback()
+
+    if not current_app.config.get('INFERENCE_POOL_ADDRESS') and not model_loader.wait(timeout=300):
+        raise RuntimeError(f"Model not ready: {model_loader.status().get('error')}")
+
+    allowed_hosts = current_app.config.get('BATCH_IMAGE_HOSTS', ())
+    frame = decode_frame(load_image_bytes(image_url, UPLOADS_DIR, allowed_hosts), target_size=None)
+    dets, tiles = detect_full_resolution(frame, priority=PRIORITY_BULK)
+    min_confidence = current_app.config.get('INFERENCE_MIN_CONFIDENCE', 0.0)
+    totals = BulkTotals()
+    totals.add(summarize_detections(dets, min_confidence=min_confidence))
+
+    batch = SortingBatch.query.get(batch_id)
+    if not batch or batch.image_url != image_url:
+        # Deleted, or a newer image arrived (it gets its own run)
+        return {'skipped': True}
+
+    healthy, defective = pick_samples(dets, get_status_table(dets.names).is_defect, min_confidence)
+    size = current_app.config.get('BATCH_SAMPLE_SIZE', 256)
+    for kind, picks in (('healthy', healthy), ('defective', defective)):
+        for number, (field, index) in enumerate(zip(SAMPLE_FIELDS[kind], picks), start=1):
+            current = getattr(batch, field)
+            if current and not current.startswith(f'/uploads/{SAMPLE_DIR}/'):
+                continue
+            _remove_sample(current)
+            setattr(batch, field, _save_sample(batch_id, kind, number,
+                                               crop_sample(frame.pixels, dets.xyxy[index], size=size)))
+
+    apply_totals_to_batch(batch_id, totals)
+    publish_batches([SortingBatch.query.get(batch_id)])
+    return dict(totals.to_dict(), tiles=tiles, modelVersion=dets.model_version)
+
+def get_batch_grader():
+    """This process's background grader, created on first use"""
+    global _grader
+    if _grader is None:
+        with _grader_lock:
+            if _grader is None:
+                _grader = BatchGrader(
+                    current_app._get_current_object(),
+                    grade_batch,
+                    workers=current_app.config.get('BATCH_GRADE_WORKERS', 1)
+                )
+    return _grader
+
+def _can_access(batch):
+    """Admins, and the owner of the batch's order (as in the batch history)"""
+    user = User.query.get(get_jwt_identity())
+    if not user:
+        return False
+    return user.role == 'admin' or (batch.order is not None and batch.order.user_id == user.id)
+
+def _wants_grading(data):
+    """Auto-grading is on by config; a request can opt out with autoGrade=false"""
+    if not current_app.config.get('BATCH_AUTO_GRADE', True):
+        return False
+    return str(data.get('autoGrade', True)).lower() not in ('0', 'false', 'no')
+
 @batch_bp.route('/orders/<order_id>/batches', methods=['GET'])
 @jwt_required()
 def get_order_batches(order_id):
@@ -39,9 +170,14 @@ def get_order_batches(order_id):
 def create_batch():
     try:
         data = request.get_json()
-        
+
+        # Counts are optional when the server grades the image itself
+        grade = bool(data.get('imageUrl')) and _wants_grading(data)
+
         # Validate required fields
-        required_fields = ['orderId', 'batchNumber', 'totalWeight', 'totalBeans', 'healthyBeans', 'defectiveBeans']
+        required_fields = ['orderId', 'batchNumber', 'totalWeight']
+        if not grade:
+            required_fields += ['totalBeans', 'healthyBeans', 'defectiveBeans']
         for field in required_fields:
             if field not in data:
                 return jsonify({'success': False, 'message': f'Missing field: {field}'}), 400
@@ -57,10 +193,10 @@ def create_batch():
             order_id=data['orderId'],
             batch_number=data['batchNumber'],
             total_weight=data['totalWeight'],
-            total_beans=data['totalBeans'],
-            healthy_beans=data['healthyBeans'],
-            defective_beans=data['defectiveBeans'],
-            accuracy=data['accuracy'],
+            total_beans=data.get('totalBeans', 0),
+            healthy_beans=data.get('healthyBeans', 0),
+            defective_beans=data.get('defectiveBeans', 0),
+            accuracy=data.get('accuracy', 0),
             status='pending',  # Default to pending since batches inherit machine from order
             image_url=data.get('imageUrl'),
             sample_healthy_1_url=data.get('sampleHealthy1Url'),
@@ -71,11 +207,15 @@ def create_batch():
         
         db.session.add(batch)
         db.session.commit()
-        
+        publish_batches([batch])
+
+        if grade:
+            get_batch_grader().submit(batch.id)
+
         return jsonify({
             'success': True,
             'message': 'Batch created successfully',
-            'data': batch.to_dict()
+            'data': dict(batch.to_dict(), grading=get_batch_grader().status(batch.id) if grade else None)
         }), 201
         
     except Exception as e:
@@ -177,6 +317,7 @@ def auto_generate_batches(order_id):
             created_batches.append(new_batch)
             
         db.session.commit()
+        publish_batches(created_batches)
         
         return jsonify({
             'success': True,
@@ -213,13 +354,23 @@ def update_batch(batch_id):
             batch.defective_beans = data['defectiveBeans']
         if 'accuracy' in data:
             batch.accuracy = data['accuracy']
-            
+
+        # A new image is graded again in the background
+        grade = False
+        if 'imageUrl' in data:
+            grade = bool(data['imageUrl']) and data['imageUrl'] != batch.image_url and _wants_grading(data)
+            batch.image_url = data['imageUrl']
+
         db.session.commit()
-        
+        publish_batches([batch])
+
+        if grade:
+            get_batch_grader().submit(batch.id)
+
         return jsonify({
             'success': True,
             'message': 'Batch updated successfully',
-            'data': batch.to_dict()
+            'data': dict(batch.to_dict(), grading=get_batch_grader().status(batch.id) if grade else None)
         }), 200
         
     except Exception as e:
@@ -229,6 +380,33 @@ def update_batch(batch_id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@batch_bp.route('/batches/<batch_id>/grading', methods=['GET'])
+@jwt_required()
+def get_batch_grading(batch_id):
+    """State of the background grading of this batch's image (this process)"""
+    batch = SortingBatch.query.get(batch_id)
+    if not batch:
+        return jsonify({'success': False, 'message': 'Batch not found'}), 404
+    if not _can_access(batch):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    status = get_batch_grader().status(batch_id)
+    if not status:
+        return jsonify({'success': False, 'message': 'Batch has not been graded here'}), 404
+    return jsonify({'success': True, 'data': status}), 200
+
+@batch_bp.route('/batches/<batch_id>/grading', methods=['POST'])
+@jwt_required()
+def regrade_batch(batch_id):
+    batch = SortingBatch.query.get(batch_id)
+    if not batch:
+        return jsonify({'success': False, 'message': 'Batch not found'}), 404
+    if not _can_access(batch):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    if not batch.image_url:
+        return jsonify({'success': False, 'message': 'Batch has no image'}), 400
+    get_batch_grader().submit(batch_id)
+    return jsonify({'success': True, 'data': get_batch_grader().status(batch_id)}), 202
+
 @batch_bp.route('/batches/<batch_id>/complete', methods=['POST'])
 @jwt_required()
 def complete_batch(batch_id):
@@ -237,10 +415,20 @@ def complete_batch(batch_id):
         if not batch:
             return jsonify({'success': False, 'message': 'Batch not found'}), 404
         
+        # Live camera counts (if a counting session ran) become the batch results
+        counting = counting_sessions.for_batch(batch_id)
+        if counting:
+            totals = counting.apply_to(batch)
+
         # Update batch status
         batch.status = 'completed'
         batch.completed_at = datetime.utcnow()
         db.session.commit()
+        if counting:
+            # Only now: if the commit fails, the batch stays open with its counts
+            counting_sessions.pop_for_batch(batch_id)
+            print(f"🔢 Counting finished for {batch_id}: {totals}")
+        publish_batches([batch])
         
         # ✅ Send notification to batch owner
         # Access user_id through the relationship to Order
@@ -0,0 +1,97 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, decode_token
+import threading
+from app import db
+from app.models.user import User
+from app.utils.event_hub import EventHub
+
+events_bp = Blueprint('events', __name__)
+
+# Event names sent on /api/events
+EVENT_MACHINE = 'machine'            # power toggled / machine created
+EVENT_MACHINE_LOG = 'machine_log'    # new MachineLog entry
+EVENT_TELEMETRY = 'telemetry'        # newest machines_data per machine
+EVENT_BATCH = 'batch'                # SortingBatch created / status changed / graded
+
+event_hub = None
+event_hub_lock = threading.Lock()
+
+def get_event_hub():
+    global event_hub
+    if event_hub is None:
+        with event_hub_lock:
+            if event_hub is None:
+                event_hub = EventHub(
+                    max_queue=current_app.config.get('EVENTS_MAX_QUEUE', 256),
+                    replay=current_app.config.get('EVENTS_REPLAY', 500)
+                )
+    return event_hub
+
+def publish_event(event, data, audience=None):
+    """
+    Publish after the change is committed; never fails the caller's request.
+    `audience`: user ids that may see it (admins always do); None = everyone.
+    """
+    try:
+        get_event_hub().publish(event, data, audience)
+    except Exception as e:
+        print(f"⚠️  Failed to publish {event} event: {e}")
+
+# ========================================
+# SSE: /api/events
+# ========================================
+# EventSource cannot send headers, so the JWT comes as ?token=...
+# Optional ?events=machine,machine_log limits what is sent. Non-admins only
+# get the batch events of their own orders.
+@events_bp.route('/events', methods=['GET'])
+def stream_events():
+    try:
+        claims = decode_token(request.args.get('token', ''))
+    except Exception:
+        claims = None
+    if not claims or claims.get('type') != 'access':
+        return jsonify({'success': False, 'message': 'Invalid or missing token'}), 401
+
+    user = User.query.get(claims.get('sub'))
+    if not user:
+        return jsonify({'success': False, 'message': 'User not found'}), 401
+    user_id, is_admin = user.id, user.role == 'admin'
+    # The stream stays open for a long time; don't hold a DB connection for it
+    db.session.rollback()
+
+    events = [e for e in request.args.get('events', '').split(',') if e] or None
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    hub = get_event_hub()
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT', 15)
+    subscription = hub.subscribe(events, last_event_id, user_id=user_id, is_admin=is_admin)
+
+    def generate():
+        try:
+            # Reconnect delay for EventSource; also flushes headers right away
+            yield 'retry: 3000\n\n'
+            while True:
+                if subscription.closed and subscription.queue.empty():
+                    return  # dropped for lagging; the browser reconnects
+                frame = subscription.get(timeout=heartbeat)
+                yield frame if frame is not None else ': heartbeat\n\n'
+        finally:
+            hub.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@events_bp.route('/events/stats', methods=['GET'])
+@jwt_required()
+def event_stats():
+    user = User.query.get(get_jwt_identity())
+    if not user or user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Access denied. Admin only.'}), 403
+    return jsonify({'success': True, 'data': get_event_hub().stats()}), 200
@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify
 from app import db
 from sqlalchemy import text
+from app.routes.machine import get_inference_status
 
 health_bp = Blueprint('health', __name__)
 
@@ -14,7 +15,8 @@ def health_check():
             'success': True,
             'message': 'API is running and database connection is healthy',
             'status': 'healthy',
-            'database': 'connected'
+            'database': 'connected',
+            'model': get_inference_status()
         }), 200
     except Exception as e:
         return jsonify({
@@ -24,6 +26,15 @@ def health_check():
             'database': 'disconnected'
         }), 500
 
+@health_bp.route('/health/model', methods=['GET'])
+def model_readiness():
+    """Readiness probe for the AI model (200 when ready, 503 otherwise)"""
+    status = get_inference_status()
+    return jsonify({
+        'success': status['ready'],
+        'model': status
+    }), 200 if status['ready'] else 503
+
 @health_bp.route('/', methods=['GET'])
 def root():
     return jsonify({
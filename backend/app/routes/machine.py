@@ -1,34 +1,368 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+import threading
+import json
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import functools
+import math
 import os
-from ultralytics import YOLO
-from PIL import Image
-import io
+import time
+from datetime import datetime, timedelta
+from app.utils.inference import (
+    BatchInferenceEngine, InferenceOverloaded, PRIORITY_LIVE, PRIORITY_NORMAL, PRIORITY_BULK, SHED_KEY_LIMIT
+)
+from app.utils.inference_pool import InferencePoolClient
+from app.utils.detections import summarize_detections
+from app.utils.model_loader import model_loader
+from app.utils.model_shadow import ShadowRunner
+from app import db, JAKARTA_TZ
+from app.models.sorting_batch import SortingBatch
+from app.utils.frame_decode import decode_frame as decode_image
+from app.utils.bulk_analysis import spool_uploads, iter_uploaded_images, analyze_many, BulkTotals
+from app.utils.bean_tracker import CountingRegistry
+from app.utils.tiling import detect_tiled, needs_tiling, tile_grid, tiled_submitter
+from app.utils.frame_quality import check_quality, DEFAULT_THRESHOLDS
+from app.utils.machine_settings import MachineSettingsCache
+from app.utils.frame_roi import RegionOfInterest
+from app.utils.detection_store import DetectionStore
+from app.utils.detections import get_status_table
+from app.utils.frame_cache import FrameResultCache, frame_digest, frame_thumbnail, HIT_EXACT, HIT_SIMILAR
 
 machine_bp = Blueprint('machine', __name__)
 
-# Load Model
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-MODEL_PATH = os.path.join(BASE_DIR, 'machine_model', 'best.pt')
+# Shared micro-batching engine and frame cache, created on first use with app config
+_engine = None
+_engine_lock = threading.Lock()
+_pool_client = None
+_frame_cache = None
+_detection_store = None
 
-try:
-    print(f"🔄 Loading YOLO model from: {MODEL_PATH}")
-    model = YOLO(MODEL_PATH)
-    print(f"✅ YOLO model loaded successfully!")
-    print(f"📋 Model task: {model.task}")
-    print(f"📋 Model classes: {model.names}")
-except Exception as e:
-    print(f"❌ Error loading YOLO model: {e}")
-    model = None
+# Live bean counting per machine (this process only, like stream sessions)
+counting_sessions = CountingRegistry()
+
+def _load_machine_settings(machine_id):
+    from app.models.machine import Machine
+    machine = Machine.query.get(machine_id)
+    if not machine:
+        return None
+    roi = None
+    if machine.roi:
+        try:
+            roi = RegionOfInterest.from_dict(machine.roi)
+        except ValueError as e:
+            print(f"⚠️  Ignoring invalid ROI of machine {machine_id}: {e}")
+    return {'qualityThresholds': machine.quality_thresholds or {}, 'roi': roi}
+
+machine_settings = MachineSettingsCache(_load_machine_settings)
+
+# Frames checked / rejected by the quality gate, since start
+quality_stats = {'checked': 0, 'rejected': {}}
+
+# app.config key -> quality threshold name
+QUALITY_CONFIG_KEYS = {
+    'QUALITY_MIN_SHARPNESS': 'minSharpness',
+    'QUALITY_MIN_BRIGHTNESS': 'minBrightness',
+    'QUALITY_MAX_BRIGHTNESS': 'maxBrightness',
+    'QUALITY_MAX_HIGHLIGHTS': 'maxHighlights',
+    'QUALITY_MAX_SHADOWS': 'maxShadows'
+}
+
+# Replays sampled live batches on the shadow model version, if one is loaded
+shadow_runner = ShadowRunner()
+
+def _predict_batch(frames):
+    # Take the active version once per batch: a hot swap never splits a batch
+    active = model_loader.active()
+    started = time.perf_counter()
+    results = active.model.predict(frames)
+    elapsed = time.perf_counter() - started
+    for dets in results:
+        dets.model_version = active.version
+
+    shadow = model_loader.shadow()
+    if shadow:
+        shadow_runner.offer(shadow, frames, results, elapsed)
+    return results
+
+def get_inference_engine():
+    global _engine, _pool_client
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                pool_address = current_app.config.get('INFERENCE_POOL_ADDRESS')
+                if pool_address:
+                    client = InferencePoolClient(
+                        pool_address,
+                        authkey=current_app.config['INFERENCE_POOL_AUTHKEY']
+                    )
+                    predict_batch = client.predict_batch
+                    _pool_client = client
+                    # One batch in flight per pool worker process
+                    concurrency = current_app.config.get('INFERENCE_POOL_PROCESSES', 2)
+                else:
+                    predict_batch = _predict_batch
+                    concurrency = 1
+                _engine = BatchInferenceEngine(
+                    predict_batch,
+                    max_batch_size=current_app.config.get('INFERENCE_MAX_BATCH_SIZE', 8),
+                    max_wait_ms=current_app.config.get('INFERENCE_MAX_WAIT_MS', 25),
+                    concurrency=concurrency,
+                    max_queue=current_app.config.get('INFERENCE_MAX_QUEUE', 32),
+                    max_per_key=current_app.config.get('INFERENCE_MAX_QUEUE_PER_MACHINE', 4),
+                    max_queue_age_ms=current_app.config.get('INFERENCE_MAX_QUEUE_AGE_MS', 2000)
+                )
+    return _engine
+
+def serving_version():
+    """Model version answering frames now: the pool's when one is used, else the loaded one"""
+    return _pool_client.version if _pool_client else model_loader.version
+
+def get_frame_cache():
+    """Per-stream result cache for unchanged frames (None when disabled)"""
+    global _frame_cache
+    if not current_app.config.get('FRAME_CACHE_ENABLED', True):
+        return None
+    if _frame_cache is None:
+        with _engine_lock:
+            if _frame_cache is None:
+                _frame_cache = FrameResultCache(
+                    similarity_threshold=current_app.config.get('FRAME_CACHE_SIMILARITY', 0.02),
+                    ttl=current_app.config.get('FRAME_CACHE_TTL', 5.0)
+                )
+    return _frame_cache
+
+def invalidate_machine_settings(machine_id):
+    """After a machine's ROI / thresholds change: reload them and drop its cached frame result"""
+    machine_settings.invalidate(machine_id)
+    if _frame_cache is not None:
+        _frame_cache.invalidate(f'machine:{machine_id}')
+
+def get_detection_store():
+    """Per-frame detection history (None when disabled)"""
+    global _detection_store
+    if not current_app.config.get('DETECTION_STORE_ENABLED', True):
+        return None
+    if _detection_store is None:
+        with _engine_lock:
+            if _detection_store is None:
+                _detection_store = DetectionStore(
+                    current_app.config['DETECTION_STORE_DIR'],
+                    window_seconds=current_app.config.get('DETECTION_STORE_WINDOW', 3600),
+                    flush_interval=current_app.config.get('DETECTION_STORE_FLUSH_INTERVAL', 5)
+                )
+    return _detection_store
+
+def get_inference_status():
+    """Readiness of whichever inference backend this process uses"""
+    pool_address = current_app.config.get('INFERENCE_POOL_ADDRESS')
+    if pool_address:
+        client = InferencePoolClient(pool_address, authkey=current_app.config['INFERENCE_POOL_AUTHKEY'])
+        ready = client.ping()
+        return {
+            'backend': 'pool',
+            'state': 'ready' if ready else 'unreachable',
+            'ready': ready,
+            'address': pool_address
+        }
+    return {'backend': 'local', **model_loader.status()}
+
+def ensure_inference_ready():
+    """True if frames can be analysed now; starts lazy model loading otherwise"""
+    if current_app.config.get('INFERENCE_POOL_ADDRESS') or model_loader.is_ready:
+        return True
+    model_loader.start()
+    return False
+
+def model_not_ready_response():
+    response = jsonify({
+        'success': False,
+        'message': 'Model AI belum siap. Coba lagi sebentar.',
+        'model': model_loader.status()
+    })
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+def overloaded_response(error):
+    """429 when one machine floods the queue, 503 when the engine as a whole is full"""
+    status = 429 if error.reason == SHED_KEY_LIMIT else 503
+    response = jsonify({
+        'success': False,
+        'message': 'Server analisis sedang sibuk. Coba lagi sebentar.',
+        'reason': error.reason,
+        'retryAfter': error.retry_after
+    })
+    response.headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return response, status
+
+def decode_frame(img_bytes):
+    """Decode straight to (about) the model input size; see frame_decode"""
+    return decode_image(
+        img_bytes,
+        target_size=current_app.config.get('INFERENCE_IMGSZ', 640),
+        reuse_buffer=True
+    )
+
+def detect_image(frame, timeout=None, priority=PRIORITY_LIVE, key=None):
+    """
+    Run one DecodedFrame through the shared engine (batched together with
+    concurrent requests); returns FrameDetections in original-image pixels.
+    `key` (machine/stream) is what admission control keeps fair.
+
+    Raises concurrent.futures.TimeoutError if the engine doesn't answer in
+    time, InferenceOverloaded if the frame is shed.
+    """
+    if timeout is None:
+        timeout = current_app.config.get('INFERENCE_TIMEOUT', 30)
+
+    future = get_inference_engine().submit(frame.pixels, priority, key=key)
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+    return frame.to_original(result)
+
+def analyze_image(frame, timeout=None, priority=PRIORITY_LIVE):
+    """Detect + summarise one DecodedFrame"""
+    return summarize_detections(
+        detect_image(frame, timeout=timeout, priority=priority),
+        min_confidence=current_app.config.get('INFERENCE_MIN_CONFIDENCE', 0.0)
+    )
+
+def detect_full_resolution(frame, timeout=None, priority=PRIORITY_NORMAL):
+    """
+    FrameDetections (original pixels) for a full-resolution DecodedFrame:
+    large images are cut into overlapping model-sized tiles that run as one
+    batch (across the pool when configured) and are merged with cross-tile
+    NMS; small images take the normal single pass. Returns (dets, tiles).
+    """
+    if timeout is None:
+        timeout = current_app.config.get('INFERENCE_TIMEOUT', 30)
+    tile_size = current_app.config.get('INFERENCE_TILE_SIZE', 640)
+    overlap = current_app.config.get('INFERENCE_TILE_OVERLAP', 0.2)
+
+    width, height = frame.original_size
+    if not needs_tiling(width, height, tile_size):
+        return detect_image(frame, timeout=timeout, priority=priority), 1
+
+    dets = detect_tiled(
+        frame.pixels,
+        # Bounded by the tile count of this one image, so no admission check
+        functools.partial(get_inference_engine().submit, priority=priority, admission=False),
+        tile_size=tile_size,
+        overlap=overlap,
+        timeout=timeout
+    )
+    return dets, len(tile_grid(width, height, tile_size, overlap))
+
+def analyze_tiled_bytes(img_bytes, timeout=None, priority=PRIORITY_NORMAL):
+    """Full-resolution analysis for large tray photos (see detect_full_resolution)"""
+    frame = decode_image(img_bytes, target_size=None)
+    dets, tiles = detect_full_resolution(frame, timeout=timeout, priority=priority)
+    data = summarize_detections(
+        dets,
+        min_confidence=current_app.config.get('INFERENCE_MIN_CONFIDENCE', 0.0)
+    )
+    data['tiles'] = tiles
+    return data
+
+def quality_thresholds(machine_id=None):
+    """Global thresholds from config, overridden by the machine's own"""
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for config_key, name in QUALITY_CONFIG_KEYS.items():
+        if current_app.config.get(config_key) is not None:
+            thresholds[name] = current_app.config[config_key]
+    settings = machine_settings.get(machine_id)
+    if settings:
+        thresholds.update(settings['qualityThresholds'])
+    return thresholds
+
+def check_frame_quality(frame, machine_id=None):
+    """None if the frame is usable, else the 'rejected' analysis result"""
+    if not current_app.config.get('QUALITY_GATE_ENABLED', True):
+        return None
+    ok, reason, metrics = check_quality(frame.pixels, quality_thresholds(machine_id))
+    quality_stats['checked'] += 1
+    if ok:
+        return None
+    quality_stats['rejected'][reason] = quality_stats['rejected'].get(reason, 0) + 1
+    return {
+        'status': 'rejected',
+        'accuracy': 0,
+        'detections': [],
+        'quality': {'ok': False, 'reason': reason, **metrics}
+    }
+
+def analyze_frame_bytes(img_bytes, stream_key=None, timeout=None, machine_id=None):
+    """
+    Decode + analyse encoded frame bytes. With a `stream_key` (machine or
+    session), unchanged frames are answered from the frame cache: identical
+    bytes skip even the decode, near-identical frames skip the model.
+    Results of a model version that has since been swapped out are not reused.
+
+    With a `machine_id`, the frame is cropped to that machine's ROI (belt
+    area) before the quality check and inference; boxes are still returned
+    in full-frame coordinates. Blurred or badly exposed frames are rejected
+    before inference (status 'rejected' with the reason), using the
+    machine's quality thresholds.
+
+    If `machine_id` has an active counting session, fresh detections are fed
+    to its bean tracker (cached frames add nothing new to count); its current
+    totals are added to every answer, cached or not, and never cached. Fresh
+    detections of a machine are also appended to the detection store.
+    """
+    counting = counting_sessions.get(machine_id)
+    cache = get_frame_cache() if stream_key else None
+    if cache:
+        digest = frame_digest(img_bytes)
+        cached = cache.lookup_exact(stream_key, digest)
+        if cached is not None and cached.get('modelVersion') == serving_version():
+            return _with_counting(dict(cached, cached=HIT_EXACT), counting)
+
+    frame = decode_frame(img_bytes)
+    settings = machine_settings.get(machine_id)
+    roi = settings['roi'] if settings else None
+    region = roi.crop(frame) if roi else frame
+
+    rejected = check_frame_quality(region, machine_id)
+    if rejected:
+        return rejected
+
+    if cache:
+        thumbnail = frame_thumbnail(frame.pixels)
+        cached = cache.lookup_similar(stream_key, thumbnail)
+        if cached is not None and cached.get('modelVersion') == serving_version():
+            return _with_counting(dict(cached, cached=HIT_SIMILAR), counting)
+
+    min_confidence = current_app.config.get('INFERENCE_MIN_CONFIDENCE', 0.0)
+    dets = detect_image(region, timeout=timeout, key=stream_key)
+    if roi and roi.kind == 'polygon':
+        # The gray mask keeps most of them away; drop any box centred outside
+        dets = roi.select(dets, frame.original_size)
+    data = summarize_detections(dets, min_confidence=min_confidence)
+
+    store = get_detection_store() if machine_id else None
+    if store:
+        store.record(machine_id, dets.select(dets.conf >= min_confidence) if min_confidence else dets)
+
+    if counting:
+        counting.update(dets, min_confidence=min_confidence)
+
+    if cache:
+        cache.store(stream_key, digest, thumbnail, data)
+    return _with_counting(data, counting)
+
+def _with_counting(data, counting):
+    """Copy of `data` with the counting session's running totals, if there is one"""
+    return dict(data, counting=counting.totals()) if counting else data
 
 @machine_bp.route('/machine/analyze', methods=['POST'])
 @jwt_required()
 def analyze_frame():
-    if not model:
-        return jsonify({
-            'success': False,
-            'message': 'Model AI belum dimuat. Periksa log server.'
-        }), 500
+    if not ensure_inference_ready():
+        # Answer fast instead of blocking the worker while the model loads
+        return model_not_ready_response()
 
     if 'image' not in request.files:
         return jsonify({
@@ -38,87 +372,29 @@ def analyze_frame():
 
     try:
         file = request.files['image']
-        img_bytes = file.read()
-        img = Image.open(io.BytesIO(img_bytes))
-
-        # Convert to RGB
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-
-        print(f"🖼️ Image size: {img.size}, mode: {img.mode}")
 
-        # Run detection
-        results = model(img, verbose=False)
-        result = results[0]
+        # Cache per machine when the client says which one, else per user
+        machine_id = request.form.get('machineId')
+        stream_key = f'machine:{machine_id}' if machine_id else f'user:{get_jwt_identity()}'
+        tiled = request.form.get('tiled', 'false').lower() in ('1', 'true', 'yes')
 
-        # Check if any objects detected
-        if result.boxes is None or len(result.boxes) == 0:
-            print("⚠️ No objects detected in image")
-            return jsonify({
-                'success': True,
-                'data': {
-                    'status': 'healthy',  # No defects found
-                    'accuracy': 0,
-                    'detections': []
-                }
-            })
-
-        # Process all detections
-        detections = []
-        max_confidence = 0
-        dominant_status = 'healthy'
-
-        for box in result.boxes:
-            conf = float(box.conf[0])
-            cls_idx = int(box.cls[0])
-            label = model.names[cls_idx]
-            
-            # Get bounding box
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            
-            detections.append({
-                'label': label,
-                'confidence': round(conf * 100, 1),
-                'bbox': [x1, y1, x2, y2]
-            })
-
-            # ✅ FIXED: Map Indonesian labels to status
-            label_lower = label.lower()
-            
-            # Check for defect (Rusak, Cacat, etc.)
-            is_defect = any(keyword in label_lower for keyword in 
-                          ['rusak', 'cacat', 'buruk', 'jelek'])
-            
-            # Check for healthy (Bagus, Baik, Sehat, etc.)
-            is_healthy = any(keyword in label_lower for keyword in 
-                           ['bagus', 'baik', 'sehat', 'good'])
-            
-            # Determine current status
-            if is_defect:
-                current_status = 'defect'
-            elif is_healthy:
-                current_status = 'healthy'
+        try:
+            if tiled:
+                # High-resolution tray photo: no cache, no live counting
+                data = analyze_tiled_bytes(file.read())
             else:
-                print(f"⚠️ Unknown label: '{label}'")
-                current_status = 'healthy'  # Default to healthy for unknown
-
-            # Update dominant if higher confidence
-            if conf > max_confidence:
-                max_confidence = conf
-                dominant_status = current_status
-
-            print(f"🔍 Detection: '{label}' → {current_status} (conf: {conf:.3f})")
-
-        print(f"🎯 Final status: {dominant_status} with confidence {max_confidence:.3f}")
+                data = analyze_frame_bytes(file.read(), stream_key=stream_key, machine_id=machine_id)
+        except FutureTimeoutError:
+            return jsonify({
+                'success': False,
+                'message': 'Inference timed out'
+            }), 504
+        except InferenceOverloaded as e:
+            return overloaded_response(e)
 
         return jsonify({
             'success': True,
-            'data': {
-                'status': dominant_status,
-                'accuracy': round(max_confidence * 100, 1),
-                'detections': detections,
-                'total_objects': len(detections)
-            }
+            'data': data
         })
 
     except Exception as e:
@@ -129,3 +405,325 @@ def analyze_frame():
             'success': False,
             'message': str(e)
         }), 500
+
+@machine_bp.route('/machine/analyze/cache', methods=['GET'])
+@jwt_required()
+def frame_cache_stats():
+    """Hit/miss counters of the unchanged-frame cache, for tuning"""
+    cache = get_frame_cache()
+    return jsonify({
+        'success': True,
+        'data': cache.stats() if cache else {'enabled': False}
+    }), 200
+
+def run_bulk_analysis(uploads, tiled=False, priority=PRIORITY_BULK, timeout=None):
+    """
+    Pipeline spooled uploads (see bulk_analysis) through the shared engine;
+    yields (index, name, data, error) in upload order. Needs an app context
+    for as long as it is iterated.
+    """
+    engine = get_inference_engine()
+    target_size = current_app.config.get('INFERENCE_IMGSZ', 640)
+    min_confidence = current_app.config.get('INFERENCE_MIN_CONFIDENCE', 0.0)
+    if timeout is None:
+        timeout = current_app.config.get('INFERENCE_TIMEOUT', 30)
+
+    # Bulk priority keeps it behind live camera frames in the engine queue;
+    # analyze_many bounds its own in-flight window, so no admission check
+    submit = functools.partial(engine.submit, priority=priority, admission=False)
+    if tiled:
+        # Full-resolution decode, large images split into tiles
+        target_size = None
+        submit = tiled_submitter(
+            submit,
+            tile_size=current_app.config.get('INFERENCE_TILE_SIZE', 640),
+            overlap=current_app.config.get('INFERENCE_TILE_OVERLAP', 0.2),
+            timeout=timeout
+        )
+
+    return analyze_many(
+        iter_uploaded_images(uploads),
+        decode=lambda img_bytes: decode_image(img_bytes, target_size=target_size),
+        submit=submit,
+        summarize=lambda dets: summarize_detections(dets, min_confidence=min_confidence),
+        window=engine.max_batch_size * engine.concurrency * 2,
+        timeout=timeout
+    )
+
+def apply_totals_to_batch(batch_id, totals):
+    """Write BulkTotals onto a SortingBatch and commit"""
+    batch = SortingBatch.query.get(batch_id)
+    if not batch:
+        raise ValueError(f'Batch {batch_id} not found')
+    batch.total_beans = totals.total_beans
+    batch.healthy_beans = totals.healthy_beans
+    batch.defective_beans = totals.defective_beans
+    batch.accuracy = totals.accuracy
+    db.session.commit()
+
+@machine_bp.route('/machine/analyze/quality', methods=['GET'])
+@jwt_required()
+def frame_quality_stats():
+    """Quality gate counters and the thresholds in effect (?machineId= for one machine)"""
+    checked = quality_stats['checked']
+    rejected = sum(quality_stats['rejected'].values())
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': current_app.config.get('QUALITY_GATE_ENABLED', True),
+            'checked': checked,
+            'rejected': dict(quality_stats['rejected']),
+            'rejectRate': round(rejected / checked, 4) if checked else 0,
+            'thresholds': quality_thresholds(request.args.get('machineId'))
+        }
+    }), 200
+
+@machine_bp.route('/machine/analyze/queue', methods=['GET'])
+@jwt_required()
+def inference_queue_stats():
+    """Queue depth, wait times and shed counts of the shared inference engine"""
+    return jsonify({
+        'success': True,
+        'data': get_inference_engine().stats()
+    }), 200
+
+def _parse_time(value, default):
+    """Epoch seconds from an ISO date (naive = Jakarta time) or epoch number"""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = JAKARTA_TZ.localize(parsed)
+    return parsed.timestamp()
+
+@machine_bp.route('/machine/<machine_id>/detections/summary', methods=['GET'])
+@jwt_required()
+def detection_summary(machine_id):
+    """
+    Class histogram and confidence distribution of this machine's detections
+    between `from` and `to` (ISO or epoch seconds; default the last 24 hours).
+    `bins` sets the confidence histogram resolution.
+    """
+    store = get_detection_store()
+    if not store:
+        return jsonify({'success': False, 'message': 'Detection store is disabled'}), 404
+
+    now = time.time()
+    try:
+        start = _parse_time(request.args.get('from'), now - timedelta(days=1).total_seconds())
+        end = _parse_time(request.args.get('to'), now)
+        bins = min(max(int(request.args.get('bins', 20)), 1), 200)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid from/to/bins'}), 400
+    if end <= start:
+        return jsonify({'success': False, 'message': '`to` must be after `from`'}), 400
+
+    names = store.names(machine_id)
+    is_defect = get_status_table(names).is_defect if names else None
+    data = store.summary(machine_id, start, end, bins=bins, is_defect=is_defect)
+    data['from'] = datetime.fromtimestamp(start, JAKARTA_TZ).isoformat()
+    data['to'] = datetime.fromtimestamp(end, JAKARTA_TZ).isoformat()
+    return jsonify({'success': True, 'data': data}), 200
+
+@machine_bp.route('/machine/analyze/bulk', methods=['POST'])
+@jwt_required()
+def analyze_bulk():
+    """
+    Grade many images in one request: multipart `images` (repeatable) and/or
+    `archive` (.zip). Streams one NDJSON line per image, then a summary line.
+    With `batchId`, the summed counts are written to that SortingBatch;
+    `tiled=true` analyses large tray photos tile by tile.
+    """
+    if not ensure_inference_ready():
+        return model_not_ready_response()
+
+    files = request.files.getlist('images') + request.files.getlist('archive')
+    if not files:
+        return jsonify({
+            'success': False,
+            'message': 'No images uploaded'
+        }), 400
+
+    batch_id = request.form.get('batchId')
+    if batch_id and not SortingBatch.query.get(batch_id):
+        return jsonify({'success': False, 'message': 'Batch not found'}), 404
+
+    uploads = spool_uploads(files)
+    tiled = request.form.get('tiled', 'false').lower() in ('1', 'true', 'yes')
+    results = run_bulk_analysis(uploads, tiled=tiled)
+
+    def generate():
+        totals = BulkTotals()
+        for index, name, data, error in results:
+            if error is not None:
+                totals.failed += 1
+                line = {'type': 'error', 'index': index, 'name': name, 'message': str(error)}
+            else:
+                totals.add(data)
+                line = {'type': 'result', 'index': index, 'name': name, 'data': data}
+            yield json.dumps(line) + '\n'
+
+        summary = {'type': 'summary', **totals.to_dict()}
+        if batch_id:
+            try:
+                apply_totals_to_batch(batch_id, totals)
+                summary['batchUpdated'] = batch_id
+            except Exception as e:
+                db.session.rollback()
+                summary['batchError'] = str(e)
+        print(f"📦 Bulk analysis done: {totals.to_dict()}")
+        yield json.dumps(summary) + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# ========================================
+# Live bean counting -> SortingBatch totals
+# ========================================
+def _active_batch(machine_id):
+    """Oldest pending batch whose order runs on this machine"""
+    from app.models.order import Order
+    return SortingBatch.query.join(Order).filter(
+        db.or_(SortingBatch.machine_id == machine_id, Order.machine_id == machine_id),
+        SortingBatch.status == 'pending'
+    ).order_by(SortingBatch.created_at.asc(), SortingBatch.batch_number.asc()).first()
+
+@machine_bp.route('/machine/<machine_id>/counting', methods=['POST'])
+@jwt_required()
+def start_counting(machine_id):
+    """
+    Start counting beans from this machine's camera frames. Totals are written
+    to the batch (given `batchId`, else the machine's active pending batch)
+    when it is completed.
+    """
+    data = request.get_json(silent=True) or {}
+    batch_id = data.get('batchId')
+    batch = SortingBatch.query.get(batch_id) if batch_id else _active_batch(machine_id)
+    if not batch:
+        return jsonify({
+            'success': False,
+            'message': 'Batch not found' if batch_id else 'No active batch for this machine'
+        }), 404
+
+    session = counting_sessions.start(
+        machine_id,
+        batch.id,
+        iou_threshold=current_app.config.get('COUNTING_IOU_THRESHOLD', 0.3),
+        max_missed=current_app.config.get('COUNTING_MAX_MISSED', 3),
+        min_hits=current_app.config.get('COUNTING_MIN_HITS', 2)
+    )
+    print(f"🔢 Counting started: machine={machine_id} batch={batch.id}")
+    return jsonify({'success': True, 'data': session.to_dict()}), 201
+
+@machine_bp.route('/machine/<machine_id>/counting', methods=['GET'])
+@jwt_required()
+def get_counting(machine_id):
+    session = counting_sessions.get(machine_id)
+    if not session:
+        return jsonify({'success': False, 'message': 'No counting session for this machine'}), 404
+    return jsonify({'success': True, 'data': session.to_dict()}), 200
+
+@machine_bp.route('/machine/<machine_id>/counting', methods=['DELETE'])
+@jwt_required()
+def cancel_counting(machine_id):
+    """Drop the session without touching the batch"""
+    session = counting_sessions.stop(machine_id)
+    if not session:
+        return jsonify({'success': False, 'message': 'No counting session for this machine'}), 404
+    return jsonify({'success': True, 'data': session.to_dict()}), 200
+
+def _require_admin():
+    from app.models.user import User
+    user = User.query.get(get_jwt_identity())
+    return user is not None and user.role == 'admin'
+
+def _model_registry_status():
+    return {
+        **model_loader.status(),
+        'shadowStats': shadow_runner.stats() if model_loader.shadow() else None
+    }
+
+@machine_bp.route('/machine/model', methods=['GET'])
+@jwt_required()
+def get_model_status():
+    """Active model version, previous (rollback) version, shadow comparison"""
+    return jsonify({'success': True, 'data': _model_registry_status()}), 200
+
+@machine_bp.route('/machine/model', methods=['POST'])
+@jwt_required()
+def load_model_version():
+    """
+    Load a model version in the background and switch to it once warmed up.
+    Body: {"modelPath": "best.pt", "version": "optional label",
+           "shadow": true, "sampleRate": 0.1}
+    `modelPath` is relative to the model directory (default: the configured
+    weights, e.g. after copying a retrained best.pt over it). With `shadow`
+    the new version only runs on a sample of live frames for comparison
+    until it is promoted.
+    """
+    if not _require_admin():
+        return jsonify({'success': False, 'message': 'Access denied. Admin only.'}), 403
+    if current_app.config.get('INFERENCE_POOL_ADDRESS'):
+        return jsonify({
+            'success': False,
+            'message': 'Model is served by the inference pool; restart inference_server.py to change it'
+        }), 409
+
+    data = request.get_json(silent=True) or {}
+    model_dir = os.path.dirname(os.path.abspath(model_loader.model_path))
+    model_path = os.path.abspath(os.path.join(model_dir, data.get('modelPath') or model_loader.model_path))
+    if os.path.dirname(model_path) != model_dir or not os.path.isfile(model_path):
+        return jsonify({'success': False, 'message': f'Model file not found in {model_dir}'}), 404
+
+    shadow = bool(data.get('shadow'))
+    if shadow:
+        try:
+            sample_rate = float(data.get('sampleRate', current_app.config.get('MODEL_SHADOW_SAMPLE_RATE', 0.1)))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'sampleRate must be a number'}), 400
+        shadow_runner.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    if not model_loader.load_version(model_path, version=data.get('version'), shadow=shadow):
+        return jsonify({'success': False, 'message': 'Another model version is still loading'}), 409
+
+    print(f"🔁 Loading model {model_path} ({'shadow' if shadow else 'active'})")
+    return jsonify({'success': True, 'data': _model_registry_status()}), 202
+
+@machine_bp.route('/machine/model/promote', methods=['POST'])
+@jwt_required()
+def promote_model_shadow():
+    """Serve with the shadow version from the next batch on"""
+    if not _require_admin():
+        return jsonify({'success': False, 'message': 'Access denied. Admin only.'}), 403
+    promoted = model_loader.promote_shadow()
+    if not promoted:
+        return jsonify({'success': False, 'message': 'No shadow model loaded'}), 404
+    print(f"✅ Shadow model {promoted.version} promoted")
+    return jsonify({'success': True, 'data': _model_registry_status()}), 200
+
+@machine_bp.route('/machine/model/rollback', methods=['POST'])
+@jwt_required()
+def rollback_model():
+    if not _require_admin():
+        return jsonify({'success': False, 'message': 'Access denied. Admin only.'}), 403
+    restored = model_loader.rollback()
+    if not restored:
+        return jsonify({'success': False, 'message': 'No previous model version'}), 404
+    print(f"↩️  Rolled back to model {restored.version}")
+    return jsonify({'success': True, 'data': _model_registry_status()}), 200
+
+@machine_bp.route('/machine/model/shadow', methods=['DELETE'])
+@jwt_required()
+def stop_model_shadow():
+    if not _require_admin():
+        return jsonify({'success': False, 'message': 'Access denied. Admin only.'}), 403
+    if not model_loader.stop_shadow():
+        return jsonify({'success': False, 'message': 'No shadow model loaded'}), 404
+    return jsonify({'success': True, 'data': _model_registry_status()}), 200
@@ -1,72 +1,209 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
 from app import db
 from app.models.machine import Machine
-from app.models.machine_log import MachineLog
+from app.models.machine_log import MachineLog, jakarta_now
 from app.models.sorting_result import SortingResult
 from app.models.sorting_batch import SortingBatch
 from app.models.order import Order
 from sqlalchemy import func
 from datetime import datetime, timedelta
+from app.utils.telemetry import parse_readings, insert_readings, READING_FIELDS
+from app.utils.downsample import downsampled_series, parse_chart_args
+from app.routes.events import publish_event, EVENT_MACHINE, EVENT_MACHINE_LOG, EVENT_TELEMETRY
+from app.utils.log_writer import LogWriter
+import threading
 
 machine_routes_bp = Blueprint('machine_routes', __name__)
 
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+LOG_COLUMNS = ('id', 'machine_id', 'message', 'type', 'created_at')
+
+def insert_machine_logs(rows):
+    """One multi-row INSERT into machine_logs, on its own connection"""
+    with db.engine.begin() as connection:
+        connection.execute(MachineLog.__table__.insert(), rows)
+
+def get_log_writer():
+    """This process's MachineLog writer, created on first use"""
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                config = current_app.config
+                _log_writer = LogWriter(
+                    current_app._get_current_object(),
+                    insert_machine_logs,
+                    flush_size=config.get('MACHINE_LOG_FLUSH_SIZE', 200),
+                    flush_interval=config.get('MACHINE_LOG_FLUSH_INTERVAL', 1.0),
+                    max_buffered=config.get('MACHINE_LOG_MAX_BUFFERED', 10000)
+                )
+    return _log_writer
+
+def write_machine_log(machine_id, message, log_type):
+    """
+    Record a MachineLog entry and return it (transient, for the response).
+    With MACHINE_LOG_ASYNC it is buffered and written by the background
+    writer within MACHINE_LOG_FLUSH_INTERVAL; otherwise inserted right away.
+    """
+    log = MachineLog(
+        id=MachineLog.generate_id(),
+        machine_id=machine_id,
+        message=message,
+        type=log_type,
+        created_at=jakarta_now()
+    )
+    if current_app.config.get('MACHINE_LOG_ASYNC', True):
+        get_log_writer().write({column: getattr(log, column) for column in LOG_COLUMNS})
+    else:
+        db.session.add(log)
+        db.session.commit()
+    publish_event(EVENT_MACHINE_LOG, log.to_dict())
+    return log
+
+def _latest_machine_data(*filters):
+    from app.models.machine_data import MachineData
+
+    if db.engine.dialect.name == 'postgresql':
+        # DISTINCT ON over ix_machines_data_machine_created
+        rows = MachineData.query.filter(*filters)\
+            .distinct(MachineData.machine_id)\
+            .order_by(MachineData.machine_id, MachineData.created_at.desc())\
+            .all()
+    else:
+        ranked = db.session.query(
+            MachineData.id,
+            func.row_number().over(
+                partition_by=MachineData.machine_id,
+                order_by=MachineData.created_at.desc()
+            ).label('rank')
+        ).filter(*filters).subquery()
+        rows = MachineData.query.join(ranked, ranked.c.id == MachineData.id)\
+            .filter(ranked.c.rank == 1, *filters)\
+            .all()
+    return {row.machine_id: row for row in rows}
+
+def latest_machine_data(machine_ids=None, lookback=timedelta(days=7)):
+    """
+    Newest MachineData row per machine: {machine_id: row}. Given the
+    machine_ids, only the last `lookback` is searched first (so only those
+    time partitions are read); machines with no reading in it get a second,
+    unbounded query.
+    """
+    from app.models.machine_data import MachineData
+
+    if machine_ids is None:
+        return _latest_machine_data()
+    latest = _latest_machine_data(MachineData.created_at >= datetime.utcnow() - lookback)
+    missing = [machine_id for machine_id in machine_ids if machine_id not in latest]
+    if missing:
+        latest.update(_latest_machine_data(MachineData.machine_id.in_(missing)))
+    return latest
+
+def _recent_machine_logs(limit, *filters):
+    ranked = db.session.query(
+        MachineLog.id,
+        func.row_number().over(
+            partition_by=MachineLog.machine_id,
+            order_by=MachineLog.created_at.desc()
+        ).label('rank')
+    ).filter(*filters).subquery()
+    rows = MachineLog.query.join(ranked, ranked.c.id == MachineLog.id)\
+        .filter(ranked.c.rank <= limit, *filters)\
+        .order_by(MachineLog.machine_id, MachineLog.created_at.desc())\
+        .all()
+
+    logs = {}
+    for row in rows:
+        logs.setdefault(row.machine_id, []).append(row)
+    return logs
+
+def recent_machine_logs(limit=10, machine_ids=None, lookback=timedelta(days=30)):
+    """
+    Newest `limit` MachineLog rows per machine: {machine_id: [rows]}. Like
+    latest_machine_data, the last `lookback` is read first and machines
+    with fewer than `limit` logs in it are completed without the bound.
+    """
+    if machine_ids is None:
+        return _recent_machine_logs(limit)
+    logs = _recent_machine_logs(limit, MachineLog.created_at >= jakarta_now() - lookback)
+    short = [machine_id for machine_id in machine_ids if len(logs.get(machine_id, [])) < limit]
+    if short:
+        logs.update(_recent_machine_logs(limit, MachineLog.machine_id.in_(short)))
+    return logs
+
+def pending_batch_counts(machine_id=None):
+    """Pending SortingBatch count per machine (via the order's machine_id)"""
+    query = db.session.query(Order.machine_id, func.count(SortingBatch.id))\
+        .join(Order, SortingBatch.order_id == Order.id)\
+        .filter(SortingBatch.status == 'pending', Order.machine_id.isnot(None))
+    if machine_id:
+        query = query.filter(Order.machine_id == machine_id)
+    return dict(query.group_by(Order.machine_id).all())
+
+def machine_overview(machine, latest_data, logs, pending):
+    """One GET /machines entry; also the payload of the 'created' machine event"""
+    # Default values if no data exists
+    processed_today = 0
+    efficiency = 0.0
+    error_rate = 0.0
+    temperature = machine.temperature # Fallback to machine table
+
+    if latest_data:
+        processed_today = latest_data.processed_today
+        efficiency = latest_data.efficiency
+        error_rate = latest_data.error_rate
+        temperature = latest_data.temperature
+
+    machine_data = machine.to_dict()
+
+    # Override status.temperature with data from machines_data
+    machine_data['status']['temperature'] = temperature
+
+    machine_data['statistics'] = {
+        'processedToday': int(processed_today or 0),
+        'currentBatch': pending, # Real pending count (machine_id from the order)
+        'efficiency': round(efficiency or 0.0, 1),
+        'errorRate': round(error_rate or 0.0, 1)
+    }
+    machine_data['logs'] = [log.to_dict() for log in logs]
+    return machine_data
+
+def latest_readings(rows):
+    """Newest parsed telemetry row per machine, shaped like the overview's statistics"""
+    newest = {}
+    for row in rows:
+        current = newest.get(row['machine_id'])
+        if current is None or row['created_at'] >= current['created_at']:
+            newest[row['machine_id']] = row
+    return [{
+        'machineId': row['machine_id'],
+        'temperature': row['temperature'],
+        'processedToday': int(row['processed_today'] or 0),
+        'efficiency': round(row['efficiency'] or 0.0, 1),
+        'errorRate': round(row['error_rate'] or 0.0, 1),
+        'timestamp': row['created_at']
+    } for row in newest.values()]
+
 @machine_routes_bp.route('/machines', methods=['GET'])
 @jwt_required()
 def get_machines():
     try:
+        # Four queries however many machines there are (plus one each for
+        # telemetry / logs of machines that have been quiet for a while)
         machines = Machine.query.order_by(Machine.id.asc()).all()
-        
-        results = []
-        for machine in machines:
-            # Get latest machine data
-            from app.models.machine_data import MachineData
-            
-            latest_data = MachineData.query.filter_by(machine_id=machine.id)\
-                .order_by(MachineData.created_at.desc())\
-                .first()
-            
-            # Default values if no data exists
-            processed_today = 0
-            remaining_batches = 0
-            efficiency = 0.0
-            error_rate = 0.0
-            temperature = machine.temperature # Fallback to machine table
-            
-            if latest_data:
-                processed_today = latest_data.processed_today
-                remaining_batches = latest_data.remaining_batch
-                efficiency = latest_data.efficiency
-                error_rate = latest_data.error_rate
-                temperature = latest_data.temperature
-                
-            # Get latest logs from machine_logs table
-            logs = MachineLog.query.filter_by(machine_id=machine.id)\
-                .order_by(MachineLog.created_at.desc())\
-                .limit(10).all()
-            
-            # Calculate real pending batches from SortingBatch
-            # Use machine_id from the order, not from the batch itself
-            real_pending_batches = SortingBatch.query.join(Order).filter(
-                Order.machine_id == machine.id,
-                SortingBatch.status == 'pending'
-            ).count()
-            
-            machine_data = machine.to_dict()
-            
-            # Override status.temperature with data from machines_data
-            machine_data['status']['temperature'] = temperature
-            
-            machine_data['statistics'] = {
-                'processedToday': int(processed_today),
-                'currentBatch': real_pending_batches, # Use real pending count
-                'efficiency': round(efficiency, 1),
-                'errorRate': round(error_rate, 1)
-            }
-            machine_data['logs'] = [log.to_dict() for log in logs]
-            
-            results.append(machine_data)
-            
+        machine_ids = [machine.id for machine in machines]
+        latest = latest_machine_data(machine_ids)
+        logs = recent_machine_logs(limit=10, machine_ids=machine_ids)
+        pending = pending_batch_counts()
+
+        results = [
+            machine_overview(machine, latest.get(machine.id), logs.get(machine.id, []), pending.get(machine.id, 0))
+            for machine in machines
+        ]
+
         return jsonify({
             'success': True,
             'data': results
@@ -74,6 +211,82 @@ def get_machines():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@machine_routes_bp.route('/machines/data/bulk', methods=['POST'])
+@jwt_required()
+def ingest_machine_data():
+    """
+    Bulk telemetry from many machines in one request:
+    {"readings": [{"machineId": "M-001", "temperature": 41.2, "processedToday": 120,
+                   "remainingBatch": 3, "efficiency": 94.1, "errorRate": 1.2,
+                   "timestamp": "2026-10-17T08:00:05Z"}, ...]}
+    Valid readings are written in one COPY / multi-row INSERT; invalid ones
+    are reported back by index.
+    """
+    try:
+        data = request.get_json(silent=True)
+        readings = data.get('readings') if isinstance(data, dict) else data
+        if not isinstance(readings, list) or not readings:
+            return jsonify({'success': False, 'message': 'readings must be a non-empty array'}), 400
+
+        max_readings = current_app.config.get('TELEMETRY_MAX_READINGS', 5000)
+        if len(readings) > max_readings:
+            return jsonify({'success': False, 'message': f'At most {max_readings} readings per request'}), 413
+
+        from app.models.machine_data import MachineData
+        machine_ids = {r.get('machineId') for r in readings if isinstance(r, dict) and isinstance(r.get('machineId'), str)}
+        known = {row.id for row in db.session.query(Machine.id).filter(Machine.id.in_(machine_ids))}
+
+        rows, errors = parse_readings(readings, known)
+        inserted = insert_readings(db.session, MachineData.__table__, rows)
+        db.session.commit()
+
+        if inserted:
+            # One event per request, only the newest reading of each machine
+            publish_event(EVENT_TELEMETRY, {'readings': latest_readings(rows)})
+
+        return jsonify({
+            'success': bool(inserted),
+            'data': {'inserted': inserted, 'rejected': errors}
+        }), 201 if inserted else 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@machine_routes_bp.route('/machines/<machine_id>/data/chart', methods=['GET'])
+@jwt_required()
+def get_machine_data_chart(machine_id):
+    """
+    One telemetry metric (temperature, processedToday, remainingBatch,
+    efficiency, errorRate) downsampled to about `points` points between
+    `from` and `to` (default: the last 24 hours); method=bucket|lttb.
+    """
+    try:
+        metric = request.args.get('metric', 'temperature')
+        if metric not in READING_FIELDS:
+            return jsonify({
+                'success': False,
+                'message': f"metric must be one of {', '.join(READING_FIELDS)}"
+            }), 400
+        try:
+            start, end, points, method = parse_chart_args(request.args, timedelta(hours=24))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        from app.models.machine_data import MachineData
+        data = downsampled_series(
+            db.session,
+            MachineData.created_at,
+            getattr(MachineData, READING_FIELDS[metric][0]),
+            start, end, points, method,
+            filters=(MachineData.machine_id == machine_id,)
+        )
+        data['metric'] = metric
+        return jsonify({'success': True, 'data': data}), 200
+
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @machine_routes_bp.route('/machines', methods=['POST'])
 @jwt_required()
 def create_machine():
@@ -105,6 +318,12 @@ def create_machine():
         
         db.session.add(new_machine)
         db.session.commit()
+
+        publish_event(EVENT_MACHINE, {
+            'action': 'created',
+            'machineId': new_machine.id,
+            'machine': machine_overview(new_machine, None, [], 0)
+        })
         
         return jsonify({
             'success': True,
@@ -132,16 +351,12 @@ def toggle_machine(machine_id):
             log_msg = f"{machine.name} {'aktif' if machine.status_power else 'mati'}"
             log_type = 'success' if machine.status_power else 'info'
             
-            # Create log in machine_logs table with custom ID
-            new_log = MachineLog(
-                id=MachineLog.generate_id(),
-                machine_id=machine.id,
-                message=log_msg,
-                type=log_type
-            )
-            db.session.add(new_log)
-            
         db.session.commit()
+
+        if target == 'power':
+            publish_event(EVENT_MACHINE, {'action': 'toggled', 'machineId': machine.id, 'power': machine.status_power})
+            # Log in machine_logs, written in the background
+            write_machine_log(machine.id, log_msg, log_type)
         
         return jsonify({
             'success': True,
@@ -152,6 +367,78 @@ def toggle_machine(machine_id):
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@machine_routes_bp.route('/machines/<machine_id>/quality', methods=['PUT'])
+@jwt_required()
+def update_machine_quality(machine_id):
+    """Set this machine's quality gate thresholds; null/omitted keys use the global default"""
+    from app.routes.machine import invalidate_machine_settings, quality_thresholds
+    from app.utils.frame_quality import DEFAULT_THRESHOLDS
+    try:
+        machine = Machine.query.get(machine_id)
+        if not machine:
+            return jsonify({'success': False, 'message': 'Machine not found'}), 404
+
+        data = request.get_json() or {}
+        unknown = [key for key in data if key not in DEFAULT_THRESHOLDS]
+        if unknown:
+            return jsonify({'success': False, 'message': f"Unknown thresholds: {', '.join(unknown)}"}), 400
+
+        thresholds = {key: float(value) for key, value in data.items() if value is not None}
+        machine.quality_thresholds = thresholds or None
+        db.session.commit()
+        invalidate_machine_settings(machine_id)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'machineId': machine_id,
+                'overrides': thresholds,
+                'effective': quality_thresholds(machine_id)
+            }
+        })
+
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Thresholds must be numbers'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@machine_routes_bp.route('/machines/<machine_id>/roi', methods=['PUT'])
+@jwt_required()
+def update_machine_roi(machine_id):
+    """
+    Set the camera region analysed for this machine, normalised 0..1:
+    {"type": "rect", "x", "y", "width", "height"} or
+    {"type": "polygon", "points": [[x, y], ...]}; null clears it.
+    """
+    from app.routes.machine import invalidate_machine_settings
+    from app.utils.frame_roi import RegionOfInterest
+    try:
+        machine = Machine.query.get(machine_id)
+        if not machine:
+            return jsonify({'success': False, 'message': 'Machine not found'}), 404
+
+        data = request.get_json(silent=True)
+        if data:
+            try:
+                machine.roi = RegionOfInterest.from_dict(data).to_dict()
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+        else:
+            machine.roi = None
+        db.session.commit()
+        invalidate_machine_settings(machine_id)
+
+        return jsonify({
+            'success': True,
+            'data': machine.to_dict()
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @machine_routes_bp.route('/machines/<machine_id>/logs', methods=['POST'])
 @jwt_required()
 def create_machine_log(machine_id):
@@ -168,15 +455,7 @@ def create_machine_log(machine_id):
         if not message:
             return jsonify({'success': False, 'message': 'Message is required'}), 400
         
-        # Create log in machine_logs table with custom ID
-        new_log = MachineLog(
-            id=MachineLog.generate_id(),
-            machine_id=machine.id,
-            message=message,
-            type=log_type
-        )
-        db.session.add(new_log)
-        db.session.commit()
+        new_log = write_machine_log(machine.id, message, log_type)
         
         return jsonify({
             'success': True,
@@ -187,3 +466,12 @@ def create_machine_log(machine_id):
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
+
+@machine_routes_bp.route('/machines/logs/writer', methods=['GET'])
+@jwt_required()
+def machine_log_writer_stats():
+    """Buffered / written / dropped counts of the background MachineLog writer"""
+    return jsonify({
+        'success': True,
+        'data': dict(get_log_writer().stats(), enabled=current_app.config.get('MACHINE_LOG_ASYNC', True))
+    }), 200
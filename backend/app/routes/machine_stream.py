@@ -0,0 +1,151 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, decode_token
+import json
+import queue
+import uuid
+from app.routes.machine import ensure_inference_ready, analyze_frame_bytes
+from app.utils.frame_stream import FrameStreamSession, StreamSessionRegistry
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+machine_stream_bp = Blueprint('machine_stream', __name__)
+sock = Sock() if Sock else None
+
+# HTTP fallback sessions live in this process only
+http_sessions = StreamSessionRegistry(idle_timeout=60)
+
+def _make_analyzer(app, stream_key, machine_id=None):
+    """Frame bytes -> analysis dict, runnable from a session worker thread"""
+    def analyze(frame_bytes):
+        with app.app_context():
+            if not ensure_inference_ready():
+                raise RuntimeError('Model AI belum siap. Coba lagi sebentar.')
+            return analyze_frame_bytes(frame_bytes, stream_key=stream_key, machine_id=machine_id)
+    return analyze
+
+def _stream_key(machine_id):
+    return f'machine:{machine_id}' if machine_id else f'stream:{uuid.uuid4().hex}'
+
+# ========================================
+# WebSocket: /api/machine/stream
+# ========================================
+# Protocol:
+#   client -> {"token": "<jwt>", "machineId": "M-001"}   (first text message,
+#             or pass ?token=...&machineId=... in the URL)
+#   server -> {"type": "ready", "sessionId": ...}
+#   client -> binary JPEG frames, as fast as it likes
+#   server -> {"type": "result", "seq": n, "data": {...}, "latencyMs": .., "dropped": ..}
+if sock:
+    @sock.route('/machine/stream', bp=machine_stream_bp)
+    def stream_frames(ws):
+        token = request.args.get('token')
+        machine_id = request.args.get('machineId')
+        if not token:
+            try:
+                hello = json.loads(ws.receive(timeout=10) or '{}')
+            except (TypeError, ValueError):
+                hello = {}
+            token = hello.get('token')
+            machine_id = hello.get('machineId', machine_id)
+
+        try:
+            claims = decode_token(token)
+        except Exception:
+            claims = None
+        if not claims or claims.get('type') != 'access':
+            ws.send(json.dumps({'type': 'error', 'message': 'Invalid or missing token'}))
+            return
+
+        session = FrameStreamSession(
+            _make_analyzer(current_app._get_current_object(), _stream_key(machine_id), machine_id),
+            lambda message: ws.send(json.dumps(message)),
+            machine_id=machine_id,
+            user_id=claims.get(current_app.config.get('JWT_IDENTITY_CLAIM', 'sub'))
+        ).start()
+        ws.send(json.dumps({'type': 'ready', 'sessionId': session.id}))
+        print(f"📡 Frame stream opened: machine={machine_id} session={session.id[:8]}")
+
+        try:
+            while True:
+                data = ws.receive()
+                if data is None:
+                    break
+                if isinstance(data, bytes):
+                    session.offer(data)
+                elif data == 'close':
+                    break
+        finally:
+            session.close()
+            print(f"📡 Frame stream closed: {session.stats()}")
+
+# ========================================
+# Chunked HTTP fallback
+# ========================================
+@machine_stream_bp.route('/machine/stream/sessions', methods=['POST'])
+@jwt_required()
+def create_stream_session():
+    """Authenticate once; the returned sessionId is the credential for frames"""
+    data = request.get_json(silent=True) or {}
+    machine_id = data.get('machineId')
+    session = http_sessions.create(
+        _make_analyzer(current_app._get_current_object(), _stream_key(machine_id), machine_id),
+        machine_id=machine_id,
+        user_id=get_jwt_identity()
+    )
+    return jsonify({
+        'success': True,
+        'data': {
+            'sessionId': session.id,
+            'framesUrl': f'/api/machine/stream/sessions/{session.id}/frames',
+            'resultsUrl': f'/api/machine/stream/sessions/{session.id}/results',
+            'websocket': sock is not None
+        }
+    }), 201
+
+@machine_stream_bp.route('/machine/stream/sessions/<session_id>/frames', methods=['POST'])
+def push_stream_frame(session_id):
+    """Raw JPEG body (no multipart, no JWT decode)"""
+    session = http_sessions.get(session_id)
+    if not session or session.closed:
+        return jsonify({'success': False, 'message': 'Stream session not found'}), 404
+
+    frame_bytes = request.get_data(cache=False)
+    if not frame_bytes:
+        return jsonify({'success': False, 'message': 'Empty frame'}), 400
+
+    seq = session.offer(frame_bytes)
+    return jsonify({'success': True, 'seq': seq, 'dropped': session.dropped}), 202
+
+@machine_stream_bp.route('/machine/stream/sessions/<session_id>/results', methods=['GET'])
+def stream_session_results(session_id):
+    """Long-lived NDJSON stream, one line per processed frame"""
+    session = http_sessions.get(session_id)
+    results = http_sessions.results(session_id)
+    if not session or results is None:
+        return jsonify({'success': False, 'message': 'Stream session not found'}), 404
+
+    def generate():
+        # First line flushes headers so the client knows the stream is live
+        yield json.dumps({'type': 'ready', 'sessionId': session.id}) + '\n'
+        while not session.closed:
+            try:
+                message = results.get(timeout=15)
+            except queue.Empty:
+                message = {'type': 'heartbeat'}
+            yield json.dumps(message) + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@machine_stream_bp.route('/machine/stream/sessions/<session_id>', methods=['DELETE'])
+def close_stream_session(session_id):
+    session = http_sessions.remove(session_id)
+    if not session:
+        return jsonify({'success': False, 'message': 'Stream session not found'}), 404
+    return jsonify({'success': True, 'data': session.stats()}), 200
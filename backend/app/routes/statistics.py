@@ -8,6 +8,7 @@ import random
 import uuid
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import OperationalError, DisconnectionError
+from app.utils.downsample import downsampled_series, parse_chart_args
 import time
 
 statistics_bp = Blueprint('statistics', __name__)
@@ -213,6 +214,10 @@ def get_performance_data():
         if since:
             try:
                 since_date = datetime.fromisoformat(since.replace('Z', '+00:00'))
+                if since_date.tzinfo is not None:
+                    # created_at is naive UTC; an aware value would cast the column
+                    # instead, which also stops partition pruning
+                    since_date = (since_date - since_date.utcoffset()).replace(tzinfo=None)
                 query = query.filter(SortingResultHistory.created_at >= since_date)
             except ValueError:
                 pass  # Ignore invalid date
@@ -231,6 +236,43 @@ def get_performance_data():
         print(f"Error fetching performance data: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@statistics_bp.route('/admin/performance/chart', methods=['GET'])
+@jwt_required()
+def get_performance_chart():
+    """
+    Accuracy history downsampled to about `points` points between `from` and
+    `to` (default: the last 30 days), optionally for one `orderId`.
+    method=bucket (default) gives min/avg/max per time bucket from SQL,
+    method=lttb keeps real samples.
+    """
+    try:
+        user_id = get_jwt_identity()
+        user = execute_with_retry(lambda: User.query.get(user_id))
+        if not user or user.role != 'admin':
+            return jsonify({
+                'success': False,
+                'message': 'Access denied. Admin only.'
+            }), 403
+
+        try:
+            start, end, points, method = parse_chart_args(request.args, timedelta(days=30))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        from app.models.sorting_result_history import SortingResultHistory
+        order_id = request.args.get('orderId')
+        data = downsampled_series(
+            db.session,
+            SortingResultHistory.created_at,
+            SortingResultHistory.accuracy,
+            start, end, points, method,
+            filters=(SortingResultHistory.order_id == order_id,) if order_id else ()
+        )
+        return jsonify({'success': True, 'data': data}), 200
+    except Exception as e:
+        print(f"Error fetching performance chart: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @statistics_bp.route('/admin/performance/generate', methods=['POST'])
 @jwt_required()
 def generate_performance_data():
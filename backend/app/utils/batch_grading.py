@@ -0,0 +1,140 @@
+"""
+Background grading of a batch's tray image.
+
+`BatchGrader` runs grading off the request thread (one job per batch at a
+time; a batch re-submitted while it is being graded is graded once more
+afterwards, with whatever image it has by then). The helpers below fetch the
+stored image and cut the sample bean crops that end up in `sample_*_url`.
+"""
+import base64
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+from PIL import Image
+
+# Images larger than this are not graded (bytes)
+MAX_IMAGE_BYTES = 25 * 1024 * 1024
+
+# Crops written by the grader live here (under uploads/) and may be replaced
+SAMPLE_DIR = 'batches'
+
+STATE_QUEUED = 'queued'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+
+def load_image_bytes(url, uploads_dir, allowed_hosts=(), timeout=15):
+    """
+    Bytes of a batch image URL: a data: URL, a path served from /uploads/,
+    or an http(s) URL whose host is in `allowed_hosts` (none by default, so
+    the server never fetches arbitrary addresses for a client). Raises
+    ValueError for anything else or oversized files.
+    """
+    if url.startswith('data:'):
+        header, _, payload = url.partition(',')
+        if ';base64' not in header:
+            raise ValueError('Only base64 data URLs are supported')
+        data = base64.b64decode(payload)
+    elif url.startswith('/uploads/'):
+        path = os.path.normpath(os.path.join(uploads_dir, url[len('/uploads/'):]))
+        if not path.startswith(os.path.normpath(uploads_dir) + os.sep):
+            raise ValueError('Invalid upload path')
+        with open(path, 'rb') as f:
+            data = f.read(MAX_IMAGE_BYTES + 1)
+    elif url.startswith(('http://', 'https://')):
+        host = (urlsplit(url).hostname or '').lower()
+        if host not in allowed_hosts:
+            raise ValueError(f'Image host not allowed: {host or url[:50]}')
+        import requests
+        # No redirects: they could lead off the allowed hosts
+        with requests.get(url, timeout=timeout, stream=True, allow_redirects=False) as response:
+            response.raise_for_status()
+            if response.is_redirect:
+                raise ValueError(f'Image URL redirects elsewhere: {url[:50]}')
+            data = response.raw.read(MAX_IMAGE_BYTES + 1, decode_content=True)
+    else:
+        raise ValueError(f'Unsupported image URL: {url[:50]}')
+
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError('Image too large to grade')
+    return data
+
+
+def pick_samples(dets, is_defect, min_confidence=0.0, per_status=2):
+    """Indices of the most confident healthy and defective detections"""
+    order = np.argsort(-dets.conf)
+    order = order[dets.conf[order] >= min_confidence]
+    defect = is_defect[dets.cls[order]]
+    return order[~defect][:per_status].tolist(), order[defect][:per_status].tolist()
+
+
+def crop_sample(pixels, box, size=256, padding=0.15):
+    """JPEG bytes of one bean: its box plus some margin, fitted into size x size"""
+    height, width = pixels.shape[:2]
+    x0, y0, x1, y1 = box
+    pad_x, pad_y = (x1 - x0) * padding, (y1 - y0) * padding
+    x0, y0 = max(int(x0 - pad_x), 0), max(int(y0 - pad_y), 0)
+    x1, y1 = min(int(np.ceil(x1 + pad_x)), width), min(int(np.ceil(y1 + pad_y)), height)
+
+    image = Image.fromarray(pixels[y0:max(y1, y0 + 1), x0:max(x1, x0 + 1)])
+    image.thumbnail((size, size))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class BatchGrader:
+    """
+    Args:
+        app (Flask): Application; each grading runs in its app context
+        grade (callable): batch_id -> summary dict; does the actual work
+        workers (int): Batches graded concurrently
+    """
+
+    def __init__(self, app, grade, workers=1):
+        self.app = app
+        self.grade = grade
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-grader')
+        self._lock = threading.Lock()
+        self._status = {}
+        self._rerun = set()
+
+    def submit(self, batch_id):
+        with self._lock:
+            state = self._status.get(batch_id, {}).get('state')
+            if state == STATE_QUEUED:
+                return
+            if state == STATE_RUNNING:
+                self._rerun.add(batch_id)
+                return
+            self._status[batch_id] = {'state': STATE_QUEUED}
+        self._executor.submit(self._run, batch_id)
+
+    def _run(self, batch_id):
+        with self._lock:
+            self._status[batch_id] = {'state': STATE_RUNNING}
+        try:
+            with self.app.app_context():
+                summary = self.grade(batch_id)
+            status = {'state': STATE_DONE, 'result': summary}
+            print(f"✅ Batch {batch_id} graded: {summary}")
+        except Exception as e:
+            status = {'state': STATE_FAILED, 'error': str(e)}
+            print(f"❌ Grading batch {batch_id} failed: {e}")
+
+        with self._lock:
+            self._status[batch_id] = status
+            rerun = batch_id in self._rerun
+            self._rerun.discard(batch_id)
+        if rerun:
+            self.submit(batch_id)
+
+    def status(self, batch_id):
+        with self._lock:
+            status = self._status.get(batch_id)
+            return dict(status) if status else None
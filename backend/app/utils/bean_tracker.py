@@ -0,0 +1,237 @@
+"""
+Cross-frame bean counting for the live camera stream.
+
+A bean on the conveyor shows up in several consecutive frames. `BeanTracker`
+links detections frame to frame (IoU against each track's predicted box) so
+every bean is counted once, keeping running totals as it goes: a frame costs
+one IoU matrix against the live tracks, never a re-scan of earlier frames.
+
+    new detection          -> tentative track
+    seen `min_hits` times  -> confirmed, counted in total_beans
+    missed `max_missed`    -> retired; healthy/defective decided by majority
+                              vote over every frame it was seen in
+"""
+import threading
+import time
+
+import numpy as np
+
+from app.utils.detections import box_iou, get_status_table
+
+
+class BeanTracker:
+    """
+    Args:
+        iou_threshold (float): Min IoU between a track's predicted box and a
+            detection to treat them as the same bean
+        max_missed (int): Frames a track may go unseen before it is retired
+        min_hits (int): Frames a detection must persist to be counted (filters
+            one-frame false positives)
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=3, min_hits=2):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+
+        # Live tracks, one row each
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+        self._velocity = np.zeros((0, 4), dtype=np.float32)
+        self._hits = np.zeros(0, dtype=np.int32)
+        self._missed = np.zeros(0, dtype=np.int32)
+        self._defect_votes = np.zeros(0, dtype=np.int32)
+        self._conf_sum = np.zeros(0, dtype=np.float64)
+
+        self.frames = 0
+        self.total_beans = 0
+        self.healthy_beans = 0
+        self.defective_beans = 0
+        self._retired_conf_sum = 0.0
+        self._retired_hits = 0
+
+    def _match(self, predicted, boxes):
+        """Greedy highest-IoU-first assignment; returns (track_idx, det_idx) arrays"""
+        if len(predicted) == 0 or len(boxes) == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+        ious = np.stack([box_iou(box, boxes) for box in predicted])
+        tracks, dets = [], []
+        for flat in np.argsort(-ious, axis=None):
+            t, d = divmod(int(flat), len(boxes))
+            if ious[t, d] < self.iou_threshold:
+                break
+            if t in tracks or d in dets:
+                continue
+            tracks.append(t)
+            dets.append(d)
+        return np.array(tracks, dtype=np.intp), np.array(dets, dtype=np.intp)
+
+    def _retire(self, mask):
+        counted = mask & (self._hits >= self.min_hits)
+        if counted.any():
+            defect = self._defect_votes[counted] * 2 > self._hits[counted]
+            self.defective_beans += int(defect.sum())
+            self.healthy_beans += int((~defect).sum())
+            self._retired_conf_sum += float(self._conf_sum[counted].sum())
+            self._retired_hits += int(self._hits[counted].sum())
+
+        keep = ~mask
+        self._boxes = self._boxes[keep]
+        self._velocity = self._velocity[keep]
+        self._hits = self._hits[keep]
+        self._missed = self._missed[keep]
+        self._defect_votes = self._defect_votes[keep]
+        self._conf_sum = self._conf_sum[keep]
+
+    def update(self, boxes, is_defect, conf):
+        """
+        Feed one frame of detections.
+
+        Args:
+            boxes (np.ndarray): (N, 4) xyxy in full-frame pixels
+            is_defect (np.ndarray): (N,) bool
+            conf (np.ndarray): (N,) confidences 0..1
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        is_defect = np.asarray(is_defect, dtype=bool)
+        conf = np.asarray(conf, dtype=np.float64)
+        self.frames += 1
+
+        predicted = self._boxes + self._velocity
+        tracks, dets = self._match(predicted, boxes)
+
+        # Matched tracks: move, vote, maybe become confirmed
+        was_confirmed = self._hits[tracks] >= self.min_hits
+        self._velocity[tracks] = boxes[dets] - self._boxes[tracks]
+        self._boxes[tracks] = boxes[dets]
+        self._hits[tracks] += 1
+        self._missed[tracks] = 0
+        self._defect_votes[tracks] += is_defect[dets]
+        self._conf_sum[tracks] += conf[dets]
+        self.total_beans += int(((self._hits[tracks] >= self.min_hits) & ~was_confirmed).sum())
+
+        # Unmatched tracks age out
+        unmatched = np.ones(len(self._boxes), dtype=bool)
+        unmatched[tracks] = False
+        self._missed[unmatched] += 1
+        self._retire(self._missed > self.max_missed)
+
+        # Unmatched detections start new tracks
+        new = np.ones(len(boxes), dtype=bool)
+        new[dets] = False
+        count = int(new.sum())
+        if count:
+            self._boxes = np.concatenate([self._boxes, boxes[new]])
+            self._velocity = np.concatenate([self._velocity, np.zeros((count, 4), dtype=np.float32)])
+            self._hits = np.concatenate([self._hits, np.ones(count, dtype=np.int32)])
+            self._missed = np.concatenate([self._missed, np.zeros(count, dtype=np.int32)])
+            self._defect_votes = np.concatenate([self._defect_votes, is_defect[new].astype(np.int32)])
+            self._conf_sum = np.concatenate([self._conf_sum, conf[new]])
+            if self.min_hits <= 1:
+                self.total_beans += count
+
+    def flush(self):
+        """Retire every live track (end of batch) so all beans get a verdict"""
+        self._retire(np.ones(len(self._boxes), dtype=bool))
+
+    def totals(self):
+        """Running totals; beans still in view are classified by their votes so far"""
+        live = self._hits >= self.min_hits
+        live_defect = int((self._defect_votes[live] * 2 > self._hits[live]).sum())
+        live_healthy = int(live.sum()) - live_defect
+
+        hits = self._retired_hits + int(self._hits[live].sum())
+        conf_sum = self._retired_conf_sum + float(self._conf_sum[live].sum())
+        return {
+            'frames': self.frames,
+            'totalBeans': self.total_beans,
+            'healthyBeans': self.healthy_beans + live_healthy,
+            'defectiveBeans': self.defective_beans + live_defect,
+            'accuracy': round(conf_sum / hits * 100, 2) if hits else 0,
+            'activeTracks': len(self._boxes)
+        }
+
+
+class CountingSession:
+    """A tracker bound to one machine and the batch its counts belong to"""
+
+    def __init__(self, machine_id, batch_id, **tracker_options):
+        self.machine_id = machine_id
+        self.batch_id = batch_id
+        self.started_at = time.time()
+        self.tracker = BeanTracker(**tracker_options)
+        self._lock = threading.Lock()
+
+    def update(self, dets, min_confidence=0.0):
+        """Feed a FrameDetections (full-frame coordinates)"""
+        table = get_status_table(dets.names)
+        keep = dets.conf >= min_confidence
+        cls = dets.cls[keep]
+        with self._lock:
+            self.tracker.update(dets.xyxy[keep], table.is_defect[cls], dets.conf[keep])
+
+    def totals(self):
+        with self._lock:
+            return self.tracker.totals()
+
+    def finish(self):
+        """Close out live tracks and return the final totals"""
+        with self._lock:
+            self.tracker.flush()
+            return self.tracker.totals()
+
+    def apply_to(self, batch):
+        """Write final totals onto a SortingBatch (caller commits)"""
+        totals = self.finish()
+        batch.total_beans = totals['totalBeans']
+        batch.healthy_beans = totals['healthyBeans']
+        batch.defective_beans = totals['defectiveBeans']
+        batch.accuracy = totals['accuracy']
+        return totals
+
+    def to_dict(self):
+        return {
+            'machineId': self.machine_id,
+            'batchId': self.batch_id,
+            'startedAt': self.started_at,
+            **self.totals()
+        }
+
+
+class CountingRegistry:
+    """Active counting sessions of this process, one per machine"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def start(self, machine_id, batch_id, **tracker_options):
+        session = CountingSession(machine_id, batch_id, **tracker_options)
+        with self._lock:
+            self._sessions[machine_id] = session
+        return session
+
+    def get(self, machine_id):
+        if machine_id is None:
+            return None
+        return self._sessions.get(machine_id)
+
+    def stop(self, machine_id):
+        with self._lock:
+            return self._sessions.pop(machine_id, None)
+
+    def for_batch(self, batch_id):
+        """The session counting `batch_id`, if any (left running)"""
+        with self._lock:
+            for session in self._sessions.values():
+                if session.batch_id == batch_id:
+                    return session
+        return None
+
+    def pop_for_batch(self, batch_id):
+        """Remove and return the session counting `batch_id`, if any"""
+        with self._lock:
+            for machine_id, session in list(self._sessions.items()):
+                if session.batch_id == batch_id:
+                    return self._sessions.pop(machine_id)
+        return None
@@ -0,0 +1,170 @@
+"""
+Load generator for the analyze path.
+
+`run_load(call, frames, concurrency, ...)` replays encoded frames through
+`call(frame_bytes)` from N threads and measures per-frame latency and
+throughput. The caller picks what `call` is: the in-process path
+(decode -> batching engine -> post-process, see benchmark_inference.py) or
+an HTTP POST to /api/machine/analyze.
+"""
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from app.utils.inference import InferenceOverloaded
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class ShedError(Exception):
+    """The server refused the frame (HTTP 429/503)"""
+
+
+class RejectedFrame(Exception):
+    """The quality gate answered without running the model"""
+
+
+def load_frames(path):
+    """Encoded bytes of every image in a file or directory"""
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    frames = []
+    for name in files:
+        with open(name, 'rb') as f:
+            frames.append(f.read())
+    return frames
+
+
+def latency_summary(seconds):
+    if not len(seconds):
+        return None
+    ms = np.asarray(seconds) * 1000
+    return {
+        'mean': round(float(ms.mean()), 2),
+        'p50': round(float(np.percentile(ms, 50)), 2),
+        'p95': round(float(np.percentile(ms, 95)), 2),
+        'p99': round(float(np.percentile(ms, 99)), 2),
+        'max': round(float(ms.max()), 2)
+    }
+
+
+def peak_rss_mb(pid=None):
+    """Peak resident memory of this process, or of `pid` (Linux /proc)"""
+    if pid is None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_load(call, frames, concurrency, total=None, warmup=4):
+    """
+    Send `total` frames (default: every frame once per thread) through
+    `call` from `concurrency` threads, round-robin over `frames`.
+
+    Returns fps, latency percentiles (successful frames only), errors,
+    frames shed by admission control and frames the quality gate rejected
+    (their fast answers would otherwise pass for inference latency).
+    """
+    for frame in frames[:warmup]:
+        try:
+            call(frame)
+        except Exception:
+            pass
+
+    total = total or len(frames) * concurrency
+    counter = iter(range(total))
+    lock = threading.Lock()
+    latencies, errors, shed, rejected = [], [0], [0], [0]
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            try:
+                call(frames[i % len(frames)])
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+            except (ShedError, InferenceOverloaded):
+                with lock:
+                    shed[0] += 1
+            except RejectedFrame:
+                with lock:
+                    rejected[0] += 1
+            except Exception:
+                with lock:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'frames': total,
+        'ok': len(latencies),
+        'errors': errors[0],
+        'shed': shed[0],
+        'rejected': rejected[0],
+        'seconds': round(elapsed, 3),
+        'fps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+        'latencyMs': latency_summary(latencies)
+    }
+
+
+def run_meta():
+    """Where/what was measured, so result files can be compared later"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'gitCommit': commit,
+        'host': platform.node(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version()
+    }
+
+
+def compare_reports(previous, current):
+    """Per-concurrency fps / p95 change (%) between two result files"""
+    before = {r['concurrency']: r for r in previous.get('results', [])}
+    rows = []
+    for r in current.get('results', []):
+        old = before.get(r['concurrency'])
+        if not old or not old.get('latencyMs') or not r.get('latencyMs'):
+            continue
+        rows.append({
+            'concurrency': r['concurrency'],
+            'fps': (old['fps'], r['fps'],
+                    round((r['fps'] / old['fps'] - 1) * 100, 1) if old['fps'] else None),
+            'p95Ms': (old['latencyMs']['p95'], r['latencyMs']['p95'],
+                      round((r['latencyMs']['p95'] / old['latencyMs']['p95'] - 1) * 100, 1)
+                      if old['latencyMs']['p95'] else None)
+        })
+    return rows
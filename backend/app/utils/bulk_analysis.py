@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+ZIP_MIMETYPES = ('application/zip', 'application/x-zip-compressed')
+
+
+def spool_uploads(files, max_memory=8 * 1024 * 1024):
+    """
+    Copy request uploads into temp files owned by the caller.
+
+    The WSGI server may close the request's file streams once the view
+    returns, before a streamed response has finished reading them.
+    Returns a list of (filename, mimetype, file object).
+    """
+    spooled = []
+    for upload in files:
+        copy = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        shutil.copyfileobj(upload.stream, copy)
+        copy.seek(0)
+        spooled.append((upload.filename or 'image', upload.mimetype, copy))
+    return spooled
+
+
+def iter_uploaded_images(uploads):
+    """
+    Yield (name, bytes) for spooled uploads; .zip archives are expanded
+    lazily. Each upload file is closed once consumed.
+    """
+    for name, mimetype, stream in uploads:
+        with stream:
+            if name.lower().endswith('.zip') or mimetype in ZIP_MIMETYPES:
+                with zipfile.ZipFile(stream) as archive:
+                    for info in archive.infolist():
+                        member = info.filename
+                        if (info.is_dir() or member.startswith('__MACOSX/')
+                                or not member.lower().endswith(IMAGE_EXTENSIONS)):
+                            continue
+                        yield member, archive.read(info)
+            else:
+                yield name, stream.read()
+
+
+class BulkTotals:
+    """Running healthy/defective totals over many analysed images"""
+
+    def __init__(self):
+        self.images = 0
+        self.failed = 0
+        self.total_beans = 0
+        self.healthy_beans = 0
+        self.defective_beans = 0
+        self._confidence_sum = 0.0
+
+    def add(self, data):
+        self.images += 1
+        counts = data.get('counts') or {}
+        self.healthy_beans += counts.get('healthy', 0)
+        self.defective_beans += counts.get('defect', 0)
+        self.total_beans += len(data['detections'])
+        self._confidence_sum += sum(d['confidence'] for d in data['detections'])
+
+    @property
+    def accuracy(self):
+        """Mean detection confidence (%) across all beans"""
+        return round(self._confidence_sum / self.total_beans, 2) if self.total_beans else 0
+
+    def to_dict(self):
+        return {
+            'images': self.images,
+            'failed': self.failed,
+            'totalBeans': self.total_beans,
+            'healthyBeans': self.healthy_beans,
+            'defectiveBeans': self.defective_beans,
+            'accuracy': self.accuracy
+        }
+
+
+def analyze_many(items, decode, submit, summarize, window=32, decode_workers=None, timeout=None):
+    """
+    Pipeline many images through decode -> model -> summary.
+
+    Decoding runs on a thread pool (JPEG decoders release the GIL) and each
+    decoded frame goes straight to `submit`, normally the shared batching
+    engine, which groups them into model batches. At most `window` images are
+    in flight, so memory stays bounded however many are uploaded.
+
+    Yields (index, name, data, error) in input order as results complete.
+
+    Args:
+        items: iterable of (name, bytes)
+        decode (callable): bytes -> DecodedFrame
+        submit (callable): pixels -> Future[FrameDetections]
+        summarize (callable): FrameDetections -> result dict
+    """
+    def decode_and_submit(img_bytes):
+        frame = decode(img_bytes)
+        return frame, submit(frame.pixels)
+
+    pending = deque()
+    workers = decode_workers or os.cpu_count() or 2
+
+    def finish(entry):
+        index, name, job = entry
+        try:
+            frame, future = job.result()
+            result = frame.to_original(future.result(timeout=timeout))
+            return index, name, summarize(result), None
+        except Exception as e:
+            return index, name, None, e
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-decode') as pool:
+        for index, (name, img_bytes) in enumerate(items):
+            pending.append((index, name, pool.submit(decode_and_submit, img_bytes)))
+            if len(pending) >= window:
+                yield finish(pending.popleft())
+        while pending:
+            yield finish(pending.popleft())
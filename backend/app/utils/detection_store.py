@@ -0,0 +1,372 @@
+"""
+Append-only columnar store for per-frame detections.
+
+Layout on disk (one directory per machine, one per time window):
+
+    <root>/<machine_id>/<window_start_epoch>/<seq>.npz
+
+Every chunk holds fixed-width column arrays:
+
+    frame_ts  float64 (F,)    capture time of each analysed frame
+    frame_n   uint16  (F,)    detections in that frame
+    cls       uint16  (D,)    class id per detection, frames in order
+    conf      float16 (D,)    confidence 0..1
+    xyxy      float32 (D, 4)  box in original-image pixels
+
+Detections are appended from the request path into an in-memory buffer and
+written by a background thread, so analysing a frame never waits for disk.
+Closed windows are compacted into a single chunk; an exclusive lock file per
+machine (flock, where the platform has it) keeps two processes from
+compacting the same windows. Queries read only the windows overlapping the
+range and aggregate with NumPy (bincount/histogram); there is no
+row-per-detection object anywhere.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is only serialised within the process
+    fcntl = None
+
+NAMES_FILE = 'names.json'
+COMPACT_NAME = 'compact.npz'
+LOCK_NAME = '.compact.lock'
+
+
+def _safe_key(machine_id):
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(machine_id))
+
+
+class _Buffer:
+    __slots__ = ('frame_ts', 'frame_n', 'cls', 'conf', 'xyxy', 'detections')
+
+    def __init__(self):
+        self.frame_ts = []
+        self.frame_n = []
+        self.cls = []
+        self.conf = []
+        self.xyxy = []
+        self.detections = 0
+
+
+class DetectionStore:
+    """
+    Args:
+        root (str): Directory holding the store
+        window_seconds (int): Time window per directory (and per compacted chunk)
+        flush_interval (float): Seconds between background writes
+        max_buffered (int): Detections buffered before an early flush
+    """
+
+    def __init__(self, root, window_seconds=3600, flush_interval=5.0, max_buffered=50000):
+        self.root = root
+        self.window_seconds = int(window_seconds)
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+
+        self._buffers = {}
+        self._known_machines = set()
+        self._pending_names = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._seq = 0
+
+        self.frames_written = 0
+        self.detections_written = 0
+        self.write_errors = 0
+
+    # ---------- writing ----------
+
+    def _ensure_writer(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            if self._thread is None:
+                atexit.register(self.flush)  # once, however often the thread is restarted
+            self._thread = threading.Thread(target=self._run, name='detection-store', daemon=True)
+            self._thread.start()
+
+    def record(self, machine_id, dets, ts=None):
+        """Queue one frame's FrameDetections (original-image coords); never blocks on I/O"""
+        self._ensure_writer()
+        ts = time.time() if ts is None else ts
+        key = (_safe_key(machine_id), int(ts // self.window_seconds) * self.window_seconds)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = _Buffer()
+            buffer.frame_ts.append(ts)
+            buffer.frame_n.append(len(dets))
+            if len(dets):
+                buffer.cls.append(dets.cls)
+                buffer.conf.append(dets.conf)
+                buffer.xyxy.append(dets.xyxy)
+                buffer.detections += len(dets)
+            if key[0] not in self._known_machines:
+                # Class names are written once per machine per process
+                self._known_machines.add(key[0])
+                self._pending_names[key[0]] = dets.names
+            pending = sum(b.detections for b in self._buffers.values())
+        if pending >= self.max_buffered:
+            self._wakeup.set()
+
+    def _run(self):
+        last_window = None
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # Keep the thread alive whatever happens, or detections pile up unwritten
+            try:
+                self.flush()
+
+                # Once a window closes, merge its small chunks into one
+                window = int(time.time() // self.window_seconds) * self.window_seconds
+                if last_window is not None and window != last_window:
+                    self.compact(before=window)
+                last_window = window
+            except Exception as e:
+                print(f"❌ Detection store background run failed: {e}")
+
+    def flush(self):
+        """Write everything buffered so far (one chunk per machine/window)"""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            names, self._pending_names = self._pending_names, {}
+
+        with self._io_lock:
+            for machine, machine_names in names.items():
+                self._write_names(machine, machine_names)
+            for (machine, window), buffer in buffers.items():
+                try:
+                    self._write_chunk(machine, window, buffer)
+                except Exception as e:
+                    self.write_errors += 1
+                    print(f"❌ Detection store write failed ({machine}/{window}): {e}")
+
+    def _write_names(self, machine, names):
+        directory = os.path.join(self.root, machine)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, NAMES_FILE), 'w') as f:
+            json.dump({str(k): v for k, v in (names or {}).items()}, f)
+
+    def _write_chunk(self, machine, window, buffer):
+        directory = os.path.join(self.root, machine, str(window))
+        os.makedirs(directory, exist_ok=True)
+        self._seq += 1
+        name = f'{time.time_ns()}-{self._seq}.npz'
+        columns = {
+            'frame_ts': np.asarray(buffer.frame_ts, dtype=np.float64),
+            'frame_n': np.asarray(buffer.frame_n, dtype=np.uint16),
+            'cls': np.concatenate(buffer.cls).astype(np.uint16) if buffer.cls else np.zeros(0, np.uint16),
+            'conf': np.concatenate(buffer.conf).astype(np.float16) if buffer.conf else np.zeros(0, np.float16),
+            'xyxy': np.concatenate(buffer.xyxy).astype(np.float32) if buffer.xyxy else np.zeros((0, 4), np.float32)
+        }
+        # Write then rename, so readers never see half a chunk
+        tmp = os.path.join(directory, f'.{name}.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(tmp, os.path.join(directory, name))
+        self.frames_written += len(columns['frame_ts'])
+        self.detections_written += len(columns['cls'])
+
+    def compact(self, before=None):
+        """Merge the chunks of each window that ended before `before` into one file"""
+        before = before or int(time.time() // self.window_seconds) * self.window_seconds
+        with self._io_lock:
+            for machine in self._machines():
+                with self._compaction_lock(machine) as locked:
+                    if not locked:
+                        continue  # another process is compacting this machine
+                    for window, directory in self._windows(machine, 0, before):
+                        self._compact_window(directory)
+
+    def _compact_window(self, directory):
+        files = sorted(f for f in os.listdir(directory) if f.endswith('.npz'))
+        if len(files) <= 1:
+            return
+        chunks = [self._load(os.path.join(directory, f)) for f in files]
+        merged = {col: np.concatenate([c[col] for c in chunks]) for col in chunks[0]}
+        order = np.argsort(merged['frame_ts'], kind='stable')
+        if not np.array_equal(order, np.arange(len(order))):
+            merged = self._reorder(merged, order)
+        tmp = os.path.join(directory, f'.{COMPACT_NAME}.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, **merged)
+        # Merged file first: a crash before the removals leaves duplicates, never a lost window
+        os.replace(tmp, os.path.join(directory, COMPACT_NAME))
+        for f in files:
+            if f != COMPACT_NAME:
+                os.remove(os.path.join(directory, f))
+
+    @contextmanager
+    def _compaction_lock(self, machine):
+        """Non-blocking exclusive lock on the machine's lock file; yields whether it was taken"""
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.root, machine, LOCK_NAME), 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _reorder(columns, order):
+        """Reorder frames (and their detection runs) by frame order"""
+        starts = np.concatenate([[0], np.cumsum(columns['frame_n'].astype(np.int64))[:-1]])
+        det_index = np.concatenate([
+            np.arange(starts[i], starts[i] + columns['frame_n'][i]) for i in order
+        ]) if len(columns['cls']) else np.zeros(0, dtype=np.int64)
+        return {
+            'frame_ts': columns['frame_ts'][order],
+            'frame_n': columns['frame_n'][order],
+            'cls': columns['cls'][det_index],
+            'conf': columns['conf'][det_index],
+            'xyxy': columns['xyxy'][det_index]
+        }
+
+    # ---------- reading ----------
+
+    def _machines(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [m for m in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, m))]
+
+    def _windows(self, machine, start, end):
+        directory = os.path.join(self.root, machine)
+        if not os.path.isdir(directory):
+            return []
+        windows = []
+        for entry in os.listdir(directory):
+            if not entry.isdigit():
+                continue
+            window = int(entry)
+            if window + self.window_seconds > start and window < end:
+                windows.append((window, os.path.join(directory, entry)))
+        return sorted(windows)
+
+    @staticmethod
+    def _load(path):
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    def _load_window(self, directory, attempts=3):
+        """
+        All chunks of a window. A chunk removed by a compaction (in any
+        process) after the listing means its rows moved to compact.npz, so
+        the window is listed again; the last attempt just skips missing files.
+        """
+        for attempt in range(attempts):
+            chunks, missing = [], False
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.npz'):
+                    continue
+                try:
+                    chunks.append(self._load(os.path.join(directory, name)))
+                except FileNotFoundError:
+                    missing = True
+            if not missing or attempt == attempts - 1:
+                return chunks
+            time.sleep(0.05)
+
+    def names(self, machine_id):
+        path = os.path.join(self.root, _safe_key(machine_id), NAMES_FILE)
+        try:
+            with open(path) as f:
+                return {int(k): v for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def read(self, machine_id, start, end, columns=('cls', 'conf')):
+        """
+        Column arrays for detections of frames in [start, end), plus
+        'frame_ts'/'frame_n' for those frames. Flushes pending writes first.
+        """
+        self.flush()
+        machine = _safe_key(machine_id)
+        frame_ts, frame_n = [], []
+        out = {col: [] for col in columns}
+        for _, directory in self._windows(machine, start, end):
+            for chunk in self._load_window(directory):
+                in_range = (chunk['frame_ts'] >= start) & (chunk['frame_ts'] < end)
+                if not in_range.any():
+                    continue
+                det_mask = np.repeat(in_range, chunk['frame_n'].astype(np.int64))
+                frame_ts.append(chunk['frame_ts'][in_range])
+                frame_n.append(chunk['frame_n'][in_range])
+                for col in columns:
+                    out[col].append(chunk[col][det_mask])
+
+        empty = {'cls': np.zeros(0, np.uint16), 'conf': np.zeros(0, np.float16),
+                 'xyxy': np.zeros((0, 4), np.float32)}
+        result = {col: np.concatenate(out[col]) if out[col] else empty[col] for col in columns}
+        result['frame_ts'] = np.concatenate(frame_ts) if frame_ts else np.zeros(0)
+        result['frame_n'] = np.concatenate(frame_n) if frame_n else np.zeros(0, np.uint16)
+        return result
+
+    def summary(self, machine_id, start, end, bins=20, is_defect=None):
+        """
+        Aggregates over [start, end): frame/detection counts, class histogram,
+        confidence histogram (overall and per class) and, given an
+        `is_defect` lookup array (class id -> bool), the defect rate.
+        """
+        data = self.read(machine_id, start, end)
+        cls = data['cls'].astype(np.int64)
+        conf = data['conf'].astype(np.float32)
+        names = self.names(machine_id)
+
+        counts = np.bincount(cls, minlength=max(len(names), 1)) if len(cls) else np.zeros(len(names), np.int64)
+        edges = np.linspace(0, 1, bins + 1)
+        overall, _ = np.histogram(conf, bins=edges)
+        per_class = {}
+        for class_id in np.nonzero(counts)[0]:
+            hist, _ = np.histogram(conf[cls == class_id], bins=edges)
+            per_class[names.get(int(class_id), str(class_id))] = hist.tolist()
+
+        result = {
+            'frames': int(len(data['frame_ts'])),
+            'detections': int(len(cls)),
+            'classHistogram': [
+                {'classId': int(i), 'label': names.get(int(i), str(i)), 'count': int(n)}
+                for i, n in enumerate(counts) if n
+            ],
+            'confidence': {
+                'binEdges': np.round(edges, 4).tolist(),
+                'counts': overall.tolist(),
+                'byClass': per_class,
+                'mean': round(float(conf.mean()), 4) if len(conf) else None,
+                'p50': round(float(np.percentile(conf, 50)), 4) if len(conf) else None
+            }
+        }
+        if is_defect is not None and len(cls):
+            known = cls < len(is_defect)
+            result['defectRate'] = round(float(is_defect[cls[known]].mean()), 4) if known.any() else None
+        return result
+
+    def stats(self):
+        with self._lock:
+            buffered = sum(b.detections for b in self._buffers.values())
+        return {
+            'root': self.root,
+            'windowSeconds': self.window_seconds,
+            'bufferedDetections': buffered,
+            'framesWritten': self.frames_written,
+            'detectionsWritten': self.detections_written,
+            'writeErrors': self.write_errors
+        }
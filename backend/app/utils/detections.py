@@ -0,0 +1,190 @@
+import numpy as np
+
+
+class FrameDetections:
+    """
+    Detections for a single frame as plain NumPy arrays.
+
+    This is what every inference path hands back to the routes, so results can
+    cross process boundaries (pickle) and don't depend on torch/ultralytics.
+
+    Attributes:
+        xyxy (np.ndarray): (N, 4) float32 boxes in image pixel coordinates
+        conf (np.ndarray): (N,) float32 confidences in [0, 1]
+        cls (np.ndarray): (N,) int64 class indices
+        names (dict): class index -> label, as reported by the model
+        model_version (str): Version of the model that produced them, if known
+    """
+
+    __slots__ = ('xyxy', 'conf', 'cls', 'names', 'model_version')
+
+    def __init__(self, xyxy, conf, cls, names, model_version=None):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        self.names = names
+        self.model_version = model_version
+
+    def __len__(self):
+        return len(self.conf)
+
+    def scaled(self, sx, sy):
+        """Copy with boxes multiplied by (sx, sy), e.g. back to original pixels"""
+        if sx == 1 and sy == 1:
+            return self
+        xyxy = self.xyxy * np.array([sx, sy, sx, sy], dtype=np.float32)
+        return FrameDetections(xyxy, self.conf, self.cls, self.names, self.model_version)
+
+    def shifted(self, dx, dy):
+        """Copy with boxes moved by (dx, dy), e.g. from a crop back to the frame"""
+        if dx == 0 and dy == 0:
+            return self
+        xyxy = self.xyxy + np.array([dx, dy, dx, dy], dtype=np.float32)
+        return FrameDetections(xyxy, self.conf, self.cls, self.names, self.model_version)
+
+    def select(self, mask):
+        """Copy keeping only the detections where `mask` is True"""
+        return FrameDetections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names, self.model_version)
+
+    @classmethod
+    def empty(cls, names, model_version=None):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), names, model_version)
+
+    @classmethod
+    def from_yolo(cls, result):
+        """Convert an ultralytics `Results` object"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty(result.names)
+        return cls(
+            boxes.xyxy.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy(),
+            result.names
+        )
+
+
+# Keyword matching for the (Indonesian) class names of the coffee model
+DEFECT_KEYWORDS = ('rusak', 'cacat', 'buruk', 'jelek')
+HEALTHY_KEYWORDS = ('bagus', 'baik', 'sehat', 'good')
+
+
+class StatusTable:
+    """
+    Precomputed class index -> healthy/defect lookup for one model's labels.
+
+    Built once per label set so per-frame post-processing is pure array
+    indexing instead of a substring search per detection.
+    """
+
+    def __init__(self, names):
+        size = max(names) + 1 if names else 0
+        self.labels = np.array([names.get(i, str(i)) for i in range(size)], dtype=object)
+        self.is_defect = np.zeros(size, dtype=bool)
+        self.unknown = []
+
+        for idx in range(size):
+            label_lower = str(self.labels[idx]).lower()
+            if any(keyword in label_lower for keyword in DEFECT_KEYWORDS):
+                self.is_defect[idx] = True
+            elif not any(keyword in label_lower for keyword in HEALTHY_KEYWORDS):
+                # Unknown labels count as healthy, same as before
+                self.unknown.append(self.labels[idx])
+
+        if self.unknown:
+            print(f"⚠️ Unknown labels (treated as healthy): {self.unknown}")
+
+
+_status_tables = {}
+
+
+def get_status_table(names):
+    """Cached StatusTable for a model's `names` mapping"""
+    key = tuple(sorted(names.items()))
+    table = _status_tables.get(key)
+    if table is None:
+        table = _status_tables[key] = StatusTable(names)
+    return table
+
+
+def summarize_detections(dets, min_confidence=0.0):
+    """
+    Reduce one frame's detections to the analyze response payload.
+
+    Confidence filtering, the dominant-status pick and the bbox export all run
+    on whole arrays, so cost barely grows with the number of beans.
+    """
+    table = get_status_table(dets.names)
+
+    keep = dets.conf >= min_confidence
+    conf = dets.conf[keep]
+    if len(conf) == 0:
+        return {
+            'status': 'healthy',  # No defects found
+            'accuracy': 0,
+            'detections': [],
+            'modelVersion': dets.model_version
+        }
+    cls = dets.cls[keep]
+    xyxy = dets.xyxy[keep]
+
+    is_defect = table.is_defect[cls]
+    best = int(np.argmax(conf))
+    defect_count = int(np.count_nonzero(is_defect))
+
+    labels = table.labels[cls].tolist()
+    confidences = np.round(conf.astype(np.float64) * 100, 1).tolist()
+    boxes = xyxy.tolist()
+
+    return {
+        'status': 'defect' if is_defect[best] else 'healthy',
+        'accuracy': round(float(conf[best]) * 100, 1),
+        'detections': [
+            {'label': label, 'confidence': confidence, 'bbox': bbox}
+            for label, confidence, bbox in zip(labels, confidences, boxes)
+        ],
+        'total_objects': len(labels),
+        'counts': {
+            'healthy': len(labels) - defect_count,
+            'defect': defect_count
+        },
+        'modelVersion': dets.model_version
+    }
+
+
+def box_iou(box, boxes):
+    """IoU of one (4,) xyxy box against an (N, 4) array"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def nms(boxes, scores, iou_threshold=0.7, classes=None, max_det=300):
+    """
+    Greedy non-maximum suppression in NumPy; returns kept indices, best first.
+
+    With `classes` given, boxes only suppress others of the same class
+    (boxes are offset per class, the usual batched-NMS trick).
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    boxes = boxes.astype(np.float32, copy=False)
+    if classes is not None:
+        offset = (boxes.max() + 1) * classes.astype(np.float32)
+        boxes = boxes + offset[:, None]
+
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while len(order) and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        if len(order) == 1:
+            break
+        ious = box_iou(boxes[i], boxes[order[1:]])
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
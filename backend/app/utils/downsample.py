@@ -0,0 +1,139 @@
+"""
+Server-side downsampling for chart endpoints.
+
+Two ways to turn any amount of history into about `points` chart points:
+
+- bucket: the database groups rows into equal time buckets and returns
+  min/avg/max/count per bucket; nothing but the aggregates leaves SQL.
+- lttb: Largest-Triangle-Three-Buckets over the raw (time, value) columns in
+  NumPy; keeps the visual shape (spikes, dips) with real samples.
+
+Timestamps are the naive UTC datetimes the tables store.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, cast, Integer
+
+METHOD_BUCKET = 'bucket'
+METHOD_LTTB = 'lttb'
+METHODS = (METHOD_BUCKET, METHOD_LTTB)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch(dt):
+    return (dt - EPOCH).total_seconds()
+
+
+def lttb(x, y, threshold):
+    """Indices of the `threshold` points LTTB keeps from (x, y), x ascending"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        next_start = end
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+
+        # Third vertex: the average of the next bucket (the last point at the end)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area (a, candidate, next average) for each candidate
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _bucket_index(session, time_column, start, width):
+    seconds = func.extract('epoch', time_column) - _epoch(start)
+    if session.get_bind().dialect.name == 'postgresql':
+        return func.floor(seconds / width)
+    # SQLite: integer cast truncates, same as floor for times after `start`
+    return cast(seconds / width, Integer)
+
+
+def bucket_series(session, time_column, value_column, start, end, points, filters=()):
+    """min/avg/max/count per time bucket of (end - start) / points, computed in SQL"""
+    width = max((end - start).total_seconds() / points, 1.0)
+    bucket = _bucket_index(session, time_column, start, width).label('bucket')
+    rows = session.query(
+        bucket,
+        func.min(value_column),
+        func.avg(value_column),
+        func.max(value_column),
+        func.count(value_column)
+    ).filter(time_column >= start, time_column < end, *filters)\
+        .group_by(bucket).order_by(bucket).all()
+
+    series = [{
+        'timestamp': (start + timedelta(seconds=(int(index) + 0.5) * width)).isoformat(),
+        'min': round(float(low), 3),
+        'avg': round(float(mean), 3),
+        'max': round(float(high), 3),
+        'count': int(count)
+    } for index, low, mean, high, count in rows if count]
+    return series, sum(row['count'] for row in series)
+
+
+def lttb_series(session, time_column, value_column, start, end, points, filters=()):
+    """LTTB-selected raw samples; only the two columns are fetched, no ORM rows"""
+    rows = session.query(time_column, value_column)\
+        .filter(time_column >= start, time_column < end, value_column.isnot(None), *filters)\
+        .order_by(time_column).all()
+    if not rows:
+        return [], 0
+
+    times = np.array([_epoch(t) for t, _ in rows], dtype=np.float64)
+    values = np.array([v for _, v in rows], dtype=np.float64)
+    keep = lttb(times, values, points)
+    series = [{
+        'timestamp': rows[i][0].isoformat(),
+        'value': round(float(values[i]), 3)
+    } for i in keep]
+    return series, len(rows)
+
+
+def downsampled_series(session, time_column, value_column, start, end, points,
+                       method=METHOD_BUCKET, filters=()):
+    series_for = lttb_series if method == METHOD_LTTB else bucket_series
+    series, raw_points = series_for(session, time_column, value_column, start, end, points, filters)
+    return {
+        'method': method,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'points': len(series),
+        'rawPoints': raw_points,
+        'series': series
+    }
+
+
+def parse_chart_args(args, default_range, max_points=2000):
+    """
+    (start, end, points, method) from request args `from`, `to` (ISO, naive =
+    UTC), `points` and `method`; raises ValueError on bad input.
+    """
+    def parse(value):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+        return parsed
+
+    end = parse(args['to']) if args.get('to') else datetime.utcnow()
+    start = parse(args['from']) if args.get('from') else end - default_range
+    if end <= start:
+        raise ValueError('`to` must be after `from`')
+    points = min(max(int(args.get('points', 300)), 3), max_points)
+    method = args.get('method', METHOD_BUCKET)
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    return start, end, points, method
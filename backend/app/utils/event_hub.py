@@ -0,0 +1,144 @@
+"""
+In-process publish/subscribe for Server-Sent Events (GET /api/events).
+
+Routes publish a change once (machine toggled, log written, telemetry
+ingested, batch status changed); the hub encodes it into an SSE frame once
+and hands the same bytes to every subscriber's queue. Each open browser only
+drains its queue, so N viewers cost one computation plus N cheap writes.
+
+A subscriber that stops reading (full queue) is dropped rather than slowing
+down the publisher; its EventSource reconnects with Last-Event-ID and gets
+the missed events from the replay buffer, if they are still there.
+
+Events about one user's data are published with an `audience` (the user ids
+allowed to see it); admins receive everything, other subscribers only the
+events addressed to them plus the ones without an audience.
+
+The hub lives in the web process, so the API must run as one process
+(run.py, threaded): with several workers a change reaches only the clients
+of the worker that made it, and event ids differ between workers.
+"""
+import json
+import queue
+import threading
+from collections import deque
+from datetime import date, datetime
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def format_sse(data, event=None, event_id=None):
+    """One SSE frame (str); `data` is already-encoded JSON"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in data.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """One connected client: a bounded queue of encoded frames"""
+
+    def __init__(self, events=None, max_queue=256, user_id=None, is_admin=False):
+        self.events = set(events) if events else None
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+
+    def wants(self, event, audience=None):
+        if self.events is not None and event not in self.events:
+            return False
+        return audience is None or self.is_admin or self.user_id in audience
+
+    def get(self, timeout):
+        """Next frame, or None after `timeout` seconds (send a heartbeat then)"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    """
+    Args:
+        max_queue (int): Frames buffered per subscriber before it is dropped
+        replay (int): Recent frames kept for reconnects with Last-Event-ID
+    """
+
+    def __init__(self, max_queue=256, replay=500):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay)
+        self._next_id = 1
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, events=None, last_event_id=None, user_id=None, is_admin=False):
+        """
+        New subscription to `events` (None = all) for `user_id`. With
+        `last_event_id`, the buffered frames after it are queued first.
+        """
+        subscription = Subscription(events, self.max_queue, user_id, is_admin)
+        with self._lock:
+            if last_event_id is not None:
+                for event_id, event, audience, frame in self._replay:
+                    if event_id > last_event_id and subscription.wants(event, audience):
+                        try:
+                            subscription.queue.put_nowait(frame)
+                        except queue.Full:
+                            break
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+        subscription.closed = True
+
+    def publish(self, event, data, audience=None):
+        """
+        Encode `data` once and queue it for every interested subscriber;
+        with `audience` (user ids), only for those users and admins.
+        """
+        payload = json.dumps(data, default=_default, separators=(',', ':'))
+        if audience is not None:
+            audience = frozenset(audience)
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            frame = format_sse(payload, event, event_id)
+            self._replay.append((event_id, event, audience, frame))
+            self.published += 1
+
+            lagging = []
+            for subscription in self._subscribers:
+                if not subscription.wants(event, audience):
+                    continue
+                try:
+                    subscription.queue.put_nowait(frame)
+                except queue.Full:
+                    lagging.append(subscription)
+            for subscription in lagging:
+                # Its stream ends; the client reconnects and replays from its last id
+                self._subscribers.discard(subscription)
+                subscription.closed = True
+                self.dropped += 1
+        return event_id
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped,
+                'lastEventId': self._next_id - 1,
+                'replayBuffered': len(self._replay)
+            }
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+HIT_EXACT = 'exact'
+HIT_SIMILAR = 'similar'
+
+
+def frame_digest(img_bytes):
+    return hashlib.blake2b(img_bytes, digest_size=16).digest()
+
+
+def frame_thumbnail(pixels, grid=32):
+    """Block-mean grayscale thumbnail (grid x grid, values 0..1) of an RGB frame"""
+    h, w = pixels.shape[:2]
+    bh, bw = max(1, h // grid), max(1, w // grid)
+    gh, gw = h // bh, w // bw
+    blocks = pixels[:gh * bh, :gw * bw].reshape(gh, bh, gw, bw, -1)
+    return blocks.mean(axis=(1, 3, 4), dtype=np.float32) / 255.0
+
+
+class _Entry:
+    __slots__ = ('digest', 'thumbnail', 'result', 'stored_at')
+
+    def __init__(self, digest, thumbnail, result):
+        self.digest = digest
+        self.thumbnail = thumbnail
+        self.result = result
+        self.stored_at = time.monotonic()
+
+
+class FrameResultCache:
+    """
+    Remembers the last analysed frame per stream (machine / session) so a
+    stopped conveyor doesn't cost a model pass per frame.
+
+    A frame is a hit if its bytes hash the same as the previous frame, or if
+    its downscaled thumbnail differs from the previous one by at most
+    `similarity_threshold` (mean absolute difference, 0..1). Entries older
+    than `ttl` seconds are never reused, so a slowly changing scene still
+    gets re-analysed regularly.
+
+    Args:
+        similarity_threshold (float): 0 disables the perceptual check
+        ttl (float): Max age in seconds of a reusable result
+        max_streams (int): How many streams to remember (LRU)
+    """
+
+    def __init__(self, similarity_threshold=0.02, ttl=5.0, max_streams=256):
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_streams = max_streams
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits_exact = 0
+        self.hits_similar = 0
+        self.misses = 0
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def lookup_exact(self, key, digest):
+        """Cached result for byte-identical frames, before any decoding"""
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None and entry.digest == digest:
+                self.hits_exact += 1
+                return entry.result
+        return None
+
+    def lookup_similar(self, key, thumbnail):
+        """Cached result if the decoded frame is visually unchanged; counts a miss otherwise"""
+        with self._lock:
+            entry = self._fresh(key)
+            if (entry is not None and self.similarity_threshold > 0
+                    and entry.thumbnail.shape == thumbnail.shape):
+                diff = float(np.abs(entry.thumbnail - thumbnail).mean())
+                if diff <= self.similarity_threshold:
+                    self.hits_similar += 1
+                    return entry.result
+            self.misses += 1
+        return None
+
+    def store(self, key, digest, thumbnail, result):
+        with self._lock:
+            self._entries[key] = _Entry(digest, thumbnail, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_streams:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        hits = self.hits_exact + self.hits_similar
+        total = hits + self.misses
+        return {
+            'hitsExact': self.hits_exact,
+            'hitsSimilar': self.hits_similar,
+            'misses': self.misses,
+            'hitRate': round(hits / total, 4) if total else 0,
+            'streams': len(self._entries),
+            'similarityThreshold': self.similarity_threshold,
+            'ttlSeconds': self.ttl
+        }
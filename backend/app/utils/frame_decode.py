@@ -0,0 +1,128 @@
+"""
+Fast decode path for analysis frames.
+
+The model letterboxes every frame down to its input size (640 px on the long
+side), so decoding a 1080p webcam JPEG at full resolution is wasted work.
+JPEGs are decoded straight to the smallest DCT scale (1/2, 1/4, 1/8) whose long
+side still covers the model input:
+
+- with `simplejpeg` installed (libjpeg-turbo), scaled decode writes directly
+  into a preallocated per-thread NumPy buffer;
+- otherwise PIL draft mode does the same scaled decode, straight to RGB.
+
+Boxes from the model are in decoded-pixel coordinates; `DecodedFrame.scale`
+maps them back to the original image.
+"""
+import io
+import threading
+
+import numpy as np
+from PIL import Image
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+JPEG_MAGIC = b'\xff\xd8'
+
+_local = threading.local()
+
+
+class DecodedFrame:
+    """
+    Attributes:
+        pixels (np.ndarray): HxWx3 uint8 RGB at the decoded (reduced) size
+        original_size (tuple): (width, height) of the encoded image
+        scale (tuple): (sx, sy) multipliers from decoded to original pixels
+        offset (tuple): (x, y) of `pixels` inside the full decoded frame,
+            non-zero after `crop`
+    """
+
+    __slots__ = ('pixels', 'original_size', 'scale', 'offset')
+
+    def __init__(self, pixels, original_size, scale=None, offset=(0, 0)):
+        self.pixels = pixels
+        self.original_size = original_size
+        if scale is None:
+            h, w = pixels.shape[:2]
+            scale = (original_size[0] / w, original_size[1] / h)
+        self.scale = scale
+        self.offset = offset
+
+    @property
+    def decoded_size(self):
+        return (self.pixels.shape[1], self.pixels.shape[0])
+
+    def crop(self, x0, y0, x1, y1, pixels=None):
+        """Sub-frame (decoded pixel coords) that still maps back to the original"""
+        if pixels is None:
+            pixels = self.pixels[y0:y1, x0:x1]
+        return DecodedFrame(
+            pixels, self.original_size, self.scale,
+            (self.offset[0] + x0, self.offset[1] + y0)
+        )
+
+    def to_original(self, dets):
+        """FrameDetections on `pixels` -> original-image coordinates"""
+        return dets.shifted(*self.offset).scaled(*self.scale)
+
+
+def _min_size(width, height, target_size):
+    """Smallest (w, h) keeping the long side >= target_size (full size if none)"""
+    if not target_size:
+        return width, height
+    ratio = target_size / max(width, height)
+    if ratio >= 1:
+        return width, height
+    return int(width * ratio), int(height * ratio)
+
+
+def _buffer(nbytes):
+    buf = getattr(_local, 'buffer', None)
+    if buf is None or buf.nbytes < nbytes:
+        buf = _local.buffer = np.empty(nbytes, dtype=np.uint8)
+    return buf
+
+
+def _decode_simplejpeg(img_bytes, target_size, reuse_buffer):
+    orig_h, orig_w, _, _ = simplejpeg.decode_jpeg_header(img_bytes)
+    min_w, min_h = _min_size(orig_w, orig_h, target_size)
+    out_h, out_w, _, _ = simplejpeg.decode_jpeg_header(img_bytes, min_height=min_h, min_width=min_w)
+
+    buffer = _buffer(out_h * out_w * 3)[:out_h * out_w * 3] if reuse_buffer else None
+    pixels = simplejpeg.decode_jpeg(
+        img_bytes, colorspace='RGB', min_height=min_h, min_width=min_w, buffer=buffer
+    )
+    return DecodedFrame(pixels, (orig_w, orig_h))
+
+
+def _decode_pil(img_bytes, target_size):
+    img = Image.open(io.BytesIO(img_bytes))
+    original_size = img.size
+
+    if img.format == 'JPEG' and target_size:
+        # Scaled IDCT inside libjpeg, output already RGB: no extra PIL copy
+        img.draft('RGB', _min_size(*original_size, target_size))
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return DecodedFrame(np.asarray(img), original_size)
+
+
+def decode_frame(img_bytes, target_size=640, reuse_buffer=False):
+    """
+    Decode image bytes to an RGB array no smaller than the model input
+    (`target_size=None` decodes at full resolution, e.g. for tiling).
+
+    With `reuse_buffer=True` the pixels may live in a per-thread buffer that
+    the next decode on the same thread overwrites; only use it when the frame
+    is fully processed before the thread decodes again (the analyze path).
+    """
+    if simplejpeg is not None and img_bytes[:2] == JPEG_MAGIC:
+        try:
+            return _decode_simplejpeg(img_bytes, target_size, reuse_buffer)
+        except ValueError:
+            # Unusual/corrupt JPEG variants: let PIL have a go
+            pass
+    return _decode_pil(img_bytes, target_size)
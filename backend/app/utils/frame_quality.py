@@ -0,0 +1,64 @@
+"""
+Cheap blur/exposure check that runs before a frame costs a model pass.
+
+Everything is measured on a strided grayscale copy (long side <= 256 px),
+which takes well under a millisecond:
+
+- sharpness: variance of the 4-neighbour Laplacian. Motion blur from a fast
+  conveyor or an out-of-focus lens flattens edges and drives it down.
+- exposure: mean brightness plus the share of clipped pixels at either end
+  of the histogram (blown-out highlights / crushed shadows).
+"""
+import numpy as np
+
+REASON_BLUR = 'blur'
+REASON_OVEREXPOSED = 'overexposed'
+REASON_UNDEREXPOSED = 'underexposed'
+
+DEFAULT_THRESHOLDS = {
+    'minSharpness': 25.0,       # Laplacian variance
+    'minBrightness': 25.0,      # mean gray level 0..255
+    'maxBrightness': 230.0,
+    'maxHighlights': 0.25,      # share of pixels >= 250
+    'maxShadows': 0.5           # share of pixels <= 5
+}
+
+
+def _gray_preview(pixels, max_side=256):
+    h, w = pixels.shape[:2]
+    step = max(1, -(-max(h, w) // max_side))
+    small = pixels[::step, ::step].astype(np.float32)
+    return small[..., 0] * 0.299 + small[..., 1] * 0.587 + small[..., 2] * 0.114
+
+
+def measure_quality(pixels):
+    """Sharpness/exposure metrics of an HxWx3 RGB frame"""
+    gray = _gray_preview(pixels)
+    laplacian = (4 * gray[1:-1, 1:-1] - gray[:-2, 1:-1] - gray[2:, 1:-1]
+                 - gray[1:-1, :-2] - gray[1:-1, 2:])
+    hist = np.bincount(gray.astype(np.uint8).ravel(), minlength=256)
+    total = hist.sum()
+    return {
+        'sharpness': round(float(laplacian.var()), 2) if laplacian.size else 0.0,
+        'brightness': round(float(gray.mean()), 2),
+        'highlights': round(float(hist[250:].sum() / total), 4),
+        'shadows': round(float(hist[:6].sum() / total), 4)
+    }
+
+
+def check_quality(pixels, thresholds=None):
+    """
+    Returns (ok, reason, metrics); reason is None for usable frames.
+    `thresholds` overrides DEFAULT_THRESHOLDS key by key.
+    """
+    limits = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    metrics = measure_quality(pixels)
+
+    # Exposure first: a black or white frame is "blurry" too, but that's not why
+    if metrics['brightness'] > limits['maxBrightness'] or metrics['highlights'] > limits['maxHighlights']:
+        return False, REASON_OVEREXPOSED, metrics
+    if metrics['brightness'] < limits['minBrightness'] or metrics['shadows'] > limits['maxShadows']:
+        return False, REASON_UNDEREXPOSED, metrics
+    if metrics['sharpness'] < limits['minSharpness']:
+        return False, REASON_BLUR, metrics
+    return True, None, metrics
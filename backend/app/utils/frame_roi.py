@@ -0,0 +1,118 @@
+"""
+Per-machine region of interest (the conveyor belt) for the analysis path.
+
+ROIs are stored normalised to 0..1 so they survive camera resolution changes
+and reduced-size decoding:
+
+    {"type": "rect", "x": 0.1, "y": 0.2, "width": 0.8, "height": 0.5}
+    {"type": "polygon", "points": [[0.1, 0.2], [0.9, 0.25], [0.85, 0.7], [0.12, 0.68]]}
+
+Frames are cropped to the ROI's bounding box before inference (fewer pixels
+to letterbox, belt fills more of the model input); for polygons the area
+outside the polygon is painted the letterbox gray and detections whose centre
+falls outside are dropped. Boxes come back in full-frame coordinates.
+"""
+import numpy as np
+from PIL import Image, ImageDraw
+
+# ultralytics letterbox padding colour: "nothing here" to the model
+FILL_VALUE = 114
+
+
+class RegionOfInterest:
+    """
+    Attributes:
+        kind (str): 'rect' or 'polygon'
+        points (np.ndarray): (N, 2) normalised vertices (4 corners for a rect)
+    """
+
+    __slots__ = ('kind', 'points')
+
+    def __init__(self, kind, points):
+        self.kind = kind
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate a stored/posted ROI; raises ValueError"""
+        if not isinstance(data, dict):
+            raise ValueError('ROI must be an object')
+        kind = data.get('type')
+        if kind == 'rect':
+            try:
+                x, y = float(data['x']), float(data['y'])
+                w, h = float(data['width']), float(data['height'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError('rect ROI needs numeric x, y, width, height')
+            points = [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+            if w <= 0 or h <= 0:
+                raise ValueError('rect ROI width and height must be positive')
+        elif kind == 'polygon':
+            try:
+                points = [[float(px), float(py)] for px, py in data.get('points') or []]
+            except (TypeError, ValueError):
+                raise ValueError('polygon ROI points must be [x, y] pairs')
+            if len(points) < 3:
+                raise ValueError('polygon ROI needs at least 3 points')
+        else:
+            raise ValueError("ROI type must be 'rect' or 'polygon'")
+
+        roi = cls(kind, points)
+        if roi.points.min() < 0 or roi.points.max() > 1:
+            raise ValueError('ROI coordinates must be normalised to 0..1')
+        return roi
+
+    def to_dict(self):
+        if self.kind == 'rect':
+            (x0, y0), (x1, y1) = self.points.min(axis=0), self.points.max(axis=0)
+            return {'type': 'rect', 'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0}
+        return {'type': 'polygon', 'points': self.points.tolist()}
+
+    def _bounds(self, width, height):
+        (x0, y0), (x1, y1) = self.points.min(axis=0), self.points.max(axis=0)
+        return (int(np.floor(x0 * width)), int(np.floor(y0 * height)),
+                max(int(np.ceil(x1 * width)), 1), max(int(np.ceil(y1 * height)), 1))
+
+    def crop(self, frame):
+        """DecodedFrame cut to the ROI (polygon outside painted gray)"""
+        height, width = frame.pixels.shape[:2]
+        x0, y0, x1, y1 = self._bounds(width, height)
+        if (x0, y0, x1, y1) == (0, 0, width, height) and self.kind == 'rect':
+            return frame
+
+        pixels = frame.pixels[y0:y1, x0:x1]
+        if self.kind == 'polygon':
+            mask = Image.new('L', (x1 - x0, y1 - y0), 0)
+            polygon = [(px * width - x0, py * height - y0) for px, py in self.points]
+            ImageDraw.Draw(mask).polygon(polygon, fill=1)
+            pixels = np.where(np.asarray(mask, dtype=bool)[..., None], pixels, np.uint8(FILL_VALUE))
+        return frame.crop(x0, y0, x1, y1, pixels=pixels)
+
+    def contains(self, points):
+        """Bool mask of which normalised (N, 2) points lie inside (ray casting)"""
+        if self.kind == 'rect':
+            (x0, y0), (x1, y1) = self.points.min(axis=0), self.points.max(axis=0)
+            return ((points[:, 0] >= x0) & (points[:, 0] <= x1)
+                    & (points[:, 1] >= y0) & (points[:, 1] <= y1))
+
+        x, y = points[:, 0], points[:, 1]
+        inside = np.zeros(len(points), dtype=bool)
+        vx, vy = self.points[:, 0], self.points[:, 1]
+        for i in range(len(self.points)):
+            xi, yi, xj, yj = vx[i], vy[i], vx[i - 1], vy[i - 1]
+            crosses = (yi > y) != (yj > y)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = (xj - xi) * (y - yi) / (yj - yi) + xi
+            inside ^= crosses & (x < x_cross)
+        return inside
+
+    def select(self, dets, original_size):
+        """Keep detections (original-image coords) whose centre is inside the ROI"""
+        if len(dets) == 0:
+            return dets
+        width, height = original_size
+        centres = np.stack([
+            (dets.xyxy[:, 0] + dets.xyxy[:, 2]) / (2 * width),
+            (dets.xyxy[:, 1] + dets.xyxy[:, 3]) / (2 * height)
+        ], axis=1)
+        return dets.select(self.contains(centres))
@@ -0,0 +1,192 @@
+import queue
+import secrets
+import threading
+import time
+
+
+class FrameStreamSession:
+    """
+    Latest-frame-wins analysis loop for one streaming camera client.
+
+    The transport (WebSocket or HTTP fallback) calls `offer()` for every frame
+    it receives. Only one frame is kept pending: if a new one arrives while the
+    previous is still waiting, the older frame is dropped, so a slow server
+    never falls behind the live camera. Results are handed to `on_result` from
+    the session's worker thread as soon as each frame is done.
+
+    Args:
+        analyze (callable): frame bytes -> result dict (may raise)
+        on_result (callable): receives one message dict per processed frame
+    """
+
+    def __init__(self, analyze, on_result, machine_id=None, user_id=None):
+        self.id = secrets.token_urlsafe(24)
+        self.machine_id = machine_id
+        self.user_id = user_id
+
+        self._analyze = analyze
+        self._on_result = on_result
+        self._cond = threading.Condition()
+        self._pending = None
+        self._closed = False
+        self._thread = None
+
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.last_active = time.monotonic()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f'frame-stream-{self.id[:8]}',
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def offer(self, frame_bytes):
+        """Queue a frame, replacing any not-yet-started one. Returns its seq"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Stream session is closed')
+            self.received += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (self.received, frame_bytes, time.monotonic())
+            self.last_active = time.monotonic()
+            self._cond.notify()
+            return self.received
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                seq, frame_bytes, received_at = self._pending
+                self._pending = None
+
+            message = {'type': 'result', 'seq': seq}
+            try:
+                message['data'] = self._analyze(frame_bytes)
+            except Exception as e:
+                message = {'type': 'error', 'seq': seq, 'message': str(e)}
+            self.processed += 1
+            message['latencyMs'] = round((time.monotonic() - received_at) * 1000, 1)
+            message['dropped'] = self.dropped
+
+            try:
+                self._on_result(message)
+            except Exception:
+                # Client went away mid-send; the transport will close us
+                self.close()
+                return
+
+    def stats(self):
+        return {
+            'sessionId': self.id,
+            'machineId': self.machine_id,
+            'received': self.received,
+            'processed': self.processed,
+            'dropped': self.dropped
+        }
+
+
+class StreamSessionRegistry:
+    """
+    In-process registry for HTTP-fallback sessions, which outlive a single
+    request. Sessions idle longer than `idle_timeout` seconds are closed by a
+    background sweeper (and are never handed out by `get()` once expired).
+    """
+
+    def __init__(self, idle_timeout=60):
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def _ensure_sweeper(self):
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._run_sweeper, name='stream-session-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _run_sweeper(self):
+        while True:
+            time.sleep(max(self.idle_timeout / 2, 1))
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"⚠️  Stream session sweep failed: {e}")
+
+    def _expired(self, session, now):
+        return session.closed or now - session.last_active > self.idle_timeout
+
+    def create(self, analyze, machine_id=None, user_id=None):
+        self._ensure_sweeper()
+        self.sweep()
+        results = queue.Queue(maxsize=64)
+
+        def push(message):
+            # Readers that fall behind lose the oldest results, like frames
+            while True:
+                try:
+                    results.put_nowait(message)
+                    return
+                except queue.Full:
+                    try:
+                        results.get_nowait()
+                    except queue.Empty:
+                        pass
+
+        session = FrameStreamSession(analyze, push, machine_id=machine_id, user_id=user_id).start()
+        with self._lock:
+            self._sessions[session.id] = session
+            self._results[session.id] = results
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session and self._expired(session, time.monotonic()):
+            self.remove(session_id)
+            return None
+        return session
+
+    def results(self, session_id):
+        with self._lock:
+            return self._results.get(session_id)
+
+    def remove(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            self._results.pop(session_id, None)
+        if session:
+            session.close()
+        return session
+
+    def sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            stale = [sid for sid, s in self._sessions.items() if self._expired(s, now)]
+        for sid in stale:
+            self.remove(sid)
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,257 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# Lower runs first: live conveyor frames overtake queued bulk/re-grading work
+PRIORITY_LIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BULK = 10
+
+PRIORITIES = {'live': PRIORITY_LIVE, 'normal': PRIORITY_NORMAL, 'bulk': PRIORITY_BULK}
+
+# Why a frame was shed
+SHED_QUEUE_FULL = 'queue_full'
+SHED_KEY_LIMIT = 'machine_limit'
+SHED_EXPIRED = 'expired'
+
+
+class InferenceOverloaded(Exception):
+    """
+    The engine refused (or dropped) a frame instead of letting it wait.
+
+    Attributes:
+        reason (str): SHED_QUEUE_FULL, SHED_KEY_LIMIT or SHED_EXPIRED
+        retry_after (float): Suggested client back-off in seconds
+    """
+
+    def __init__(self, reason, retry_after=1.0):
+        super().__init__(f'Inference overloaded ({reason})')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _PendingFrame:
+    __slots__ = ('frame', 'future', 'enqueued_at', 'priority', 'rank', 'seq', 'key', 'admitted')
+
+    def __init__(self, frame, priority, rank, seq, key, admitted):
+        self.frame = frame
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        self.priority = priority
+        self.rank = rank
+        self.seq = seq
+        self.key = key
+        self.admitted = admitted
+
+    def __lt__(self, other):
+        # Priority first; within a level a machine's n-th waiting frame goes
+        # after every other machine's (n-1)-th, then FIFO
+        return (self.priority, self.rank, self.seq) < (other.priority, other.rank, other.seq)
+
+
+class BatchInferenceEngine:
+    """
+    Collects frames submitted concurrently by request threads and runs them
+    through the model as one batched call.
+
+    A batch is dispatched as soon as `max_batch_size` frames are waiting or
+    `max_wait_ms` has passed since the first frame of the batch arrived,
+    whichever comes first. Each caller gets back the result for its own frame.
+    Waiting frames are taken in priority order (PRIORITY_LIVE first), FIFO
+    within a level.
+
+    Admission control keeps latency bounded under overload: admitted frames
+    are refused with InferenceOverloaded once `max_queue` are waiting, or
+    `max_per_key` for the same key (machine), and dropped if they waited
+    longer than `max_queue_age_ms` by the time a batch is formed. Work that
+    bounds itself (bulk pipelines) submits with `admission=False`.
+
+    Args:
+        predict_batch (callable): Takes a list of frames, returns a list of
+            per-frame results in the same order
+        max_batch_size (int): Upper bound on frames per model call
+        max_wait_ms (float): How long the first frame may wait for company
+        concurrency (int): Batches allowed in flight at once. Keep 1 for an
+            in-process model (not thread-safe); use the process count when
+            `predict_batch` fans out to the inference pool
+        max_queue (int): Admitted frames allowed to wait (0 = unbounded)
+        max_per_key (int): Admitted frames per key allowed to wait (0 = no cap)
+        max_queue_age_ms (float): Admitted frames older than this are shed
+            instead of run (0 = never)
+    """
+
+    def __init__(self, predict_batch, max_batch_size=8, max_wait_ms=25, name='inference', concurrency=1,
+                 max_queue=0, max_per_key=0, max_queue_age_ms=0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_per_key = max(0, int(max_per_key))
+        self.max_queue_age = max(0.0, float(max_queue_age_ms)) / 1000.0
+
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # Admission bookkeeping (guarded by _admit_lock)
+        self._admit_lock = threading.Lock()
+        self._admitted = 0
+        self._per_key = {}
+
+        self._batches = 0
+        self._frames = 0
+        self._errors = 0
+        self._shed = {SHED_QUEUE_FULL: 0, SHED_KEY_LIMIT: 0, SHED_EXPIRED: 0}
+        self._waits = deque(maxlen=1024)
+        self._batch_seconds = deque(maxlen=64)
+
+    def _ensure_worker(self):
+        # Started lazily so forking servers don't inherit dead threads
+        if self._threads and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.concurrency:
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f'{self.name}-batcher-{len(self._threads)}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def retry_after(self):
+        """Rough seconds until the current backlog drains, for Retry-After"""
+        per_batch = (sum(self._batch_seconds) / len(self._batch_seconds)) if self._batch_seconds else 0.5
+        batches = self._queue.qsize() / (self.max_batch_size * self.concurrency)
+        return max(1.0, round(batches * per_batch, 1))
+
+    def submit(self, frame, priority=PRIORITY_NORMAL, key=None, admission=True):
+        """
+        Queue a frame and return a Future resolving to its result.
+
+        Raises InferenceOverloaded if admission control refuses the frame.
+        """
+        self._ensure_worker()
+        with self._admit_lock:
+            waiting = self._per_key.get(key, 0)
+            if admission:
+                if self.max_queue and self._admitted >= self.max_queue:
+                    self._shed[SHED_QUEUE_FULL] += 1
+                    raise InferenceOverloaded(SHED_QUEUE_FULL, self.retry_after())
+                if self.max_per_key and key is not None and waiting >= self.max_per_key:
+                    self._shed[SHED_KEY_LIMIT] += 1
+                    raise InferenceOverloaded(SHED_KEY_LIMIT, self.retry_after())
+                self._admitted += 1
+            self._per_key[key] = waiting + 1
+
+        pending = _PendingFrame(frame, priority, waiting, next(self._seq), key, admission)
+        self._queue.put(pending)
+        return pending.future
+
+    def infer(self, frame, timeout=None, priority=PRIORITY_NORMAL, key=None):
+        """Blocking helper: submit a frame and wait for its result"""
+        return self.submit(frame, priority, key).result(timeout=timeout)
+
+    def _release(self, pending):
+        with self._admit_lock:
+            if pending.admitted:
+                self._admitted -= 1
+            left = self._per_key.get(pending.key, 1) - 1
+            if left > 0:
+                self._per_key[pending.key] = left
+            else:
+                self._per_key.pop(pending.key, None)
+
+    def _accept(self, pending, now):
+        """Leave the queue: False if the frame is cancelled or too old to run"""
+        self._release(pending)
+        if pending.admitted and self.max_queue_age and now - pending.enqueued_at > self.max_queue_age:
+            self._shed[SHED_EXPIRED] += 1
+            if pending.future.set_running_or_notify_cancel():
+                pending.future.set_exception(InferenceOverloaded(SHED_EXPIRED, self.retry_after()))
+            return False
+        # Callers that already gave up (timeout/cancel) don't need a model pass
+        if not pending.future.set_running_or_notify_cancel():
+            return False
+        self._waits.append(now - pending.enqueued_at)
+        return True
+
+    def _collect_batch(self):
+        batch = []
+        first = self._queue.get()
+        if self._accept(first, time.monotonic()):
+            batch.append(first)
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    pending = self._queue.get_nowait()
+                else:
+                    pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if self._accept(pending, time.monotonic()):
+                batch.append(pending)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            try:
+                results = self.predict_batch([p.frame for p in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f'Model returned {len(results)} results for {len(batch)} frames'
+                    )
+            except Exception as e:
+                self._errors += 1
+                print(f"❌ Batch inference error ({len(batch)} frames): {e}")
+                for p in batch:
+                    p.future.set_exception(e)
+                continue
+
+            self._batch_seconds.append(time.monotonic() - started)
+            self._batches += 1
+            self._frames += len(batch)
+            for p, result in zip(batch, results):
+                p.future.set_result(result)
+
+    def stats(self):
+        waits = np.array(self._waits) * 1000 if self._waits else None
+        return {
+            'batches': self._batches,
+            'frames': self._frames,
+            'errors': self._errors,
+            'avgBatchSize': round(self._frames / self._batches, 2) if self._batches else 0,
+            'queued': self._queue.qsize(),
+            'queuedAdmitted': self._admitted,
+            'queuedByKey': {str(k): v for k, v in self._per_key.items()},
+            'queueWaitMs': {
+                'avg': round(float(waits.mean()), 2),
+                'p95': round(float(np.percentile(waits, 95)), 2),
+                'max': round(float(waits.max()), 2)
+            } if waits is not None else None,
+            'shed': dict(self._shed),
+            'maxBatchSize': self.max_batch_size,
+            'concurrency': self.concurrency,
+            'maxWaitMs': self.max_wait * 1000.0,
+            'maxQueue': self.max_queue,
+            'maxPerKey': self.max_per_key,
+            'maxQueueAgeMs': self.max_queue_age * 1000.0
+        }
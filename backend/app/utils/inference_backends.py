@@ -0,0 +1,266 @@
+"""
+Pluggable CPU inference backends for the YOLO model.
+
+Every backend exposes `predict(frames) -> [FrameDetections]` and `names`, so
+the engine, pool and routes don't care which runtime produced the boxes.
+
+    torch     ultralytics + PyTorch on best.pt (baseline)
+    onnx      ONNX Runtime on an exported best.onnx, NumPy pre/post-processing
+              (no torch import at all); optional INT8 dynamic quantization
+    openvino  ultralytics on an exported OpenVINO IR (optionally INT8, calibrated
+              on a dataset YAML of real frames, see INFERENCE_INT8_DATA)
+
+Exports are created next to the .pt file the first time they're needed.
+Use compare_backends.py to check latency and agreement against torch.
+"""
+import ast
+import os
+import time
+
+import numpy as np
+
+from app.utils.detections import FrameDetections, nms, box_iou, summarize_detections
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+def frame_to_array(img):
+    """PIL image (or array) -> contiguous HxWx3 uint8 RGB array"""
+    if isinstance(img, np.ndarray):
+        return np.ascontiguousarray(img, dtype=np.uint8)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return np.asarray(img, dtype=np.uint8)
+
+
+class UltralyticsBackend:
+    """ultralytics YOLO on .pt weights or an exported OpenVINO directory"""
+
+    def __init__(self, model_path, name='torch'):
+        from ultralytics import YOLO
+        self.name = name
+        self.model = YOLO(model_path, task='detect')
+        self.names = self.model.names
+
+    def predict(self, frames):
+        # ultralytics treats ndarray input as BGR (OpenCV convention)
+        inputs = [np.ascontiguousarray(f[..., ::-1]) if isinstance(f, np.ndarray) else f
+                  for f in frames]
+        return [FrameDetections.from_yolo(r) for r in self.model(inputs, verbose=False)]
+
+
+class OnnxRuntimeBackend:
+    """
+    ONNX Runtime with letterbox preprocessing and NMS done in NumPy, matching
+    ultralytics defaults (conf 0.25, IoU 0.7, max 300 detections).
+    """
+
+    def __init__(self, onnx_path, conf_threshold=0.25, iou_threshold=0.7, max_det=300, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.name = 'onnx'
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta['names']) if 'names' in meta else {}
+        imgsz = ast.literal_eval(meta['imgsz']) if 'imgsz' in meta else [640, 640]
+        self.imgsz = (int(imgsz[0]), int(imgsz[1]))
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Fixed batch-1 exports are run frame by frame
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+    def _letterbox(self, img):
+        from PIL import Image
+
+        h, w = img.shape[:2]
+        th, tw = self.imgsz
+        gain = min(th / h, tw / w)
+        nh, nw = int(round(h * gain)), int(round(w * gain))
+        top, left = (th - nh) // 2, (tw - nw) // 2
+
+        canvas = np.full((th, tw, 3), 114, dtype=np.uint8)
+        resized = img if (nh, nw) == (h, w) else np.asarray(
+            Image.fromarray(img).resize((nw, nh), Image.BILINEAR))
+        canvas[top:top + nh, left:left + nw] = resized
+        return canvas, gain, (left, top)
+
+    def _decode(self, output, gain, pad, shape):
+        # output: (4 + nc, anchors) -> (anchors, 4 + nc)
+        preds = output.T
+        scores_all = preds[:, 4:]
+        cls = scores_all.argmax(axis=1)
+        conf = scores_all[np.arange(len(cls)), cls]
+
+        mask = conf >= self.conf_threshold
+        if not mask.any():
+            return FrameDetections.empty(self.names)
+        preds, cls, conf = preds[mask], cls[mask], conf[mask]
+
+        cx, cy, w, h = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+        xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        keep = nms(xyxy, conf, self.iou_threshold, classes=cls, max_det=self.max_det)
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+        # Undo letterbox back to original image pixels
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad[0]) / gain
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad[1]) / gain
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+        return FrameDetections(xyxy, conf, cls, self.names)
+
+    def predict(self, frames):
+        arrays = [frame_to_array(f) for f in frames]
+        prepared = [self._letterbox(a) for a in arrays]
+        blob = np.stack([p[0] for p in prepared]).transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: blob[i:i + 1]})[0]
+                for i in range(len(blob))
+            ])
+
+        return [
+            self._decode(outputs[i], gain, pad, arr.shape)
+            for i, (arr, (_, gain, pad)) in enumerate(zip(arrays, prepared))
+        ]
+
+
+def export_path(model_path, backend, int8=False):
+    stem, _ = os.path.splitext(model_path)
+    if backend == 'onnx':
+        return f'{stem}.int8.onnx' if int8 else f'{stem}.onnx'
+    if backend == 'openvino':
+        return f'{stem}_int8_openvino_model' if int8 else f'{stem}_openvino_model'
+    return model_path
+
+
+def export_model(model_path, backend, int8=False, imgsz=640, data=None):
+    """
+    Export best.pt for `backend` if the artifact doesn't exist yet; returns its
+    path. OpenVINO INT8 needs `data`, a dataset YAML whose images calibrate
+    the quantization (ultralytics would otherwise fall back to COCO).
+    """
+    target = export_path(model_path, backend, int8)
+    if backend == 'torch' or os.path.exists(target):
+        return target
+    if backend == 'openvino' and int8 and not data:
+        raise ValueError('OpenVINO INT8 export needs a calibration dataset (set INFERENCE_INT8_DATA)')
+
+    from ultralytics import YOLO
+    print(f"📦 Exporting {model_path} -> {target}")
+
+    if backend == 'onnx':
+        fp32_path = export_path(model_path, 'onnx')
+        if not os.path.exists(fp32_path):
+            exported = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True)
+            if exported != fp32_path:
+                os.replace(exported, fp32_path)
+        if int8:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32_path, target, weight_type=QuantType.QUInt8)
+    elif backend == 'openvino':
+        kwargs = {'format': 'openvino', 'imgsz': imgsz, 'int8': int8}
+        if int8:
+            kwargs['data'] = data
+        exported = YOLO(model_path).export(**kwargs)
+        if exported != target:
+            os.replace(exported, target)
+    else:
+        raise ValueError(f'Unknown inference backend: {backend}')
+    return target
+
+
+def create_backend(name, model_path, int8=False, threads=None, data=None):
+    """Build a backend by name, exporting the model first when needed (`data`: INT8 calibration set)"""
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown inference backend: {name} (expected one of {BACKENDS})')
+    if name == 'torch':
+        return UltralyticsBackend(model_path, name='torch')
+
+    path = export_model(model_path, name, int8=int8, data=data)
+    if name == 'onnx':
+        backend = OnnxRuntimeBackend(path, threads=threads)
+    else:
+        backend = UltralyticsBackend(path, name='openvino')
+    if int8:
+        backend.name += '-int8'
+    return backend
+
+
+def match_rate(a, b, iou_threshold):
+    """Share of boxes that have a same-class partner with IoU >= threshold"""
+    if len(a) == 0 and len(b) == 0:
+        return 1.0
+    if len(a) == 0 or len(b) == 0:
+        return 0.0
+    matched = 0
+    used = np.zeros(len(b), dtype=bool)
+    for i in np.argsort(-a.conf):
+        ious = box_iou(a.xyxy[i], b.xyxy)
+        ious[(b.cls != a.cls[i]) | used] = 0
+        j = int(np.argmax(ious))
+        if ious[j] >= iou_threshold:
+            used[j] = True
+            matched += 1
+    return matched / max(len(a), len(b))
+
+
+def latency_summary(samples):
+    """Mean / p50 / p95 of latency samples in seconds, reported in ms"""
+    ms = np.array(samples) * 1000
+    return {
+        'meanMs': round(float(ms.mean()), 2),
+        'p50Ms': round(float(np.percentile(ms, 50)), 2),
+        'p95Ms': round(float(np.percentile(ms, 95)), 2)
+    }
+
+
+def compare_backends(baseline, candidate, images, iou_threshold=0.5, warmup=2):
+    """
+    Run the same images through both backends one at a time and report
+    latency plus how closely the candidate agrees with the baseline.
+    """
+    frames = [frame_to_array(img) for img in images]
+    for backend in (baseline, candidate):
+        for frame in frames[:warmup]:
+            backend.predict([frame])
+
+    # Keyed by role, not backend name: both sides may be the same runtime
+    timings = {'baseline': [], 'candidate': []}
+    box_agreement = []
+    status_agreement = []
+    for frame in frames:
+        outputs = []
+        for role, backend in (('baseline', baseline), ('candidate', candidate)):
+            started = time.perf_counter()
+            outputs.append(backend.predict([frame])[0])
+            timings[role].append(time.perf_counter() - started)
+
+        base, cand = outputs
+        box_agreement.append(match_rate(base, cand, iou_threshold))
+        status_agreement.append(
+            summarize_detections(base)['status'] == summarize_detections(cand)['status']
+        )
+
+    base_mean = np.mean(timings['baseline'])
+    cand_mean = np.mean(timings['candidate'])
+    return {
+        'images': len(frames),
+        'baseline': {'backend': baseline.name, **latency_summary(timings['baseline'])},
+        'candidate': {'backend': candidate.name, **latency_summary(timings['candidate'])},
+        'speedup': round(float(base_mean / cand_mean), 2) if cand_mean else None,
+        'boxAgreement': round(float(np.mean(box_agreement)), 4),
+        'statusAgreement': round(float(np.mean(status_agreement)), 4)
+    }
+
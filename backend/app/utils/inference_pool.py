@@ -0,0 +1,186 @@
+"""
+Out-of-process YOLO inference pool.
+
+A single `InferencePool` server owns N worker processes, each holding one copy
+of torch + the model. Web workers talk to it through `InferencePoolClient`
+over a local socket (TCP on localhost or a Unix socket path), sending decoded
+RGB frames as uint8 arrays and getting `FrameDetections` back. This keeps
+memory flat no matter how many gunicorn workers are running.
+
+Start the server with `python inference_server.py`.
+"""
+import os
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+from app.utils.inference_backends import create_backend, frame_to_array
+from app.utils.model_loader import model_version
+
+DEFAULT_AUTHKEY = 'pilahkopi-inference'
+
+# Set inside each worker process by _init_worker
+_worker_model = None
+_worker_version = None
+
+
+def parse_address(address):
+    """'127.0.0.1:6011' -> ('127.0.0.1', 6011); anything with a '/' is a Unix socket path"""
+    if '/' in address:
+        return address
+    host, _, port = address.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+def _init_worker(model_path, torch_threads, backend, int8, int8_data):
+    global _worker_model, _worker_version
+
+    if backend != 'onnx':
+        import torch
+        torch.set_num_threads(torch_threads)
+        torch.set_num_interop_threads(1)
+
+    _worker_model = create_backend(backend, model_path, int8=int8, threads=torch_threads, data=int8_data)
+    _worker_version = model_version(model_path)
+
+    # Warm-up so the first real request doesn't pay for lazy init
+    _worker_model.predict([np.zeros((640, 640, 3), dtype=np.uint8)])
+    print(f"✅ Inference worker {os.getpid()} ready "
+          f"({_worker_model.name}, {torch_threads} threads)")
+
+
+def _predict(frames):
+    results = _worker_model.predict(frames)
+    for dets in results:
+        dets.model_version = _worker_version
+    return results
+
+
+class InferencePool:
+    """
+    Server side: accepts client connections and fans batches out to the
+    worker processes.
+
+    Args:
+        address (str): 'host:port' or Unix socket path to listen on
+        model_path (str): Path to the YOLO weights
+        processes (int): Number of worker processes (one model copy each)
+        torch_threads (int): torch (or ONNX Runtime) intra-op threads per worker
+        backend (str): Inference backend name, see inference_backends
+        int8 (bool): Use the INT8-quantized export
+        int8_data (str): Dataset YAML calibrating the OpenVINO INT8 export
+    """
+
+    def __init__(self, address, model_path, processes=2, torch_threads=1,
+                 authkey=DEFAULT_AUTHKEY, backend='torch', int8=False, int8_data=None):
+        self.address = parse_address(address)
+        self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8
+        self.int8_data = int8_data
+        self.processes = max(1, int(processes))
+        self.torch_threads = max(1, int(torch_threads))
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+        self._pool = None
+
+    def _handle(self, conn):
+        try:
+            while True:
+                try:
+                    frames = conn.recv()
+                except EOFError:
+                    break
+                try:
+                    conn.send(('ok', self._pool.apply(_predict, (frames,))))
+                except Exception as e:
+                    print(f"❌ Pool inference error: {e}")
+                    conn.send(('error', str(e)))
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._pool = ctx.Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.torch_threads, self.backend, self.int8, self.int8_data)
+        )
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+        print(f"🚀 Inference pool listening on {self.address} "
+              f"({self.processes} workers x {self.torch_threads} torch threads)")
+        with Listener(self.address, authkey=self.authkey) as listener:
+            try:
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except Exception as e:
+                        # Bad authkey / half-open connection: keep serving
+                        print(f"⚠️ Rejected pool connection: {e}")
+                        continue
+                    threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+            finally:
+                self._pool.terminate()
+
+
+class InferencePoolClient:
+    """
+    Web-worker side. `predict_batch` has the same signature as the local
+    model path, so it plugs straight into `BatchInferenceEngine`.
+
+    Each calling thread gets its own connection, so an engine with several
+    batcher threads keeps several pool workers busy at once. `version` is the
+    model version of the last batch the pool answered.
+    """
+
+    def __init__(self, address, authkey=DEFAULT_AUTHKEY):
+        self.address = parse_address(address)
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+        self._local = threading.local()
+        self.version = None
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local.conn = None
+
+    def predict_batch(self, frames):
+        payload = [frame_to_array(f) for f in frames]
+        # One retry covers a pool restart between requests
+        for attempt in range(2):
+            try:
+                conn = self._connect()
+                conn.send(payload)
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._reset()
+                if attempt == 1:
+                    raise
+        if status != 'ok':
+            raise RuntimeError(f'Inference pool error: {result}')
+        if result:
+            self.version = result[0].model_version
+        return result
+
+    def ping(self):
+        """True if the pool accepts connections (uses a throwaway connection)"""
+        try:
+            Client(self.address, authkey=self.authkey).close()
+            return True
+        except Exception:
+            return False
@@ -0,0 +1,206 @@
+"""
+Postgres-backed queue for long analysis jobs.
+
+Jobs are rows in `analysis_jobs`; their images are saved under a per-job
+directory. Worker threads claim the next queued job with
+`SELECT ... FOR UPDATE SKIP LOCKED` ordered by (priority, created_at), so any
+number of workers, in the web process or in analysis_worker.py, can share
+the table without handing out a job twice.
+"""
+import os
+import shutil
+import threading
+import time
+import zipfile
+from datetime import timedelta
+
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models.analysis_job import AnalysisJob, jakarta_now
+from app.utils.bulk_analysis import IMAGE_EXTENSIONS, ZIP_MIMETYPES
+
+JOB_FINISHED = ('completed', 'failed', 'cancelled')
+
+
+def save_job_inputs(input_dir, files):
+    """Write request uploads to `input_dir`; returns the number of images"""
+    os.makedirs(input_dir, exist_ok=True)
+    total = 0
+    for index, upload in enumerate(files):
+        name = secure_filename(upload.filename or '') or 'image'
+        is_zip = name.lower().endswith('.zip') or upload.mimetype in ZIP_MIMETYPES
+        if is_zip and not name.lower().endswith('.zip'):
+            name += '.zip'
+        path = os.path.join(input_dir, f'{index:04d}_{name}')
+        upload.save(path)
+
+        if is_zip:
+            with zipfile.ZipFile(path) as archive:
+                total += sum(
+                    1 for info in archive.infolist()
+                    if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+                    and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                )
+        else:
+            total += 1
+    return total
+
+
+def open_job_inputs(input_dir):
+    """Saved uploads as (filename, mimetype, file) for iter_uploaded_images"""
+    inputs = []
+    for entry in sorted(os.listdir(input_dir)):
+        name = entry.split('_', 1)[1] if '_' in entry else entry
+        mimetype = 'application/zip' if name.lower().endswith('.zip') else None
+        inputs.append((name, mimetype, open(os.path.join(input_dir, entry), 'rb')))
+    return inputs
+
+
+def remove_job_inputs(input_dir):
+    shutil.rmtree(input_dir, ignore_errors=True)
+
+
+def claim_next_job():
+    """Atomically move the most urgent queued job to 'running'; None if idle"""
+    job = AnalysisJob.query.filter_by(status='queued')\
+        .order_by(AnalysisJob.priority.asc(), AnalysisJob.created_at.asc())\
+        .with_for_update(skip_locked=True)\
+        .first()
+    if job is None:
+        db.session.rollback()
+        return None
+    job.status = 'running'
+    job.started_at = job.heartbeat_at = jakarta_now()
+    db.session.commit()
+    return job
+
+
+def requeue_stale_jobs(max_age_seconds):
+    """
+    Put back jobs left 'running' by a worker that died: no progress update
+    (heartbeat) for `max_age_seconds`, however long the job has been running
+    """
+    cutoff = jakarta_now() - timedelta(seconds=max_age_seconds)
+    count = AnalysisJob.query.filter(
+        AnalysisJob.status == 'running',
+        db.func.coalesce(AnalysisJob.heartbeat_at, AnalysisJob.started_at) < cutoff
+    ).update({'status': 'queued', 'started_at': None, 'heartbeat_at': None,
+              'processed_images': 0, 'failed_images': 0},
+             synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobWorkerPool:
+    """
+    Background threads that run queued jobs through `handler(job)`.
+
+    The handler owns progress updates and the final result; an exception
+    marks the job failed. Idle workers poll every `poll_interval` seconds,
+    and `notify()` wakes them at once after an enqueue in this process.
+
+    Args:
+        app: Flask app, for the app context the handler needs
+        handler (callable): AnalysisJob -> result dict (stored on the job)
+        workers (int): Jobs run concurrently by this process
+    """
+
+    def __init__(self, app, handler, workers=2, poll_interval=2.0, stale_after=3600):
+        self.app = app
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return self
+            with self.app.app_context():
+                try:
+                    requeued = requeue_stale_jobs(self.stale_after)
+                    if requeued:
+                        print(f"♻️  Requeued {requeued} stale analysis job(s)")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"⚠️  Could not check stale analysis jobs: {e}")
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'analysis-job-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"🧵 Analysis job workers started: {self.workers}")
+        return self
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    job = claim_next_job()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Analysis job claim error: {e}")
+                    job = None
+
+                if job is not None:
+                    self._execute(job)
+                    db.session.remove()
+                    continue
+                db.session.remove()
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _execute(self, job):
+        started = time.monotonic()
+        job_id, input_dir = job.id, job.input_dir
+        print(f"▶️  Analysis job {job_id[:8]} started ({job.total_images} images, priority {job.priority})")
+        try:
+            result = self.handler(job)
+            values = {
+                'status': 'completed',
+                'result': result,
+                'processed_images': job.processed_images,
+                'failed_images': job.failed_images
+            }
+        except JobCancelled:
+            db.session.rollback()
+            values = {'status': 'cancelled'}
+        except Exception as e:
+            db.session.rollback()
+            values = {'status': 'failed', 'error': str(e)}
+            print(f"❌ Analysis job {job_id[:8]} failed: {e}")
+
+        values['finished_at'] = jakarta_now()
+        status = values['status']
+        try:
+            # Only a job still 'running' is finished here; a cancel that landed
+            # after the handler's last check (any process) is kept
+            query = AnalysisJob.query.filter(AnalysisJob.id == job_id)
+            updated = query.filter(AnalysisJob.status == 'running').update(values, synchronize_session=False)
+            if not updated:
+                query.filter(AnalysisJob.status == 'cancelled', AnalysisJob.finished_at.is_(None))\
+                    .update({'finished_at': values['finished_at']}, synchronize_session=False)
+                status = db.session.query(AnalysisJob.status).filter(AnalysisJob.id == job_id).scalar()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Could not save analysis job {job_id[:8]}: {e}")
+        remove_job_inputs(input_dir)
+        print(f"⏹️  Analysis job {job_id[:8]} {status} in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,169 @@
+"""
+Buffered, batched writer for append-only log rows (machine_logs).
+
+Requests hand over a finished row and return; a background thread writes
+everything buffered in one multi-row INSERT once `flush_size` rows are
+waiting or every `flush_interval` seconds, whichever comes first. Ids are
+made up front (time-ordered, random suffix), so nothing is read before a
+write and concurrent writers cannot collide. Whatever is still buffered is
+written at interpreter exit (run.py turns SIGTERM into a normal exit).
+
+If the database rejects the batch because of its contents (a constraint or
+a bad value), the rows are retried one by one and only the rejected ones
+are dropped; other failures (database unreachable) retry the whole batch.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+# Errors caused by a row itself; retrying it will not help
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+def new_log_id():
+    """'M_LOG-' + 12 hex digits of ms time + 8 random: sortable, collision-free without a read"""
+    return f"M_LOG-{int(time.time() * 1000):012x}{os.urandom(4).hex()}"
+
+
+class LogWriter:
+    """
+    Args:
+        app (Flask): Application; inserts run in its app context
+        insert (callable): list of row dicts -> None; one multi-row INSERT
+        flush_size (int): Buffered rows that trigger an early flush
+        flush_interval (float): Seconds between background flushes
+        max_buffered (int): Rows kept while the database is unreachable; the oldest go first
+        max_retries (int): Failed flushes of the same rows before they are dropped
+    """
+
+    def __init__(self, app, insert, flush_size=200, flush_interval=1.0, max_buffered=10000, max_retries=3):
+        self.app = app
+        self.insert = insert
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._buffer = deque(maxlen=max_buffered)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._attempts = 0
+
+        self.written = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def _ensure_writer(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            if self._thread is None:
+                atexit.register(self.close)  # once, however often the thread is restarted
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def write(self, row):
+        """Queue one row (a dict of column values, id included); never touches the database"""
+        self._ensure_writer()
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(row)
+            pending = len(self._buffer)
+        if pending >= self.flush_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._buffer)
+                self._buffer.clear()
+            if not rows:
+                return 0
+
+            written_before = self.written
+            try:
+                with self.app.app_context():
+                    self.insert(rows)
+            except ROW_ERRORS:
+                rows, error = self._insert_each(rows)
+            except Exception as e:
+                error = e
+            else:
+                self.written += len(rows)
+                rows, error = [], None
+
+            if error is not None:
+                self.errors += 1
+                self._attempts += 1
+                if self._attempts >= self.max_retries:
+                    self._attempts = 0
+                    self.dropped += len(rows)
+                    print(f"❌ Log writer dropped {len(rows)} rows after {self.max_retries} failed flushes: {error}")
+                else:
+                    with self._lock:
+                        # Back in front of anything written meanwhile, order kept
+                        free = self._buffer.maxlen - len(self._buffer)
+                        self._buffer.extendleft(reversed(rows[-free:] if free else []))
+                        self.dropped += len(rows) - min(free, len(rows))
+                    print(f"⚠️  Log writer flush failed ({len(rows)} rows, will retry): {error}")
+                return 0
+
+            self._attempts = 0
+            self.flushes += 1
+            return self.written - written_before
+
+    def _insert_each(self, rows):
+        """
+        Row by row after the batch was rejected: drops the rows the database
+        refuses, stops at the first other error. Returns (rows not tried yet,
+        that error or None).
+        """
+        for i, row in enumerate(rows):
+            try:
+                with self.app.app_context():
+                    self.insert([row])
+            except ROW_ERRORS as e:
+                self.dropped += 1
+                print(f"❌ Log writer dropped rejected row {row.get('id')}: {e}")
+            except Exception as e:
+                return rows[i:], e
+            else:
+                self.written += 1
+        return [], None
+
+    def close(self):
+        """Stop the background thread and write what is left"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        while self.flush():
+            pass
+
+    def stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            'buffered': buffered,
+            'written': self.written,
+            'flushes': self.flushes,
+            'dropped': self.dropped,
+            'errors': self.errors
+        }
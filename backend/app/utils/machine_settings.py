@@ -0,0 +1,45 @@
+import threading
+import time
+
+
+class MachineSettingsCache:
+    """
+    Per-machine analysis settings (quality thresholds, ...) kept in memory so
+    the frame path doesn't query `machines` for every frame. Entries expire
+    after `ttl` seconds; call `invalidate` after an update in this process.
+
+    Args:
+        loader (callable): machine_id -> settings dict (None if unknown).
+            Called inside an app context.
+    """
+
+    def __init__(self, loader, ttl=30.0):
+        self.loader = loader
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, machine_id):
+        if machine_id is None:
+            return None
+        entry = self._entries.get(machine_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        try:
+            settings = self.loader(machine_id)
+        except Exception as e:
+            # Keep analysing with defaults (and the last known settings) if the DB hiccups
+            print(f"⚠️  Could not load settings for machine {machine_id}: {e}")
+            settings = entry[1] if entry else None
+
+        with self._lock:
+            self._entries[machine_id] = (time.monotonic(), settings)
+        return settings
+
+    def invalidate(self, machine_id=None):
+        with self._lock:
+            if machine_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(machine_id, None)
@@ -0,0 +1,247 @@
+"""
+Lazy, background loading of the YOLO model, plus hot swapping of versions.
+
+Nothing here imports torch/ultralytics at module import time, so scripts that
+call `create_app()` and non-inference endpoints stay fast. The server kicks off
+`model_loader.start()` at boot (see run.py); the analyze endpoint also starts
+it on first use and answers 503 until the model is warmed up.
+
+A new version (e.g. a retrained best.pt) is loaded and warmed up on a
+background thread while the current one keeps serving, then becomes active by
+swapping a single reference: batches already running finish on the old model,
+the next batch uses the new one. A version can also be loaded as a shadow
+(run on sampled live frames for comparison, never answered with) and
+promoted later; the previous version is kept for rollback.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.utils.detections import get_status_table
+from app.utils.inference_backends import create_backend
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODEL_PATH = os.environ.get('MODEL_PATH') or os.path.join(BASE_DIR, 'machine_model', 'best.pt')
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND') or 'torch'
+INFERENCE_INT8 = os.environ.get('INFERENCE_INT8', 'false').lower() in ('1', 'true', 'yes')
+INFERENCE_INT8_DATA = os.environ.get('INFERENCE_INT8_DATA') or None
+
+STATE_IDLE = 'idle'
+STATE_LOADING = 'loading'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+
+def model_version(model_path):
+    """'<file stem>-<sha256 prefix>' of a weights file, so every retrain gets its own id"""
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return f'{stem}-{digest.hexdigest()[:10]}'
+
+
+class LoadedModel:
+    """A warmed-up backend and the version it was built from"""
+
+    __slots__ = ('model', 'version', 'model_path', 'load_seconds', 'loaded_at')
+
+    def __init__(self, model, version, model_path, load_seconds):
+        self.model = model
+        self.version = version
+        self.model_path = model_path
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'modelPath': self.model_path,
+            'inferenceBackend': self.model.name,
+            'loadSeconds': self.load_seconds,
+            'loadedAt': self.loaded_at
+        }
+
+
+class ModelLoader:
+    """
+    Loads a YOLO model on a background thread and runs a warm-up pass on a
+    synthetic frame before reporting ready.
+
+    Args:
+        model_path (str): Path to the weights file
+        backend (str): Inference backend name ('torch', 'onnx', 'openvino')
+        int8 (bool): Use the INT8-quantized export (onnx/openvino only)
+        int8_data (str): Dataset YAML calibrating the OpenVINO INT8 export
+        warmup_size (int): Side length of the blank warm-up frame
+    """
+
+    def __init__(self, model_path, backend='torch', int8=False, int8_data=None, warmup_size=640):
+        self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8
+        self.int8_data = int8_data
+        self.warmup_size = warmup_size
+
+        self._active = None
+        self._previous = None
+        self._shadow = None
+        self._state = STATE_IDLE
+        self._error = None
+        self._swap = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def _build(self, model_path, version=None):
+        """Load + warm up one version (runs on a background thread)"""
+        started = time.monotonic()
+        version = version or model_version(model_path)
+        print(f"🔄 Loading YOLO model {version} from: {model_path} (backend: {self.backend})")
+        model = create_backend(self.backend, model_path, int8=self.int8, data=self.int8_data)
+
+        # Warm-up: first call initialises fused layers, allocators, etc.
+        blank = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+        model.predict([blank])
+
+        # Label -> healthy/defect lookup, built once per model
+        get_status_table(model.names)
+        return LoadedModel(model, version, model_path, round(time.monotonic() - started, 2))
+
+    def start(self):
+        """Begin loading in the background (no-op if already loading/loaded)"""
+        with self._lock:
+            if self._state in (STATE_LOADING, STATE_READY):
+                return
+            self._state = STATE_LOADING
+            self._error = None
+        threading.Thread(target=self._load, name='model-loader', daemon=True).start()
+
+    def _load(self):
+        try:
+            loaded = self._build(self.model_path)
+            with self._lock:
+                self._active = loaded
+                self._state = STATE_READY
+            self._ready.set()
+            print(f"✅ YOLO model ready in {loaded.load_seconds}s ({loaded.model.name}, {loaded.version})")
+            print(f"📋 Model classes: {loaded.model.names}")
+        except Exception as e:
+            with self._lock:
+                self._state = STATE_FAILED
+                self._error = str(e)
+            print(f"❌ Error loading YOLO model: {e}")
+
+    def load_version(self, model_path=None, version=None, shadow=False):
+        """
+        Load another version in the background and activate it once warmed up
+        (or install it as the shadow). Returns False if a swap is already
+        loading. The serving model is untouched until the new one is ready.
+        """
+        model_path = model_path or self.model_path
+        with self._lock:
+            if self._swap and self._swap['state'] == STATE_LOADING:
+                return False
+            self._swap = {
+                'state': STATE_LOADING, 'modelPath': model_path, 'version': version,
+                'target': 'shadow' if shadow else 'active', 'error': None, 'startedAt': time.time()
+            }
+        threading.Thread(
+            target=self._load_swap, args=(self._swap, model_path, version, shadow),
+            name='model-swap', daemon=True
+        ).start()
+        return True
+
+    def _load_swap(self, swap, model_path, version, shadow):
+        try:
+            loaded = self._build(model_path, version)
+        except Exception as e:
+            with self._lock:
+                swap.update(state=STATE_FAILED, error=str(e))
+            print(f"❌ Error loading model {model_path}: {e}")
+            return
+
+        with self._lock:
+            swap.update(state=STATE_READY, version=loaded.version)
+            if shadow:
+                self._shadow = loaded
+            else:
+                self._activate(loaded)
+        target = 'shadow' if shadow else 'active'
+        print(f"✅ Model {loaded.version} ready in {loaded.load_seconds}s, now {target}")
+
+    def _activate(self, loaded):
+        # Single reference swap: callers holding the old LoadedModel finish with it
+        self._previous = self._active
+        self._active = loaded
+        self._state = STATE_READY
+        self._error = None
+        self._ready.set()
+
+    def promote_shadow(self):
+        """Make the shadow version active; returns it (None if there is none)"""
+        with self._lock:
+            shadow, self._shadow = self._shadow, None
+            if shadow:
+                self._activate(shadow)
+        return shadow
+
+    def stop_shadow(self):
+        with self._lock:
+            shadow, self._shadow = self._shadow, None
+        return shadow
+
+    def rollback(self):
+        """Swap back to the previously active version; returns it (None if unknown)"""
+        with self._lock:
+            if not self._previous:
+                return None
+            self._active, self._previous = self._previous, self._active
+            return self._active
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def active(self):
+        """The serving LoadedModel (model + version) or None if not ready yet"""
+        return self._active if self.is_ready else None
+
+    def shadow(self):
+        return self._shadow
+
+    def get(self):
+        """Return the loaded backend or None if it isn't ready yet"""
+        active = self.active()
+        return active.model if active else None
+
+    @property
+    def version(self):
+        active = self.active()
+        return active.version if active else None
+
+    def wait(self, timeout=None):
+        """Start loading if needed and block until ready; returns readiness"""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def status(self):
+        active, previous, shadow = self._active, self._previous, self._shadow
+        return {
+            'state': self._state,
+            'ready': self.is_ready,
+            'modelPath': active.model_path if active else self.model_path,
+            'modelVersion': active.version if active else None,
+            'inferenceBackend': active.model.name if active else self.backend,
+            'loadSeconds': active.load_seconds if active else None,
+            'error': self._error,
+            'previous': previous.to_dict() if previous else None,
+            'shadow': shadow.to_dict() if shadow else None,
+            'swap': dict(self._swap) if self._swap else None
+        }
+
+
+model_loader = ModelLoader(MODEL_PATH, backend=INFERENCE_BACKEND, int8=INFERENCE_INT8, int8_data=INFERENCE_INT8_DATA)
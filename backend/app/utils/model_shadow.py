@@ -0,0 +1,107 @@
+"""
+Shadow runs of a candidate model on sampled live frames.
+
+The serving path hands over a batch it has just answered; a single background
+thread replays it on the shadow model and records latency and agreement
+(matched boxes, frame status) against the live output. Sampling is random and
+the hand-over never waits: if the shadow is still busy, the batch is skipped.
+"""
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from app.utils.detections import summarize_detections
+from app.utils.inference_backends import match_rate, latency_summary
+
+
+class ShadowRunner:
+    """
+    Args:
+        sample_rate (float): Share of live batches replayed on the shadow (0..1)
+        window (int): Recent comparisons kept for the stats
+        iou_threshold (float): IoU for a box to count as matched
+    """
+
+    def __init__(self, sample_rate=0.1, window=500, iou_threshold=0.5):
+        self.sample_rate = sample_rate
+        self.iou_threshold = iou_threshold
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._window = window
+        self.reset()
+
+    def reset(self, version=None):
+        """Forget collected comparisons"""
+        with self._lock:
+            self.version = version
+            self._live_seconds = deque(maxlen=self._window)
+            self._shadow_seconds = deque(maxlen=self._window)
+            self._box_agreement = deque(maxlen=self._window)
+            self._status_agreement = deque(maxlen=self._window)
+            self.frames = 0
+            self.skipped = 0
+            self.errors = 0
+
+    def _ensure_worker(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='model-shadow', daemon=True)
+        self._thread.start()
+
+    def offer(self, shadow, frames, live_results, live_seconds):
+        """Maybe queue a served batch for the shadow; never blocks the caller"""
+        if random.random() >= self.sample_rate:
+            return
+        self._ensure_worker()
+        # Decoded frames can be views into a reused decode buffer that the
+        # next request overwrites; the shadow runs later, so it gets copies
+        frames = [np.array(frame) for frame in frames]
+        try:
+            self._queue.put_nowait((shadow, frames, live_results, live_seconds))
+        except queue.Full:
+            self.skipped += 1
+
+    def _run(self):
+        while True:
+            shadow, frames, live_results, live_seconds = self._queue.get()
+            try:
+                started = time.perf_counter()
+                shadow_results = shadow.model.predict(frames)
+                shadow_seconds = time.perf_counter() - started
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️  Shadow model {shadow.version} failed: {e}")
+                continue
+
+            if shadow.version != self.version:
+                self.reset(shadow.version)  # a new shadow starts a fresh comparison
+            with self._lock:
+                # Per-frame latency of the batch, comparable across batch sizes
+                self._live_seconds.append(live_seconds / len(frames))
+                self._shadow_seconds.append(shadow_seconds / len(frames))
+                for live, candidate in zip(live_results, shadow_results):
+                    self._box_agreement.append(match_rate(live, candidate, self.iou_threshold))
+                    self._status_agreement.append(
+                        summarize_detections(live)['status'] == summarize_detections(candidate)['status']
+                    )
+                self.frames += len(frames)
+
+    def stats(self):
+        with self._lock:
+            compared = bool(self._live_seconds)
+            return {
+                'version': self.version,
+                'sampleRate': self.sample_rate,
+                'frames': self.frames,
+                'skipped': self.skipped,
+                'errors': self.errors,
+                'live': latency_summary(self._live_seconds) if compared else None,
+                'shadow': latency_summary(self._shadow_seconds) if compared else None,
+                'boxAgreement': round(float(np.mean(self._box_agreement)), 4) if self._box_agreement else None,
+                'statusAgreement': round(float(np.mean(self._status_agreement)), 4) if self._status_agreement else None
+            }
@@ -0,0 +1,530 @@
+"""
+Time-range partitioning and retention for the append-only tables.
+
+machine_logs, machines_data, sorting_results_history and performance_logs
+are PostgreSQL RANGE-partitioned on their time column, one partition per
+month (per day for machines_data), named <table>_p<YYYYMM> / <table>_p<YYYYMMDD>,
+plus a <table>_default partition so an insert never fails. Queries that
+filter on the time column with plain comparisons only scan the partitions in
+range; pruning is done by the planner.
+
+Maintenance (partition_maintenance.py, or the scheduled job in run.py):
+
+- creates the next `premake` partitions ahead of time, and partitions for any
+  rows that ended up in the default partition (moving them over);
+- retires partitions that ended more than `retention_days` ago: optionally
+  exports them to <archive_dir>/<table>/<partition>.parquet (or .csv.gz),
+  then detaches, or detaches and drops, them.
+
+`convert_to_partitioned` turns an existing plain table into this layout (the
+migration runs it); it copies whatever columns, indexes, foreign keys and
+triggers the live table has, so it does not depend on the model definitions.
+Only PostgreSQL is supported; other databases are left alone.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import text
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+INTERVAL_MONTH = 'month'
+INTERVAL_DAY = 'day'
+
+ACTION_DETACH = 'detach'
+ACTION_DROP = 'drop'
+ACTIONS = (ACTION_DETACH, ACTION_DROP)
+
+FORMAT_PARQUET = 'parquet'
+FORMAT_CSV = 'csv'
+FORMATS = (FORMAT_PARQUET, FORMAT_CSV)
+
+# Serialises maintenance runs across processes (pg advisory lock key)
+MAINTENANCE_LOCK_KEY = 7140251
+
+EXPORT_CHUNK_ROWS = 50000
+
+
+class PartitionedTable:
+    """
+    Args:
+        name (str): Table name
+        key (str): Naive timestamp column partitioned on
+        interval (str): INTERVAL_MONTH or INTERVAL_DAY
+        timezone (str): Zone the key's naive values are in (decides "now")
+    """
+
+    def __init__(self, name, key, interval=INTERVAL_MONTH, timezone='UTC'):
+        self.name = name
+        self.key = key
+        self.interval = interval
+        self.timezone = timezone
+
+    @property
+    def default_partition(self):
+        return f'{self.name}_default'
+
+    def now(self):
+        return datetime.now(pytz.timezone(self.timezone)).replace(tzinfo=None)
+
+
+PARTITIONED_TABLES = {
+    'machine_logs': PartitionedTable('machine_logs', 'created_at', timezone='Asia/Jakarta'),
+    'machines_data': PartitionedTable('machines_data', 'created_at', interval=INTERVAL_DAY),
+    'sorting_results_history': PartitionedTable('sorting_results_history', 'created_at'),
+    'performance_logs': PartitionedTable('performance_logs', 'timestamp'),
+}
+
+
+# ---------- periods and names ----------
+
+def period_start(value, interval):
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(day=1) if interval == INTERVAL_MONTH else value
+
+
+def next_period(start, interval):
+    if interval == INTERVAL_DAY:
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(table, start, interval):
+    return f"{table}_p{start:%Y%m}" if interval == INTERVAL_MONTH else f"{table}_p{start:%Y%m%d}"
+
+
+def partition_range(table, name):
+    """(start, end) of a partition from its name, None for anything else"""
+    match = re.fullmatch(re.escape(table) + r'_p(\d{6}|\d{8})', name)
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 6:
+        start = datetime.strptime(digits, '%Y%m')
+        return start, next_period(start, INTERVAL_MONTH)
+    start = datetime.strptime(digits, '%Y%m%d')
+    return start, next_period(start, INTERVAL_DAY)
+
+
+def _q(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _literal(value):
+    # DDL partition bounds cannot be bind parameters; values come from datetimes only
+    return f"'{value:%Y-%m-%d %H:%M:%S}'"
+
+
+# ---------- catalog ----------
+
+def relation_kind(connection, name):
+    """pg_class.relkind of a table in the current schema ('r' plain, 'p' partitioned), or None"""
+    return connection.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = :name AND n.nspname = current_schema()"
+    ), {'name': name}).scalar()
+
+
+def list_partitions(connection, table):
+    """{partition_name: (start, end)} of the dated partitions attached to `table`"""
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "JOIN pg_namespace n ON n.oid = p.relnamespace "
+        "WHERE p.relname = :table AND n.nspname = current_schema()"
+    ), {'table': table}).scalars()
+    partitions = {}
+    for name in names:
+        bounds = partition_range(table, name)
+        if bounds:
+            partitions[name] = bounds
+    return partitions
+
+
+# ---------- creating partitions ----------
+
+def create_partition(connection, spec, start):
+    """
+    Attach the partition for the period starting at `start` (no-op if it
+    exists). Rows of that period sitting in the default partition are moved
+    into it first, otherwise PostgreSQL refuses the new bounds.
+    """
+    name = partition_name(spec.name, start, spec.interval)
+    if relation_kind(connection, name):
+        return None
+    end = next_period(start, spec.interval)
+
+    connection.execute(text(
+        f"CREATE TABLE {name} (LIKE {spec.name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    if relation_kind(connection, spec.default_partition):
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM {spec.default_partition} "
+            f"WHERE {_q(spec.key)} >= {_literal(start)} AND {_q(spec.key)} < {_literal(end)} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ))
+    # Indexes and the primary key are created on the partition by ATTACH
+    connection.execute(text(
+        f"ALTER TABLE {spec.name} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+    ))
+    return name
+
+
+def stray_periods(connection, spec):
+    """Periods that have rows in the default partition"""
+    if not relation_kind(connection, spec.default_partition):
+        return []
+    rows = connection.execute(text(
+        f"SELECT DISTINCT date_trunc('{spec.interval}', {_q(spec.key)}) FROM {spec.default_partition} "
+        f"WHERE {_q(spec.key)} IS NOT NULL"
+    )).scalars()
+    return sorted(rows)
+
+
+def missing_periods(connection, spec, now, premake):
+    """Starts of the periods that need a partition: now .. now + premake, and strays"""
+    periods = set(stray_periods(connection, spec))
+    start = period_start(now, spec.interval)
+    for _ in range(premake + 1):
+        periods.add(start)
+        start = next_period(start, spec.interval)
+    existing = {bounds[0] for bounds in list_partitions(connection, spec.name).values()}
+    return sorted(periods - existing)
+
+
+def ensure_partitions(connection, spec, now, premake):
+    return [name for name in (create_partition(connection, spec, start)
+                              for start in missing_periods(connection, spec, now, premake)) if name]
+
+
+# ---------- retention ----------
+
+def expired_partitions(connection, spec, now, retention_days):
+    """Partitions whose whole range is older than `retention_days`, oldest first"""
+    if not retention_days:
+        return []
+    cutoff = now - timedelta(days=retention_days)
+    partitions = list_partitions(connection, spec.name)
+    return sorted((name for name, (_, end) in partitions.items() if end <= cutoff),
+                  key=lambda name: partitions[name][0])
+
+
+def _arrow_type(type_code):
+    # psycopg2 cursor.description type OIDs -> Arrow; anything else is kept as text
+    return {
+        16: pa.bool_(),
+        20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+        700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp('us'),
+        1184: pa.timestamp('us', tz='UTC'),
+    }.get(type_code, pa.string())
+
+
+def _arrow_value(value, arrow_type):
+    if value is None:
+        return None
+    if pa.types.is_floating(arrow_type):
+        return float(value)  # numeric arrives as Decimal
+    if pa.types.is_string(arrow_type) and not isinstance(value, str):
+        return json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+    return value
+
+
+def _export_parquet(dbapi_connection, name, path):
+    cursor = dbapi_connection.cursor(name=f'export_{name}')
+    cursor.itersize = EXPORT_CHUNK_ROWS
+    try:
+        cursor.execute(f"SELECT * FROM {name}")
+        writer = None
+        rows = 0
+        while True:
+            chunk = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if writer is None:
+                schema = pa.schema([(column.name, _arrow_type(column.type_code)) for column in cursor.description])
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            if not chunk:
+                break
+            columns = {
+                field.name: [_arrow_value(row[i], field.type) for row in chunk]
+                for i, field in enumerate(schema)
+            }
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            rows += len(chunk)
+        writer.close()
+        return rows
+    finally:
+        cursor.close()
+
+
+def _export_csv(dbapi_connection, name, path):
+    cursor = dbapi_connection.cursor()
+    try:
+        with gzip.open(path, 'wb') as f:
+            cursor.copy_expert(f"COPY (SELECT * FROM {name}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        cursor.execute(f"SELECT count(*) FROM {name}")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def export_partition(connection, spec, name, archive_dir, fmt=FORMAT_PARQUET):
+    """
+    Write a partition to <archive_dir>/<table>/<name>.parquet (zstd) or
+    .csv.gz. The file only appears once complete. Returns (path, rows).
+    """
+    if fmt == FORMAT_PARQUET and pa is None:
+        print("⚠️  pyarrow is not installed, archiving as CSV instead")
+        fmt = FORMAT_CSV
+    directory = os.path.join(archive_dir, spec.name)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.parquet" if fmt == FORMAT_PARQUET else f"{name}.csv.gz")
+
+    dbapi_connection = connection.connection.dbapi_connection
+    export = _export_parquet if fmt == FORMAT_PARQUET else _export_csv
+    rows = export(dbapi_connection, name, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return path, rows
+
+
+def retire_partition(connection, spec, name, action=ACTION_DETACH):
+    """Take a partition out of the table; with ACTION_DROP it is deleted as well"""
+    connection.execute(text(f"ALTER TABLE {spec.name} DETACH PARTITION {name}"))
+    if action == ACTION_DROP:
+        connection.execute(text(f"DROP TABLE {name}"))
+
+
+# ---------- converting an existing table ----------
+
+def _table_definition(connection, table):
+    """Primary key, indexes, foreign keys, triggers and owned sequences of a table"""
+    oid = connection.execute(text("SELECT CAST(:table AS regclass)::oid"), {'table': table}).scalar()
+    primary_key = connection.execute(text(
+        "SELECT c.conname, array_agg(a.attname ORDER BY k.ord) "
+        "FROM pg_constraint c "
+        "CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord) "
+        "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum "
+        "WHERE c.conrelid = :oid AND c.contype = 'p' GROUP BY c.conname"
+    ), {'oid': oid}).first()
+    return {
+        'primary_key': (primary_key[0], list(primary_key[1])) if primary_key else None,
+        'indexes': connection.execute(text(
+            "SELECT i.relname, pg_get_indexdef(x.indexrelid), x.indisunique "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = :oid AND NOT x.indisprimary"
+        ), {'oid': oid}).all(),
+        'foreign_keys': connection.execute(text(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = :oid AND contype = 'f'"
+        ), {'oid': oid}).all(),
+        'referenced_by': connection.execute(text(
+            "SELECT conname, conrelid::regclass::text FROM pg_constraint "
+            "WHERE confrelid = :oid AND contype = 'f'"
+        ), {'oid': oid}).all(),
+        'triggers': connection.execute(text(
+            "SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = :oid AND NOT tgisinternal"
+        ), {'oid': oid}).all(),
+        'sequences': connection.execute(text(
+            "SELECT s.relname, a.attname FROM pg_depend d "
+            "JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S' "
+            "JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid "
+            "WHERE d.refobjid = :oid AND d.deptype IN ('a', 'i')"
+        ), {'oid': oid}).all(),
+    }
+
+
+def _retarget(definition, table):
+    """
+    A captured CREATE INDEX / CREATE TRIGGER, aimed at whatever table is now
+    called `table` (no schema, no ONLY: partitioned indexes recurse again)
+    """
+    return re.sub(r' ON (ONLY )?(\S+\.)?' + re.escape(table) + r'\b', f' ON {table}', definition, count=1)
+
+
+def _recreate_dependents(connection, definition, table, key=None):
+    """Indexes, foreign keys, triggers and sequence ownership captured by _table_definition"""
+    for sequence, column in definition['sequences']:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{_q(column)}"))
+    for name, constraint in definition['foreign_keys']:
+        connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {_q(name)} {constraint}"))
+    for name, index, unique in definition['indexes']:
+        if unique and key and not re.search(r'\b' + re.escape(key) + r'\b', index.split(' USING ', 1)[-1]):
+            # A unique index on a partitioned table must contain the partition key
+            print(f"⚠️  Skipping unique index {name} on {table}: it does not include {key}")
+            continue
+        connection.execute(text(_retarget(index, table)))
+    for name, trigger in definition['triggers']:
+        connection.execute(text(_retarget(trigger, table)))
+
+
+def convert_to_partitioned(connection, spec, premake=3):
+    """
+    Rebuild a plain table as a partitioned one with the same rows, in the
+    caller's transaction. The table is locked for the duration of the copy.
+    Returns False when there is nothing to do (already partitioned, missing).
+    """
+    kind = relation_kind(connection, spec.name)
+    if kind != 'r':
+        return False
+    old = f'{spec.name}_unpartitioned'
+    definition = _table_definition(connection, spec.name)
+    if definition['referenced_by']:
+        raise RuntimeError(f"{spec.name} is referenced by foreign keys {definition['referenced_by']}; "
+                           f"partitioned tables cannot be referenced without the partition key")
+
+    connection.execute(text(f"LOCK TABLE {spec.name} IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(text(f"ALTER TABLE {spec.name} RENAME TO {old}"))
+    # Names have to be free for the new table
+    for name, _, _ in definition['indexes']:
+        connection.execute(text(f"DROP INDEX {_q(name)}"))
+    for name, _ in definition['foreign_keys']:
+        connection.execute(text(f"ALTER TABLE {old} DROP CONSTRAINT {_q(name)}"))
+    for name, _ in definition['triggers']:
+        connection.execute(text(f"DROP TRIGGER {_q(name)} ON {old}"))
+    if definition['primary_key']:
+        connection.execute(text(f"ALTER TABLE {old} RENAME CONSTRAINT {_q(definition['primary_key'][0])} TO {old}_pkey"))
+
+    # The partition key becomes part of the primary key, so it cannot stay NULL
+    connection.execute(text(
+        f"UPDATE {old} SET {_q(spec.key)} = now() AT TIME ZONE '{spec.timezone}' WHERE {_q(spec.key)} IS NULL"
+    ))
+
+    connection.execute(text(
+        f"CREATE TABLE {spec.name} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS) "
+        f"PARTITION BY RANGE ({_q(spec.key)})"
+    ))
+    if definition['primary_key']:
+        columns = definition['primary_key'][1]
+        columns = columns + [spec.key] if spec.key not in columns else columns
+        connection.execute(text(
+            f"ALTER TABLE {spec.name} ADD CONSTRAINT {spec.name}_pkey PRIMARY KEY ({', '.join(map(_q, columns))})"
+        ))
+    _recreate_dependents(connection, definition, spec.name, key=spec.key)
+    connection.execute(text(f"CREATE TABLE {spec.default_partition} PARTITION OF {spec.name} DEFAULT"))
+
+    oldest = connection.execute(text(f"SELECT min({_q(spec.key)}) FROM {old}")).scalar()
+    start = period_start(min(oldest or spec.now(), spec.now()), spec.interval)
+    last = period_start(spec.now(), spec.interval)
+    for _ in range(premake):
+        last = next_period(last, spec.interval)
+    while start <= last:
+        create_partition(connection, spec, start)
+        start = next_period(start, spec.interval)
+
+    moved = connection.execute(text(f"INSERT INTO {spec.name} SELECT * FROM {old}")).rowcount
+    connection.execute(text(f"DROP TABLE {old}"))
+    connection.execute(text(f"ANALYZE {spec.name}"))
+    print(f"✅ {spec.name} partitioned by {spec.interval} on {spec.key} ({moved} rows moved)")
+    return True
+
+
+def convert_to_plain(connection, spec):
+    """Undo `convert_to_partitioned`: one plain table with every attached partition's rows"""
+    if relation_kind(connection, spec.name) != 'p':
+        return False
+    old = f'{spec.name}_partitioned'
+    definition = _table_definition(connection, spec.name)
+
+    connection.execute(text(f"ALTER TABLE {spec.name} RENAME TO {old}"))
+    connection.execute(text(
+        f"CREATE TABLE {spec.name} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS)"
+    ))
+    connection.execute(text(f"INSERT INTO {spec.name} SELECT * FROM {old}"))
+    for sequence, column in definition['sequences']:
+        # Before the DROP below, or the sequence would go with it
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {spec.name}.{column}"))
+    connection.execute(text(f"DROP TABLE {old} CASCADE"))
+
+    if definition['primary_key']:
+        columns = [c for c in definition['primary_key'][1] if c != spec.key] or [spec.key]
+        connection.execute(text(
+            f"ALTER TABLE {spec.name} ADD CONSTRAINT {spec.name}_pkey PRIMARY KEY ({', '.join(map(_q, columns))})"
+        ))
+    _recreate_dependents(connection, dict(definition, sequences=[]), spec.name)
+    return True
+
+
+# ---------- maintenance run ----------
+
+def run_maintenance(engine, tables=None, premake=3, retention_days=None, action=ACTION_DETACH,
+                    archive_dir=None, archive_format=FORMAT_PARQUET, dry_run=False):
+    """
+    Create upcoming partitions and retire expired ones for `tables` (default:
+    all in PARTITIONED_TABLES). `retention_days` maps table -> days (0/None
+    keeps everything). Returns a report per table. Every table is handled in
+    its own transactions; partitions are only dropped after their export.
+    """
+    retention_days = retention_days or {}
+    report = {}
+    if engine.dialect.name != 'postgresql':
+        print("⚠️  Partition maintenance needs PostgreSQL; nothing to do")
+        return report
+
+    with engine.connect() as lock_connection:
+        locked = lock_connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': MAINTENANCE_LOCK_KEY}).scalar()
+        lock_connection.commit()  # session-level lock; don't sit idle in a transaction
+        if not locked:
+            print("⏳ Partition maintenance is already running elsewhere")
+            return report
+        try:
+            for name in tables or PARTITIONED_TABLES:
+                spec = PARTITIONED_TABLES[name]
+                report[name] = _maintain_table(engine, spec, premake, retention_days.get(name),
+                                               action, archive_dir, archive_format, dry_run)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': MAINTENANCE_LOCK_KEY})
+            lock_connection.commit()
+    return report
+
+
+def _maintain_table(engine, spec, premake, retention_days, action, archive_dir, archive_format, dry_run):
+    now = spec.now()
+    with engine.begin() as connection:
+        if relation_kind(connection, spec.name) != 'p':
+            return {'partitioned': False, 'message': 'not partitioned (run flask db upgrade)'}
+        if dry_run:
+            periods = missing_periods(connection, spec, now, premake)
+            created = [partition_name(spec.name, start, spec.interval) for start in periods]
+        else:
+            created = ensure_partitions(connection, spec, now, premake)
+        expired = expired_partitions(connection, spec, now, retention_days)
+
+    result = {'partitioned': True, 'created': created, 'retired': [], 'archived': []}
+    if dry_run:
+        return dict(result, retired=expired, dryRun=True)
+
+    for name in expired:
+        try:
+            if archive_dir:
+                with engine.begin() as connection:
+                    path, rows = export_partition(connection, spec, name, archive_dir, archive_format)
+                result['archived'].append({'partition': name, 'path': path, 'rows': rows})
+            with engine.begin() as connection:
+                retire_partition(connection, spec, name, action)
+            result['retired'].append(name)
+        except Exception as e:
+            # Keep the partition; the next run tries again
+            print(f"❌ Retiring {name} failed: {e}")
+            result.setdefault('errors', []).append({'partition': name, 'message': str(e)})
+            break
+    return result
+
+
+def maintenance_options(config):
+    """run_maintenance keyword arguments from the app config (PARTITION_*)"""
+    return {
+        'premake': config.get('PARTITION_PREMAKE', 3),
+        'retention_days': {name: config.get(f'PARTITION_RETENTION_{name.upper()}', 0) for name in PARTITIONED_TABLES},
+        'action': config.get('PARTITION_RETENTION_ACTION', ACTION_DETACH),
+        'archive_dir': config.get('PARTITION_ARCHIVE_DIR'),
+        'archive_format': config.get('PARTITION_ARCHIVE_FORMAT', FORMAT_PARQUET),
+    }
@@ -0,0 +1,115 @@
+"""
+Bulk ingestion of machine telemetry (machines_data).
+
+Readings arrive in arrays from many machines at once and are written in one
+statement: COPY on PostgreSQL, a multi-row INSERT elsewhere. Keys are made
+here (time-ordered, random suffix), so no insert has to look up the last id.
+"""
+import csv
+import io
+import math
+import os
+import time
+from datetime import datetime, timezone
+
+# API field -> (column, type)
+READING_FIELDS = {
+    'temperature': ('temperature', float),
+    'processedToday': ('processed_today', int),
+    'remainingBatch': ('remaining_batch', int),
+    'efficiency': ('efficiency', float),
+    'errorRate': ('error_rate', float)
+}
+
+# Integer columns are 32-bit
+MAX_INTEGER = 2 ** 31 - 1
+
+COLUMNS = ['id', 'machine_id', 'created_at'] + [column for column, _ in READING_FIELDS.values()]
+
+
+def new_reading_id():
+    """'MD_' + 12 hex digits of ms time + 8 random: sortable, collision-free without a read"""
+    return f"MD_{int(time.time() * 1000):012x}{os.urandom(4).hex()}"
+
+
+def _timestamp(value):
+    """Naive UTC datetime (machines_data.created_at is UTC) from ISO or epoch seconds"""
+    if value is None or value == '':
+        return datetime.utcnow()
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _number(field, value, cast):
+    """One reading value as `cast`; missing is 0, nan/inf and fractional counts are rejected"""
+    if value is None:
+        return cast(0)
+    if isinstance(value, bool):
+        raise ValueError(f'{field} must be a number')
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'{field} must be a finite number')
+    if cast is int:
+        if not number.is_integer():
+            raise ValueError(f'{field} must be a whole number')
+        if abs(number) > MAX_INTEGER:
+            raise ValueError(f'{field} is out of range')
+        return int(number)
+    return number
+
+
+def parse_readings(readings, known_machines):
+    """
+    Validate API readings into insert rows. Returns (rows, errors); errors
+    are {'index', 'message'} for readings that were skipped.
+    """
+    rows, errors = [], []
+    for index, reading in enumerate(readings):
+        try:
+            if not isinstance(reading, dict):
+                raise ValueError('reading must be an object')
+            machine_id = reading.get('machineId')
+            if machine_id not in known_machines:
+                raise ValueError(f'unknown machine {machine_id}')
+            row = {
+                'id': new_reading_id(),
+                'machine_id': machine_id,
+                'created_at': _timestamp(reading.get('timestamp'))
+            }
+            for field, (column, cast) in READING_FIELDS.items():
+                row[column] = _number(field, reading.get(field), cast)
+            rows.append(row)
+        except (TypeError, ValueError, OverflowError) as e:
+            errors.append({'index': index, 'message': str(e)})
+    return rows, errors
+
+
+def _copy_rows(connection, table, rows):
+    """COPY rows into `table` over the session's own psycopg2 connection"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[c] for c in COLUMNS])
+    buffer.seek(0)
+
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def insert_readings(session, table, rows):
+    """Write parsed rows in one statement, inside the session's transaction"""
+    if not rows:
+        return 0
+    connection = session.connection()
+    if connection.dialect.name == 'postgresql':
+        _copy_rows(connection, table.name, rows)
+    else:
+        connection.execute(table.insert(), rows)
+    return len(rows)
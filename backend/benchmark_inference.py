@@ -0,0 +1,148 @@
+"""
+Benchmark the frame analysis path.
+
+Usage:
+    python benchmark_inference.py --images test_image --output bench/torch.json
+    python benchmark_inference.py --images samples/ --concurrency 1 4 16 \\
+        --compare bench/torch.json --output bench/onnx.json
+    python benchmark_inference.py --http http://localhost:5010 --token <jwt> \\
+        --server-pid <pid of run.py>
+
+In-process mode (default) runs decode -> batching engine -> post-process
+exactly like /api/machine/analyze, with the current .env config
+(INFERENCE_BACKEND, batch size, ...). HTTP mode POSTs frames to a running
+server. Both report p50/p95/p99 latency and frames/sec per concurrency level
+plus peak RSS, and write everything as JSON for diffing between runs.
+"""
+import argparse
+import json
+import os
+import threading
+
+from app.utils.benchmark import load_frames, run_load, run_meta, peak_rss_mb, compare_reports, ShedError, RejectedFrame
+
+
+def in_process_call():
+    from app import create_app
+    from app.routes.machine import analyze_frame_bytes, get_inference_engine
+    from app.utils.model_loader import model_loader
+
+    app = create_app()
+    # Every frame must reach the model, not the unchanged-frame cache or the quality gate
+    app.config['FRAME_CACHE_ENABLED'] = False
+    app.config['QUALITY_GATE_ENABLED'] = False
+
+    print("🔄 Loading model...")
+    if not app.config.get('INFERENCE_POOL_ADDRESS') and not model_loader.wait(timeout=600):
+        raise SystemExit(f"❌ Model failed to load: {model_loader.status()['error']}")
+
+    def call(frame_bytes):
+        with app.app_context():
+            data = analyze_frame_bytes(frame_bytes)
+        if data.get('status') == 'rejected':
+            raise RejectedFrame(data['quality']['reason'])
+        return data
+
+    def config():
+        with app.app_context():
+            engine = get_inference_engine()
+            return {
+                'inferenceBackend': model_loader.status().get('inferenceBackend'),
+                'modelPath': model_loader.status().get('modelPath'),
+                'poolAddress': app.config.get('INFERENCE_POOL_ADDRESS'),
+                'maxBatchSize': engine.max_batch_size,
+                'maxWaitMs': engine.max_wait * 1000.0,
+                'imgsz': app.config.get('INFERENCE_IMGSZ')
+            }
+
+    return call, config
+
+
+def http_call(base_url, token, machine_id=None):
+    import requests
+
+    url = base_url.rstrip('/') + '/api/machine/analyze'
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    sessions = {}
+
+    def call(frame_bytes):
+        session = sessions.setdefault(threading.get_ident(), requests.Session())
+        data = {'machineId': machine_id} if machine_id else {}
+        response = session.post(url, headers=headers, data=data,
+                                files={'image': ('frame.jpg', frame_bytes, 'image/jpeg')}, timeout=60)
+        if response.status_code in (429, 503):
+            raise ShedError(response.status_code)
+        response.raise_for_status()
+        result = response.json()
+        # The server's quality gate can't be switched off from here; keep its
+        # rejections out of the latency numbers
+        if (result.get('data') or {}).get('status') == 'rejected':
+            raise RejectedFrame(result['data']['quality']['reason'])
+        return result
+
+    return call, lambda: {'url': url}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark frame analysis latency/throughput')
+    parser.add_argument('--images', default='test_image', help='Image file or directory of sample frames')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--frames', type=int, default=None,
+                        help='Frames per concurrency level (default: all images x concurrency)')
+    parser.add_argument('--http', metavar='BASE_URL', help='Benchmark a running server instead')
+    parser.add_argument('--token', default=os.environ.get('BENCH_TOKEN'), help='JWT for --http')
+    parser.add_argument('--machine-id', help='machineId sent with each frame (HTTP mode)')
+    parser.add_argument('--server-pid', type=int, help='Report peak RSS of this server process')
+    parser.add_argument('--output', help='Write JSON results here')
+    parser.add_argument('--compare', help='Previous JSON results to diff against')
+    args = parser.parse_args()
+
+    frames = load_frames(args.images)
+    if not frames:
+        raise SystemExit(f'❌ No images found in {args.images}')
+
+    if args.http:
+        call, config = http_call(args.http, args.token, args.machine_id)
+        mode = 'http'
+    else:
+        call, config = in_process_call()
+        mode = 'in-process'
+
+    print(f"⏱️  {mode} benchmark: {len(frames)} sample frames, concurrency {args.concurrency}")
+    results = []
+    for concurrency in args.concurrency:
+        result = run_load(call, frames, concurrency, total=args.frames)
+        results.append(result)
+        latency = result['latencyMs'] or {}
+        print(f"  c={concurrency:<3} {result['fps']:>8.2f} fps  "
+              f"p50 {latency.get('p50', '-')} ms  p95 {latency.get('p95', '-')} ms  "
+              f"p99 {latency.get('p99', '-')} ms  errors {result['errors']}  shed {result['shed']}  "
+              f"rejected {result['rejected']}")
+
+    report = {
+        'meta': {**run_meta(), 'mode': mode, 'images': args.images, 'sampleFrames': len(frames)},
+        'config': config(),
+        'results': results,
+        'peakRssMb': {
+            'benchmark': peak_rss_mb(),
+            'server': peak_rss_mb(args.server_pid) if args.server_pid else None
+        }
+    }
+    print(f"💾 Peak RSS: {report['peakRssMb']}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        report['comparedTo'] = {'file': args.compare, 'meta': previous.get('meta')}
+        report['delta'] = compare_reports(previous, report)
+        for row in report['delta']:
+            print(f"  Δ c={row['concurrency']:<3} fps {row['fps'][0]} -> {row['fps'][1]} ({row['fps'][2]:+}%)  "
+                  f"p95 {row['p95Ms'][0]} -> {row['p95Ms'][1]} ms ({row['p95Ms'][2]:+}%)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
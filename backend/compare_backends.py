@@ -0,0 +1,50 @@
+"""
+Compare an inference backend against the PyTorch baseline.
+
+Usage:
+    python compare_backends.py --images test_image --backend onnx
+    python compare_backends.py --images samples/ --backend openvino --int8 --data beans.yaml
+
+Reports mean/p50/p95 latency per backend, speed-up, and how often the
+candidate agrees with torch (matched boxes at IoU >= 0.5, same dominant status).
+"""
+import argparse
+import json
+import os
+
+from PIL import Image
+
+from app.utils.model_loader import MODEL_PATH, INFERENCE_INT8_DATA
+from app.utils.inference_backends import BACKENDS, create_backend, compare_backends
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_images(path):
+    files = [path] if os.path.isfile(path) else sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return [Image.open(f).convert('RGB') for f in files]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare YOLO inference backends')
+    parser.add_argument('--images', default='test_image', help='Image file or directory')
+    parser.add_argument('--backend', default='onnx', choices=[b for b in BACKENDS if b != 'torch'])
+    parser.add_argument('--int8', action='store_true', help='Use the INT8-quantized export')
+    parser.add_argument('--data', default=INFERENCE_INT8_DATA,
+                        help='Dataset YAML calibrating the OpenVINO INT8 export (default: INFERENCE_INT8_DATA)')
+    parser.add_argument('--model', default=MODEL_PATH, help='Path to best.pt')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU for box agreement')
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        raise SystemExit(f'❌ No images found in {args.images}')
+
+    print(f"🔄 Comparing torch vs {args.backend}{' (int8)' if args.int8 else ''} on {len(images)} images")
+    baseline = create_backend('torch', args.model)
+    candidate = create_backend(args.backend, args.model, int8=args.int8, data=args.data)
+    report = compare_backends(baseline, candidate, images, iou_threshold=args.iou)
+    print(json.dumps(report, indent=2))
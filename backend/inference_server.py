@@ -0,0 +1,26 @@
+"""
+Run the shared YOLO inference worker pool.
+
+Web workers connect to it when INFERENCE_POOL_ADDRESS is set, so only the
+processes started here hold torch and the model in memory.
+"""
+import os
+from dotenv import load_dotenv
+
+from app.utils.inference_pool import InferencePool, DEFAULT_AUTHKEY
+from app.utils.model_loader import MODEL_PATH, INFERENCE_BACKEND, INFERENCE_INT8, INFERENCE_INT8_DATA
+
+load_dotenv()
+
+if __name__ == '__main__':
+    pool = InferencePool(
+        address=os.environ.get('INFERENCE_POOL_ADDRESS') or '127.0.0.1:6011',
+        model_path=MODEL_PATH,
+        processes=int(os.environ.get('INFERENCE_POOL_PROCESSES', 2)),
+        torch_threads=int(os.environ.get('INFERENCE_TORCH_THREADS', 1)),
+        authkey=os.environ.get('INFERENCE_POOL_AUTHKEY') or DEFAULT_AUTHKEY,
+        backend=INFERENCE_BACKEND,
+        int8=INFERENCE_INT8,
+        int8_data=INFERENCE_INT8_DATA
+    )
+    pool.serve_forever()
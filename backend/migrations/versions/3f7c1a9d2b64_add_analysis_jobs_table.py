@@ -0,0 +1,47 @@
+"""Add analysis_jobs table
+
+Revision ID: 3f7c1a9d2b64
+Revises: 8988f94564b8
+Create Date: 2026-10-17 10:12:31.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7c1a9d2b64'
+down_revision = '8988f94564b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analysis_jobs',
+        sa.Column('id', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.String(length=50), nullable=True),
+        sa.Column('machine_id', sa.String(length=50), nullable=True),
+        sa.Column('batch_id', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('tiled', sa.Boolean(), nullable=False),
+        sa.Column('input_dir', sa.Text(), nullable=False),
+        sa.Column('total_images', sa.Integer(), nullable=False),
+        sa.Column('processed_images', sa.Integer(), nullable=False),
+        sa.Column('failed_images', sa.Integer(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_analysis_jobs_queue', ['status', 'priority', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_analysis_jobs_queue')
+
+    op.drop_table('analysis_jobs')
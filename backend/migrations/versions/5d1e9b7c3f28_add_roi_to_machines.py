@@ -0,0 +1,26 @@
+"""Add roi to machines
+
+Revision ID: 5d1e9b7c3f28
+Revises: b2e84f1c7a90
+Create Date: 2026-10-17 11:48:09.215637
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e9b7c3f28'
+down_revision = 'b2e84f1c7a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('machines', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('roi', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('machines', schema=None) as batch_op:
+        batch_op.drop_column('roi')
@@ -0,0 +1,46 @@
+"""Add indexes for the machine overview queries
+
+Revision ID: 7a4c2e8d1b53
+Revises: 5d1e9b7c3f28
+Create Date: 2026-10-17 13:05:41.508112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c2e8d1b53'
+down_revision = '5d1e9b7c3f28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('machines_data', schema=None) as batch_op:
+        batch_op.create_index('ix_machines_data_machine_created', ['machine_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('machine_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_machine_logs_machine_created', ['machine_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_machine_id', ['machine_id'], unique=False)
+
+    with op.batch_alter_table('sorting_batches', schema=None) as batch_op:
+        batch_op.create_index('ix_sorting_batches_pending', ['order_id'], unique=False,
+                              postgresql_where=sa.text("status = 'pending'"),
+                              sqlite_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    with op.batch_alter_table('sorting_batches', schema=None) as batch_op:
+        batch_op.drop_index('ix_sorting_batches_pending')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_machine_id')
+
+    with op.batch_alter_table('machine_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_machine_logs_machine_created')
+
+    with op.batch_alter_table('machines_data', schema=None) as batch_op:
+        batch_op.drop_index('ix_machines_data_machine_created')
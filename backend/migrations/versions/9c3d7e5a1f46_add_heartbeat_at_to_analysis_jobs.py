@@ -0,0 +1,26 @@
+"""Add heartbeat_at to analysis_jobs
+
+Revision ID: 9c3d7e5a1f46
+Revises: e5b9d3a7c214
+Create Date: 2026-10-17 18:21:07.415926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d7e5a1f46'
+down_revision = 'e5b9d3a7c214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('analysis_jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
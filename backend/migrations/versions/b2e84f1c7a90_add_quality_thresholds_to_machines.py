@@ -0,0 +1,26 @@
+"""Add quality_thresholds to machines
+
+Revision ID: b2e84f1c7a90
+Revises: 3f7c1a9d2b64
+Create Date: 2026-10-17 11:02:54.730114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e84f1c7a90'
+down_revision = '3f7c1a9d2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('machines', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quality_thresholds', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('machines', schema=None) as batch_op:
+        batch_op.drop_column('quality_thresholds')
@@ -0,0 +1,26 @@
+"""Add BRIN index on machines_data.created_at
+
+Revision ID: c41f6a2b9e07
+Revises: 7a4c2e8d1b53
+Create Date: 2026-10-17 14:22:10.734519
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f6a2b9e07'
+down_revision = '7a4c2e8d1b53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('machines_data', schema=None) as batch_op:
+        batch_op.create_index('ix_machines_data_created_brin', ['created_at'], unique=False,
+                              postgresql_using='brin')
+
+
+def downgrade():
+    with op.batch_alter_table('machines_data', schema=None) as batch_op:
+        batch_op.drop_index('ix_machines_data_created_brin')
@@ -0,0 +1,34 @@
+"""Partition machine_logs, machines_data, sorting_results_history and performance_logs by time
+
+Revision ID: e5b9d3a7c214
+Revises: c41f6a2b9e07
+Create Date: 2026-10-17 16:05:41.208337
+
+"""
+from alembic import op
+
+from app.utils.partitions import PARTITIONED_TABLES, convert_to_partitioned, convert_to_plain
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9d3a7c214'
+down_revision = 'c41f6a2b9e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rebuilds each table (rows are copied while it is locked); PostgreSQL only
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for spec in PARTITIONED_TABLES.values():
+        convert_to_partitioned(bind, spec)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for spec in PARTITIONED_TABLES.values():
+        convert_to_plain(bind, spec)
@@ -0,0 +1,50 @@
+"""
+Partition maintenance for the time-partitioned tables (see app/utils/partitions.py).
+
+Usage:
+    python partition_maintenance.py                      # premake + retention, settings from .env
+    python partition_maintenance.py --dry-run            # only show what would change
+    python partition_maintenance.py --table machines_data --retention-days 90 \
+        --archive-dir archives --format parquet --action drop
+
+Run it daily from cron / Task Scheduler, or set PARTITION_MAINTENANCE_HOURS
+to let run.py schedule it. Concurrent runs are serialised with an advisory
+lock, so several servers can schedule it safely.
+"""
+import argparse
+import json
+
+from app import create_app, db
+from app.utils.partitions import PARTITIONED_TABLES, ACTIONS, FORMATS, maintenance_options, run_maintenance
+
+app = create_app()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create upcoming partitions and retire expired ones')
+    parser.add_argument('--table', action='append', choices=list(PARTITIONED_TABLES),
+                        help='Only this table (repeatable; default: all)')
+    parser.add_argument('--premake', type=int, help='Partitions to create ahead (default: PARTITION_PREMAKE)')
+    parser.add_argument('--retention-days', type=int,
+                        help='Override PARTITION_RETENTION_<TABLE> for the selected tables (0 = keep)')
+    parser.add_argument('--action', choices=ACTIONS, help='detach or drop expired partitions')
+    parser.add_argument('--archive-dir', help='Export expired partitions here before retiring them')
+    parser.add_argument('--format', choices=FORMATS, help='Archive format (parquet needs pyarrow)')
+    parser.add_argument('--dry-run', action='store_true', help='Report only, change nothing')
+    args = parser.parse_args()
+
+    options = maintenance_options(app.config)
+    if args.premake is not None:
+        options['premake'] = args.premake
+    if args.retention_days is not None:
+        for table in args.table or PARTITIONED_TABLES:
+            options['retention_days'][table] = args.retention_days
+    if args.action:
+        options['action'] = args.action
+    if args.archive_dir:
+        options['archive_dir'] = args.archive_dir
+    if args.format:
+        options['archive_format'] = args.format
+
+    with app.app_context():
+        report = run_maintenance(db.engine, tables=args.table, dry_run=args.dry_run, **options)
+    print(json.dumps(report, indent=2))
@@ -2,13 +2,52 @@ from app import create_app
 from apscheduler.schedulers.background import BackgroundScheduler
 import psycopg2
 from psycopg2 import sql
+import signal
 import socket
 import random
+import sys
 from datetime import datetime
 
 
 app = create_app()
 
+# Load the YOLO model in the background so the API is up immediately;
+# /api/machine/analyze answers 503 until it's warm
+if not app.config.get('INFERENCE_POOL_ADDRESS'):
+    from app.utils.model_loader import model_loader
+    model_loader.start()
+
+# Pick up analysis jobs queued before a restart
+if app.config.get('ANALYSIS_JOBS_IN_WEB'):
+    from app.routes.analysis_jobs import get_job_workers
+    with app.app_context():
+        get_job_workers()
+
+# Partition premake/retention every PARTITION_MAINTENANCE_HOURS (0 = leave it to cron)
+maintenance_scheduler = None
+if app.config.get('PARTITION_MAINTENANCE_HOURS'):
+    from app import db
+    from app.utils.partitions import maintenance_options, run_maintenance
+
+    def maintain_partitions():
+        with app.app_context():
+            try:
+                print(f"🗂️  Partition maintenance: {run_maintenance(db.engine, **maintenance_options(app.config))}")
+            except Exception as e:
+                print(f"❌ Partition maintenance failed: {e}")
+
+    maintenance_scheduler = BackgroundScheduler()
+    maintenance_scheduler.add_job(
+        func=maintain_partitions,
+        trigger="interval",
+        hours=app.config['PARTITION_MAINTENANCE_HOURS'],
+        next_run_time=datetime.now(),
+        id='partition_maintenance',
+        name='Partition premake and retention',
+        replace_existing=True
+    )
+    maintenance_scheduler.start()
+
 DB_CONFIG = {
     'host': 'localhost',
     'database': 'pilahkopi_db',
@@ -134,7 +173,13 @@ if __name__ == '__main__':
     # scheduler = start_scheduler()
     scheduler = None
     
+    # SIGTERM (restart / deploy) exits like Ctrl+C: the finally below and the
+    # atexit hooks run, so buffered machine logs and detections are written
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
     # Disable reloader untuk stabilitas port
+    # One threaded process: /api/events, the log writer and the stream/counting
+    # sessions are in-process state, so don't put several workers behind this
     try:
         app.run(debug=True, host='0.0.0.0', port=port, use_reloader=False, use_debugger=True)
     except OSError as e:
@@ -149,3 +194,5 @@ if __name__ == '__main__':
         # Shutdown scheduler saat server stop
         if scheduler:
             scheduler.shutdown()
+        if maintenance_scheduler:
+            maintenance_scheduler.shutdown()
@@ -36,7 +36,7 @@ import SettingsPage from "./Settings";
 import MachineControl from "./MachineControl";
 import NewsManagement from "./NewsManagement";
 import logoImage from "figma:asset/4dd15d3bf546fd413c470482994e9b74ecf4af1b.png";
-import { authAPI, orderAPI, adminAPI, batchAPI } from "../services/api";
+import { authAPI, orderAPI, adminAPI, batchAPI, openEventStream } from "../services/api";
 import {
   LayoutDashboard,
   Database,
@@ -80,6 +80,18 @@ interface DashboardProps {
   onNavigateToLanding: () => void;
 }
 
+// Accuracy chart points requested from the server (downsampled there)
+const CHART_POINTS = 300;
+
+const formatPerformanceSeries = (
+  series: Array<{ timestamp: string; avg?: number; value?: number }>
+) =>
+  series.map((point) => ({
+    // Bucket timestamps are naive UTC
+    time: new Date(`${point.timestamp}Z`).toLocaleString('id-ID', { day: '2-digit', month: '2-digit', hour: '2-digit', minute: '2-digit' }),
+    accuracy: Math.round((point.avg ?? point.value ?? 0) * 10) / 10,
+  }));
+
 interface DashboardOrder {
   id: string;
   userName: string;
@@ -124,6 +136,7 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
   const [isLoading, setIsLoading] = useState(true);
   const [allOrders, setAllOrders] = useState<DashboardOrder[]>([]);
   const [performanceData, setPerformanceData] = useState<any[]>([]);
+  const [orderPerformanceData, setOrderPerformanceData] = useState<any[]>([]);
 
   // Batch Management State
   const [users, setUsers] = useState<any[]>([]);
@@ -232,7 +245,7 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
         setIsLoading(true);
         const [ordersRes, perfRes] = await Promise.all([
           orderAPI.getOrders(),
-          adminAPI.getPerformanceData()
+          adminAPI.getPerformanceChart({ points: CHART_POINTS })
         ]);
 
         if (ordersRes.success) {
@@ -277,12 +290,7 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
 
         if (perfRes.success) {
           // Format performance data for chart
-          const formattedPerf = perfRes.data.map(log => ({
-            time: new Date(log.timestamp).toLocaleString('id-ID', { day: '2-digit', month: '2-digit', hour: '2-digit', minute: '2-digit' }),
-            accuracy: log.accuracy,
-            orderId: log.orderId // Include orderId
-          }));
-          setPerformanceData(formattedPerf);
+          setPerformanceData(formatPerformanceSeries(perfRes.data.series));
         }
 
       } catch (error) {
@@ -295,6 +303,20 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
     fetchData();
   }, []);
 
+  // Accuracy history of the selected order (downsampled on the server)
+  useEffect(() => {
+    if (selectedOrderId === "all") return;
+    let cancelled = false;
+    adminAPI.getPerformanceChart({ orderId: selectedOrderId, points: CHART_POINTS })
+      .then((res) => {
+        if (!cancelled && res.success) setOrderPerformanceData(formatPerformanceSeries(res.data.series));
+      })
+      .catch((error) => console.error("Error fetching order performance:", error));
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedOrderId]);
+
   // Filter data based on selected order
   const getFilteredData = () => {
     if (selectedOrderId === "all") {
@@ -321,7 +343,7 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
       if (!background) setIsLoading(true);
       const [ordersRes, perfRes] = await Promise.all([
         orderAPI.getOrders(),
-        adminAPI.getPerformanceData()
+        adminAPI.getPerformanceChart({ points: CHART_POINTS })
       ]);
 
       if (ordersRes.success) {
@@ -362,12 +384,7 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
       }
 
       if (perfRes.success) {
-        const formattedPerf = perfRes.data.map(log => ({
-          time: new Date(log.timestamp).toLocaleString('id-ID', { day: '2-digit', month: '2-digit', hour: '2-digit', minute: '2-digit' }),
-          accuracy: log.accuracy,
-          orderId: log.orderId // Include orderId
-        }));
-        setPerformanceData(formattedPerf);
+        setPerformanceData(formatPerformanceSeries(perfRes.data.series));
       }
     } catch (error) {
       console.error("Error refreshing data:", error);
@@ -376,13 +393,28 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
     }
   };
 
-  // Real-time polling
+  // Real-time updates: refresh when a batch changes (pushed by the server),
+  // debounced so a burst of changes costs one refresh; slow polling stays
+  // as a fallback for anything not published as an event.
   useEffect(() => {
+    let refreshTimer: ReturnType<typeof setTimeout> | null = null;
+    const stream = openEventStream(() => {
+      if (refreshTimer) return;
+      refreshTimer = setTimeout(() => {
+        refreshTimer = null;
+        handleRefresh(true);
+      }, 2000);
+    }, { events: ['batch'] });
+
     const intervalId = setInterval(() => {
       handleRefresh(true);
-    }, 5000); // Poll every 5 seconds
+    }, 60000);
 
-    return () => clearInterval(intervalId);
+    return () => {
+      stream.close();
+      clearInterval(intervalId);
+      if (refreshTimer) clearTimeout(refreshTimer);
+    };
   }, []);
 
   // Function to export data as CSV
@@ -440,7 +472,7 @@ export default function Dashboard({ onNavigateToLanding }: DashboardProps) {
   // If we have real performance logs (global), use them. Otherwise fallback to order-specific data.
   const chartData = selectedOrderId === 'all'
     ? performanceData
-    : performanceData.filter(item => item.orderId === selectedOrderId); // Use history for specific order too
+    : orderPerformanceData; // Use history for specific order too
 
   const menuItems = [
     { id: "dashboard", icon: LayoutDashboard, label: "Dashboard" },
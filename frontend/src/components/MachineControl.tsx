@@ -1,5 +1,5 @@
 import { useState, useRef, useEffect } from 'react';
-import { machineAPI, machineControlAPI } from '../services/api';
+import { machineAPI, machineControlAPI, openAnalysisStream, openEventStream, type ApiError, type ServerEventName } from '../services/api';
 import { Button } from './ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
@@ -77,6 +77,9 @@ export default function MachineControl() {
   const [isCameraActive, setIsCameraActive] = useState(false);
   const isCameraActiveRef = useRef(false);
   const analysisInterval = useRef<NodeJS.Timeout | null>(null);
+  const analysisStream = useRef<ReturnType<typeof openAnalysisStream> | null>(null);
+  const analysisInFlight = useRef(false);
+  const analysisBackoffUntil = useRef(0);
   const [detectionResult, setDetectionResult] = useState<{ status: 'healthy' | 'defect' | null, accuracy: number }>({
     status: null,
     accuracy: 0
@@ -181,11 +184,57 @@ export default function MachineControl() {
     }
   };
 
-  // Initial Fetch & Polling
+  // Apply a pushed change to the machine list (no refetch)
+  const applyServerEvent = (event: ServerEventName, data: any) => {
+    if (event === 'machine' && data.action === 'created') {
+      setMachines(prev => prev.some(m => m.id === data.machineId) ? prev : [...prev, data.machine]);
+      return;
+    }
+    setMachines(prev => prev.map(machine => {
+      if (event === 'machine' && machine.id === data.machineId) {
+        return { ...machine, status: { ...machine.status, power: data.power } };
+      }
+      if (event === 'machine_log' && machine.id === data.machineId) {
+        if (machine.logs.some(log => log.id === data.id)) return machine;
+        return { ...machine, logs: [data, ...machine.logs].slice(0, 10) };
+      }
+      if (event === 'telemetry') {
+        const reading = data.readings.find((r: any) => r.machineId === machine.id);
+        if (!reading) return machine;
+        return {
+          ...machine,
+          status: { ...machine.status, temperature: reading.temperature },
+          statistics: {
+            ...machine.statistics,
+            processedToday: reading.processedToday,
+            efficiency: reading.efficiency,
+            errorRate: reading.errorRate
+          }
+        };
+      }
+      if (event === 'batch' && machine.id === data.machineId && data.pendingBatches !== null) {
+        return { ...machine, statistics: { ...machine.statistics, currentBatch: data.pendingBatches } };
+      }
+      return machine;
+    }));
+  };
+
+  // Initial Fetch, then pushed updates; polling only as a slow fallback
   useEffect(() => {
     fetchMachines();
-    const interval = setInterval(fetchMachines, 5000);
-    return () => clearInterval(interval);
+    let connected = false;
+    const stream = openEventStream(applyServerEvent, {
+      onOpen: () => {
+        // Reconnected: catch up on anything the replay buffer no longer has
+        if (connected) fetchMachines();
+        connected = true;
+      }
+    });
+    const interval = setInterval(fetchMachines, 60000);
+    return () => {
+      stream.close();
+      clearInterval(interval);
+    };
   }, []);
 
   const currentMachine = machines.find(m => String(m.id) === String(selectedMachineId));
@@ -253,12 +302,40 @@ export default function MachineControl() {
         analysisInterval.current = null;
       }
     }
+    if (analysisStream.current) {
+      analysisStream.current.close();
+      analysisStream.current = null;
+    }
   };
 
   const startAnalysisLoop = () => {
     if (analysisInterval.current) clearInterval(analysisInterval.current);
 
+    // Prefer the persistent stream (5 fps); fall back to one POST per second
+    if (analysisStream.current) analysisStream.current.close();
+    const stream = openAnalysisStream(selectedMachineId, (message) => {
+      if (message.type === 'result' && message.data) {
+        // Blurred/badly lit frame: keep showing the last real result
+        if (message.data.status === 'rejected') return;
+        setDetectionResult({
+          status: message.data.status,
+          accuracy: message.data.accuracy
+        });
+        setAnalysisError(null);
+      } else if (message.type === 'error') {
+        setAnalysisError("Analysis Failed");
+      }
+    }, () => {
+      if (analysisStream.current === stream) analysisStream.current = null;
+    });
+    analysisStream.current = stream;
+
+    let tick = 0;
     analysisInterval.current = setInterval(async () => {
+      tick += 1;
+      const streaming = analysisStream.current?.isReady() ?? false;
+      if (!streaming && tick % 5 !== 0) return;
+
       if (videoRef.current && canvasRef.current && isCameraActiveRef.current) {
         const videoWidth = videoRef.current.videoWidth;
         const videoHeight = videoRef.current.videoHeight;
@@ -273,9 +350,18 @@ export default function MachineControl() {
 
           canvasRef.current.toBlob(async (blob) => {
             if (blob) {
+              if (streaming && analysisStream.current) {
+                analysisStream.current.sendFrame(blob);
+                return;
+              }
+              // One request at a time, and honour the server's Retry-After
+              if (analysisInFlight.current || Date.now() < analysisBackoffUntil.current) return;
+              analysisInFlight.current = true;
               try {
-                const response = await machineAPI.analyzeFrame(blob);
-                if (response.success) {
+                const response = await machineAPI.analyzeFrame(blob, selectedMachineId);
+                if (response.success && response.data.status === 'rejected') {
+                  // Blurred/badly lit frame: keep showing the last real result
+                } else if (response.success) {
                   setDetectionResult({
                     status: response.data.status,
                     accuracy: response.data.accuracy
@@ -285,13 +371,21 @@ export default function MachineControl() {
                   setAnalysisError("Analysis Failed");
                 }
               } catch (error) {
-                setAnalysisError("Connection Error");
+                const retryAfter = (error as ApiError).retryAfter;
+                if (retryAfter) {
+                  analysisBackoffUntil.current = Date.now() + retryAfter * 1000;
+                  setAnalysisError("Server Busy");
+                } else {
+                  setAnalysisError("Connection Error");
+                }
+              } finally {
+                analysisInFlight.current = false;
               }
             }
           }, 'image/jpeg', 0.8);
         }
       }
-    }, 1000);
+    }, 200);
   };
 
   useEffect(() => {
@@ -22,6 +22,13 @@ interface RequestOptions extends RequestInit {
   requiresAuth?: boolean;
 }
 
+// Error thrown for non-2xx responses; retryAfter (seconds) is set when the
+// server asks clients to back off (429/503 with Retry-After)
+export interface ApiError extends Error {
+  status?: number;
+  retryAfter?: number;
+}
+
 interface LoginCredentials {
   email: string;
   password: string;
@@ -105,7 +112,13 @@ async function apiRequest<T>(
         errorMessage = `${response.status}: ${response.statusText}`;
       }
 
-      throw new Error(errorMessage);
+      const apiError: ApiError = new Error(errorMessage);
+      apiError.status = response.status;
+      const retryAfter = response.headers.get('Retry-After');
+      if (retryAfter && !isNaN(Number(retryAfter))) {
+        apiError.retryAfter = Number(retryAfter);
+      }
+      throw apiError;
     }
 
     // ✅ Handle empty responses (204, etc.)
@@ -884,22 +897,59 @@ export const adminAPI = {
       requiresAuth: true,
     });
   },
+
+  // Accuracy history downsampled on the server to about `points` points
+  getPerformanceChart: async (params: {
+    orderId?: string;
+    from?: string;
+    to?: string;
+    points?: number;
+    method?: 'bucket' | 'lttb';
+  } = {}) => {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== '') query.append(key, String(value));
+    });
+    const qs = query.toString();
+    return apiRequest<{
+      success: boolean;
+      data: {
+        method: 'bucket' | 'lttb';
+        points: number;
+        rawPoints: number;
+        series: Array<{
+          timestamp: string;
+          avg?: number;
+          min?: number;
+          max?: number;
+          count?: number;
+          value?: number;
+        }>;
+      };
+    }>(`/statistics/admin/performance/chart${qs ? `?${qs}` : ''}`, {
+      method: 'GET',
+      requiresAuth: true,
+    });
+  },
 };
 
 // ============================================
 // MACHINE / AI APIs
 // ============================================
 export const machineAPI = {
-  analyzeFrame: async (imageBlob: Blob) => {
+  analyzeFrame: async (imageBlob: Blob, machineId?: string) => {
     const formData = new FormData();
     formData.append('image', imageBlob, 'frame.jpg');
+    if (machineId) formData.append('machineId', machineId);
 
     return apiRequest<{
       success: boolean;
       data: {
-        status: 'healthy' | 'defect';
+        status: 'healthy' | 'defect' | 'rejected';
         accuracy: number;
         label: string;
+        // Set when the quality gate rejected the frame (blur / exposure)
+        quality?: { ok: boolean; reason: 'blur' | 'overexposed' | 'underexposed' };
       };
     }>('/machine/analyze', {
       method: 'POST',
@@ -909,6 +959,84 @@ export const machineAPI = {
   },
 };
 
+export interface AnalysisStreamMessage {
+  type: 'ready' | 'result' | 'error' | 'heartbeat';
+  seq?: number;
+  data?: {
+    status: 'healthy' | 'defect' | 'rejected';
+    accuracy: number;
+    quality?: { ok: boolean; reason: 'blur' | 'overexposed' | 'underexposed' };
+  };
+  message?: string;
+  latencyMs?: number;
+  dropped?: number;
+}
+
+// Persistent WebSocket for live camera analysis: authenticates once, then
+// frames are sent as binary JPEG and results are pushed back as they finish.
+// The server drops stale frames, so callers can send at their camera rate.
+export const openAnalysisStream = (
+  machineId: string,
+  onMessage: (message: AnalysisStreamMessage) => void,
+  onClose?: () => void
+) => {
+  const ws = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/machine/stream`);
+  ws.binaryType = 'arraybuffer';
+  let ready = false;
+
+  ws.onopen = () => {
+    ws.send(JSON.stringify({ token: getToken(), machineId }));
+  };
+  ws.onmessage = (event) => {
+    const message = JSON.parse(event.data) as AnalysisStreamMessage;
+    if (message.type === 'ready') ready = true;
+    onMessage(message);
+  };
+  ws.onclose = () => {
+    ready = false;
+    onClose?.();
+  };
+
+  return {
+    isReady: () => ready && ws.readyState === WebSocket.OPEN,
+    // Skip the frame if the previous one hasn't left the socket yet
+    sendFrame: (frame: Blob) => {
+      if (!ready || ws.readyState !== WebSocket.OPEN || ws.bufferedAmount > 0) return false;
+      ws.send(frame);
+      return true;
+    },
+    close: () => ws.close(),
+  };
+};
+
+export type ServerEventName = 'machine' | 'machine_log' | 'telemetry' | 'batch';
+
+// Push channel (Server-Sent Events): the server publishes each change once
+// and every open page receives it, instead of each page polling. EventSource
+// reconnects by itself (and replays missed events via Last-Event-ID).
+export const openEventStream = (
+  onEvent: (event: ServerEventName, data: any) => void,
+  options: { events?: ServerEventName[]; onOpen?: () => void; onError?: () => void } = {}
+) => {
+  const params = new URLSearchParams({ token: getToken() || '' });
+  if (options.events?.length) params.set('events', options.events.join(','));
+  const source = new EventSource(`${API_BASE_URL}/events?${params.toString()}`);
+
+  const names: ServerEventName[] = options.events ?? ['machine', 'machine_log', 'telemetry', 'batch'];
+  names.forEach((name) => {
+    source.addEventListener(name, (event) => {
+      onEvent(name, JSON.parse((event as MessageEvent).data));
+    });
+  });
+  source.onopen = () => options.onOpen?.();
+  source.onerror = () => options.onError?.();
+
+  return {
+    isOpen: () => source.readyState === EventSource.OPEN,
+    close: () => source.close(),
+  };
+};
+
 // ============================================
 // MACHINE CONTROL APIs
 // ============================================